@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+
+# Detection settings
+ROLLING_WINDOW = 30     # Previous points a value is compared against (rolling z-score)
+MIN_PERIODS = 10        # Points needed before a z-score is trusted
+Z_THRESHOLD = 3.5       # |rolling z| above this is flagged
+EWMA_ALPHA = 0.1        # Weight of the newest point in the EWMA baseline
+EWMA_THRESHOLD = 3.5    # |deviation from the EWMA| above this many EW standard deviations is flagged
+MAX_EVENTS = 5000       # Flagged points kept per detector (oldest dropped first)
+
+REASON_HIGH = "Above high limit"
+REASON_LOW = "Below low limit"
+REASON_Z = "Rolling z-score"
+REASON_EWMA = "EWMA deviation"
+
+# Shown when none of the shown tags has a Low/High in tags.csv: only the statistical
+# rules can fire then
+LIMITS_OFF_NOTE = "Limit checks are off (no Low/High in tags.csv for these parameters); only unusual values are flagged."
+
+SCORED_COLUMNS = ['DateAndTime', 'TagIndex', 'Val', 'RollingZ', 'EwmaZ', 'Reason']
+
+
+# Rows of each tag side by side: a (tags x longest run) matrix, left aligned and NaN padded.
+# `codes` are the row's tag positions (0..n_tags-1), rows sorted by tag then time.
+def _pack(codes, values, n_tags):
+    counts = np.bincount(codes, minlength=n_tags)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    positions = np.arange(len(codes)) - starts[codes]
+    matrix = np.full((n_tags, counts.max(initial=0)), np.nan)
+    matrix[codes, positions] = values
+    return matrix, positions
+
+
+# z-score of each point against the `window` valid points before it in its row
+def _rolling_z(matrix, window, min_periods):
+    valid = ~np.isnan(matrix)
+    zero = np.zeros((matrix.shape[0], 1))
+    s1 = np.concatenate((zero, np.cumsum(np.where(valid, matrix, 0.0), axis=1)), axis=1)
+    s2 = np.concatenate((zero, np.cumsum(np.where(valid, matrix * matrix, 0.0), axis=1)), axis=1)
+    cnt = np.concatenate((zero, np.cumsum(valid, axis=1)), axis=1)
+    # Sums over the previous `window` columns (rows are left aligned, so columns are points)
+    end = np.arange(matrix.shape[1])
+    start = np.maximum(end - window, 0)
+    n = cnt[:, end] - cnt[:, start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (s1[:, end] - s1[:, start]) / n
+        var = ((s2[:, end] - s2[:, start]) - n * mean * mean) / (n - 1)
+        z = (matrix - mean) / np.sqrt(np.where(var > 0, var, np.nan))
+    z[n < min_periods] = np.nan
+    return z
+
+
+# Score each point against the EWMA baseline before it, stepping all tags at once.
+# mean/var/count hold the running state per row and are updated in place.
+def _ewma_z(matrix, mean, var, count, alpha, min_periods):
+    z = np.full(matrix.shape, np.nan)
+    for col in range(matrix.shape[1]):
+        x = matrix[:, col]
+        valid = ~np.isnan(x)
+        deviation = x - mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z[:, col] = np.where(count >= min_periods, deviation / np.sqrt(var), np.nan)
+        first = valid & (count == 0)
+        step = valid & ~first
+        mean[first] = x[first]
+        var[step] = (1 - alpha) * (var[step] + alpha * deviation[step] ** 2)
+        mean[step] += alpha * deviation[step]
+        count[valid] += 1
+    z[~np.isfinite(z)] = np.nan
+    return z
+
+
+# Flags limit breaches and statistical excursions in trend data (DateAndTime, TagIndex, Val)
+# for all tags in one pass. State is kept per TagIndex (last `window` values, EWMA mean and
+# variance, newest time scored), so feeding it only new rows gives the same flags as
+# rescoring the whole history.
+class AnomalyDetector:
+    def __init__(self, limits=None, window=ROLLING_WINDOW, min_periods=MIN_PERIODS, z_threshold=Z_THRESHOLD,
+                 alpha=EWMA_ALPHA, ewma_threshold=EWMA_THRESHOLD, max_events=MAX_EVENTS):
+        self.limits = dict(limits or {})  # TagIndex -> (low, high), either may be None
+        self.window = window
+        self.min_periods = min_periods
+        self.z_threshold = z_threshold
+        self.alpha = alpha
+        self.ewma_threshold = ewma_threshold
+        self.max_events = max_events
+        self._tail = {}       # TagIndex -> last `window` values
+        self._ewma = {}       # TagIndex -> (mean, var, count)
+        self._last_time = {}  # TagIndex -> newest DateAndTime scored
+        self.events = pd.DataFrame(columns=SCORED_COLUMNS)
+
+    # Score the rows newer than what was already seen for their tag. Returns every scored
+    # row with its z-scores and Reason ('' when nothing was flagged); flagged rows are
+    # also added to self.events.
+    def update(self, df):
+        df = df[['DateAndTime', 'TagIndex', 'Val']].dropna()
+        if self._last_time and not df.empty:
+            last = df['TagIndex'].map(self._last_time)
+            df = df[last.isna() | (df['DateAndTime'] > last)]
+        if df.empty:
+            return pd.DataFrame(columns=SCORED_COLUMNS)
+        df = df.sort_values(['TagIndex', 'DateAndTime'], kind='stable')
+
+        tag_list, codes = np.unique(df['TagIndex'].to_numpy(), return_inverse=True)
+        values = df['Val'].to_numpy(dtype='float64')
+        new, positions = _pack(codes, values, len(tag_list))
+
+        # Rolling z-score: the kept tail of each tag followed by its new points
+        tails = [self._tail.get(int(tag), np.empty(0)) for tag in tag_list]
+        offsets = np.array([len(t) for t in tails])
+        combined = np.full((len(tag_list), offsets.max(initial=0) + new.shape[1]), np.nan)
+        for row, tail in enumerate(tails):
+            combined[row, :len(tail)] = tail
+        combined[codes, offsets[codes] + positions] = values
+        rolling_z = _rolling_z(combined, self.window, self.min_periods)[codes, offsets[codes] + positions]
+
+        # EWMA deviation, continuing from each tag's previous state
+        state = np.array([self._ewma.get(int(tag), (0.0, 0.0, 0)) for tag in tag_list], dtype='float64').reshape(-1, 3)
+        mean, var, count = state[:, 0].copy(), state[:, 1].copy(), state[:, 2].copy()
+        ewma_z = _ewma_z(new, mean, var, count, self.alpha, self.min_periods)[codes, positions]
+
+        # Limits from the registry, looked up once per tag
+        low = np.array([_limit(self.limits.get(int(tag)), 0) for tag in tag_list])[codes]
+        high = np.array([_limit(self.limits.get(int(tag)), 1) for tag in tag_list])[codes]
+
+        reason = np.full(len(values), '', dtype=object)
+        reason[np.abs(np.nan_to_num(ewma_z)) > self.ewma_threshold] = REASON_EWMA
+        reason[np.abs(np.nan_to_num(rolling_z)) > self.z_threshold] = REASON_Z
+        reason[values < low] = REASON_LOW
+        reason[values > high] = REASON_HIGH
+
+        scored = pd.DataFrame({
+            'DateAndTime': df['DateAndTime'].to_numpy(),
+            'TagIndex': df['TagIndex'].to_numpy(),
+            'Val': values,
+            'RollingZ': rolling_z,
+            'EwmaZ': ewma_z,
+            'Reason': reason,
+        })
+
+        # Carry the state forward
+        for row, tag in enumerate(tag_list):
+            run = combined[row][~np.isnan(combined[row])]
+            self._tail[int(tag)] = run[-self.window:]
+            self._ewma[int(tag)] = (mean[row], var[row], int(count[row]))
+        self._last_time.update(scored.groupby('TagIndex')['DateAndTime'].max().to_dict())
+
+        flagged = scored[scored['Reason'] != '']
+        if not flagged.empty:
+            events = flagged if self.events.empty else pd.concat([self.events, flagged], ignore_index=True)
+            self.events = events.iloc[-self.max_events:].reset_index(drop=True)
+        return scored
+
+
+def _limit(limits, i):
+    value = limits[i] if limits is not None else None
+    if value is None:
+        return np.inf if i == 1 else -np.inf
+    return value
+
+
+# One row per TagIndex with flagged points: total, count per reason, worst z-score and
+# the latest flagged time. tag_names maps TagIndex to the name shown as Parameter.
+def summarize(events, tag_names):
+    if events.empty:
+        return pd.DataFrame(columns=['Parameter', 'Flagged', 'Last'])
+    counts = pd.crosstab(events['TagIndex'], events['Reason'])
+    worst = events[['RollingZ', 'EwmaZ']].abs().max(axis=1).groupby(events['TagIndex']).max()
+    summary = pd.DataFrame({
+        'Parameter': counts.index.map(lambda t: tag_names.get(t, str(t))),
+        'Flagged': counts.sum(axis=1),
+    }, index=counts.index).join(counts)
+    summary['Worst |z|'] = worst.round(1)
+    summary['Last'] = events.groupby('TagIndex')['DateAndTime'].max()
+    return summary.sort_values('Flagged', ascending=False).reset_index(drop=True)
+
+
+# Red markers for the flagged points of one tag, to lay over its trend line
+def anomaly_markers(events, tag):
+    import plotly.graph_objects as go
+
+    points = events[events['TagIndex'] == tag]
+    return go.Scatter(x=points['DateAndTime'], y=points['Val'], mode='markers', name='Anomaly',
+                      marker=dict(color='red', size=10, symbol='circle-open', line=dict(width=2)),
+                      text=points['Reason'], hovertemplate="%{text}<br>%{x}<br>%{y}<extra></extra>",
+                      showlegend=False)
@@ -0,0 +1,83 @@
+import importlib
+import importlib.util
+import logging
+import threading
+from contextlib import ExitStack
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+STYLE_FILE = "style.css"
+LOGO_FILE = "data/C_logo.jpeg"
+
+# Connections opened ahead of the first query, and libraries imported ahead of the
+# first chart, by the background warm-up
+WARM_CONNECTIONS = 2
+WARM_MODULES = ["plotly.express", "plotly.graph_objects", "matplotlib.figure", "matplotlib.dates"]
+
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+
+# Static assets are read from disk once per process, not on every rerun of every page
+@lru_cache(maxsize=None)
+def page_style():
+    with open(STYLE_FILE) as f:
+        return f"<style>{f.read()}</style>"
+
+
+@lru_cache(maxsize=None)
+def logo():
+    with open(LOGO_FILE, "rb") as f:
+        return f.read()
+
+
+def _warm_up():
+    from Tag_Registry import get_registry
+
+    try:
+        get_registry()
+    except Exception:
+        logger.exception("Tag registry warm-up failed")
+
+    try:
+        from DB_Pool import get_pool
+
+        # All held at once so each is a new connection; every one checked out is
+        # returned to the pool even when a later one fails to open
+        pool = get_pool()
+        with ExitStack() as stack:
+            for _ in range(WARM_CONNECTIONS):
+                stack.enter_context(pool.connection())
+    except Exception:
+        logger.exception("Connection pool warm-up failed")
+
+    # Keep the local FloatTable mirror current from inside the app (the sync lock keeps
+    # several Streamlit processes, or the CLI job, from syncing at the same time)
+    try:
+        import DB_Query
+
+        if DB_Query.USE_LOCAL_MIRROR and importlib.util.find_spec("pyarrow") is not None:
+            import Local_Mirror
+
+            Local_Mirror.start_background_sync()
+    except Exception:
+        logger.exception("Starting the mirror sync failed")
+
+    for name in WARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    logger.info("Warm-up finished")
+
+
+# Start warming the tag registry, DB connections and plotting libraries, and the mirror
+# sync, on a background thread (once per process), so the page that calls it paints
+# without waiting for them
+def start_warmup():
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warm_up, name="warmup", daemon=True)
+            _warmup_thread.start()
@@ -0,0 +1,225 @@
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import Synthetic_FloatTable
+
+# Times each stage of the pages' fetch -> transform -> render pipeline against the
+# synthetic SQLite FloatTable:
+#     python Benchmark.py --days 30 --tags 15 --sample-seconds 60 --repeat 5
+# Every run is appended to RESULTS_FILE and compared with the previous run of the
+# same size, so regressions show up as a change in the last column.
+RESULTS_FILE = os.path.join("data", "benchmark_results.jsonl")
+DEFAULT_REPEAT = 5
+SNAPSHOT_DAYS = 15   # Range of the trend/KPI pages
+RAW_HOURS = 24       # Range of the REPORT/LINE_CHART raw loads
+
+
+# The row loop the REPORT page used before the typed loader, kept as a reference point
+def _row_loop_frame(rows):
+    data = []
+    for row in rows:
+        datetime_val, tag_index, val = row
+        try:
+            val = round(float(val), 2)
+        except ValueError:
+            val = np.nan
+        data.append([datetime_val, tag_index, val])
+    return pd.DataFrame(data, columns=["DateAndTime", "TagIndex", "Val"])
+
+
+# The cleanup the trend pages run on fetch_data results
+def _clean(trend_data):
+    trend_data['DateAndTime'] = pd.to_datetime(trend_data['DateAndTime'], errors='coerce')
+    trend_data['Val'] = pd.to_numeric(trend_data['Val'], errors='coerce')
+    trend_data.dropna(subset=['DateAndTime', 'Val'], inplace=True)
+    trend_data.sort_values(by='DateAndTime', inplace=True)
+    return trend_data
+
+
+# Stages as name -> callable returning the number of rows it handled. Each callable
+# builds its own input outside the timed part where it can.
+def build_stages(path, tags):
+    import DB_Query
+    from Downsample import DEFAULT_CHART_WIDTH_PX, buckets_for_width, lttb
+    from KPI_Render import BACKEND_PNG, _figure_cache, render_kpi
+
+    oldest, newest = Synthetic_FloatTable.time_range(path)
+    tag_index_list = list(range(tags))
+    hour = newest.hour - 1 if newest.hour > 0 else 23
+    snapshot_end = newest.date()
+    snapshot_start = max(snapshot_end - timedelta(days=SNAPSHOT_DAYS - 1), oldest.date())
+    raw_start = max(newest - timedelta(hours=RAW_HOURS), oldest)
+    raw_query = f"""
+        SELECT DateAndTime, TagIndex, Val FROM {DB_Query.FLOAT_TABLE}
+        WHERE DateAndTime >= ? AND DateAndTime <= ? ORDER BY DateAndTime DESC
+    """
+
+    snapshots = DB_Query._sql_snapshots(snapshot_start, snapshot_end, hour, tag_index_list)
+    cleaned = _clean(snapshots.copy())
+    cleaned['Parameter'] = cleaned['TagIndex'].map(lambda t: f"Tag {t}")
+    raw = DB_Query.fetch_raw_range(raw_start, newest, tag_index_list)
+
+    def fetch_data_cte():
+        return len(DB_Query._sql_snapshots(snapshot_start, snapshot_end, hour, tag_index_list))
+
+    def fetchall_row_loop():
+        with DB_Query.pooled_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(raw_query, [raw_start, newest])
+            df = _row_loop_frame(cursor.fetchall())
+            cursor.close()
+        return len(df)
+
+    def fetchmany_typed_frames():
+        return len(DB_Query.read_raw_frame(raw_query, [raw_start, newest]))
+
+    def pandas_cleanup():
+        return len(_clean(snapshots.copy()))
+
+    def lttb_per_tag():
+        max_points = buckets_for_width(DEFAULT_CHART_WIDTH_PX)
+        for _, tag_df in raw.groupby('TagIndex', sort=False):
+            lttb(tag_df['DateAndTime'].to_numpy(), tag_df['Val'].to_numpy(), max_points)
+        return len(raw)
+
+    def series_store_per_tag():
+        from Series_Store import SeriesStore
+
+        store = SeriesStore.from_frame(raw)
+        max_points = buckets_for_width(DEFAULT_CHART_WIDTH_PX)
+        for tag in store.tags:
+            store.frame(tag, max_points=max_points)
+        return len(store)
+
+    def plotly_figures():
+        import plotly.express as px
+
+        for parameter, param_data in cleaned.groupby('Parameter', sort=False):
+            fig = px.line(param_data, x='DateAndTime', y='Val', title=f"Trend of {parameter}", text='Val')
+            fig.to_plotly_json()
+        return len(cleaned)
+
+    def kpi_png():
+        _figure_cache.clear()
+        render_kpi(cleaned, sorted(cleaned['Parameter'].unique()), BACKEND_PNG)
+        return len(cleaned)
+
+    return {
+        "fetch_data CTE": fetch_data_cte,
+        "fetchall + row loop": fetchall_row_loop,
+        "fetchmany + typed frames": fetchmany_typed_frames,
+        "pandas cleanup": pandas_cleanup,
+        "LTTB per tag": lttb_per_tag,
+        "series store + LTTB": series_store_per_tag,
+        "Plotly figures": plotly_figures,
+        "KPI PNG render": kpi_png,
+    }
+
+
+# Latency percentiles (ms), throughput (rows/s) and peak traced memory (MB) of one stage.
+# Memory is measured on a separate run so tracing doesn't slow the timed ones.
+def measure(stage, repeat=DEFAULT_REPEAT, warmup=1):
+    for _ in range(warmup):
+        stage()
+    times = []
+    rows = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = stage()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    times = np.array(times) * 1000
+    return {
+        "rows": rows,
+        "p50_ms": float(np.percentile(times, 50)),
+        "p90_ms": float(np.percentile(times, 90)),
+        "max_ms": float(times.max()),
+        "rows_per_s": float(rows / (np.median(times) / 1000)) if rows and np.median(times) > 0 else 0.0,
+        "peak_mb": peak / 1e6,
+    }
+
+
+def _revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _previous_run(results_file, config):
+    previous = None
+    try:
+        with open(results_file) as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("config") == config:
+                    previous = record
+    except OSError:
+        pass
+    return previous
+
+
+def _report(results, previous):
+    print(f"{'stage':<28}{'rows':>10}{'p50 ms':>10}{'p90 ms':>10}{'max ms':>10}{'rows/s':>14}{'peak MB':>10}{'vs prev':>10}")
+    for name, r in results.items():
+        change = ""
+        before = (previous or {}).get("results", {}).get(name)
+        if before and before["p50_ms"] > 0:
+            change = f"{(r['p50_ms'] / before['p50_ms'] - 1) * 100:+.0f}%"
+        print(f"{name:<28}{r['rows']:>10,}{r['p50_ms']:>10.1f}{r['p90_ms']:>10.1f}{r['max_ms']:>10.1f}"
+              f"{r['rows_per_s']:>14,.0f}{r['peak_mb']:>10.1f}{change:>10}")
+
+
+def run(path=Synthetic_FloatTable.DEFAULT_PATH, days=Synthetic_FloatTable.DEFAULT_DAYS,
+        tags=Synthetic_FloatTable.DEFAULT_TAGS, sample_seconds=Synthetic_FloatTable.DEFAULT_SAMPLE_SECONDS,
+        repeat=DEFAULT_REPEAT, only=None, rebuild=False, results_file=RESULTS_FILE):
+    config = {"days": days, "tags": tags, "sample_seconds": sample_seconds}
+    if rebuild or Synthetic_FloatTable.config(path) != config:
+        started = time.perf_counter()
+        rows = Synthetic_FloatTable.create(path, days, tags, sample_seconds)
+        print(f"Built {path}: {rows:,} rows in {time.perf_counter() - started:.1f}s")
+    Synthetic_FloatTable.install(path)
+
+    stages = build_stages(path, tags)
+    results = {name: measure(stage, repeat) for name, stage in stages.items()
+               if only is None or name in only}
+
+    previous = _previous_run(results_file, config)
+    _report(results, previous)
+    os.makedirs(os.path.dirname(results_file) or ".", exist_ok=True)
+    with open(results_file, "a") as f:
+        f.write(json.dumps({"time": datetime.now().isoformat(timespec="seconds"), "revision": _revision(),
+                            "config": config, "repeat": repeat, "results": results}) + "\n")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the fetch -> transform -> render pipeline")
+    parser.add_argument("--path", default=Synthetic_FloatTable.DEFAULT_PATH, help="Synthetic FloatTable database")
+    parser.add_argument("--days", type=int, default=Synthetic_FloatTable.DEFAULT_DAYS)
+    parser.add_argument("--tags", type=int, default=Synthetic_FloatTable.DEFAULT_TAGS)
+    parser.add_argument("--sample-seconds", type=int, default=Synthetic_FloatTable.DEFAULT_SAMPLE_SECONDS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per stage")
+    parser.add_argument("--stage", action="append", help="Only run this stage (repeatable)")
+    parser.add_argument("--rebuild", action="store_true", help="Recreate the synthetic table even if its size matches")
+    parser.add_argument("--results", default=RESULTS_FILE, help="JSON lines file the run is appended to")
+    args = parser.parse_args()
+
+    run(args.path, args.days, args.tags, args.sample_seconds, args.repeat, args.stage, args.rebuild, args.results)
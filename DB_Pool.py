@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from Perf_Metrics import span
+
+# Pool settings (shared by every page, session and rerun in this process)
+POOL_SIZE = 10            # Max open connections to SQL Server
+CHECKOUT_TIMEOUT = 30     # Seconds to wait for a free connection before giving up
+RECYCLE_SECONDS = 1800    # Close and reopen connections older than this
+PING_AFTER_SECONDS = 30   # Health check connections that sat idle longer than this
+PING_QUERY = "SELECT 1"
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, factory, size=POOL_SIZE, timeout=CHECKOUT_TIMEOUT,
+                 recycle=RECYCLE_SECONDS, ping_after=PING_AFTER_SECONDS):
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        # Idle connections as (conn, returned_at); LIFO keeps the warm ones in use
+        self._idle = queue.LifoQueue()
+        # One slot per connection that may be open (idle or checked out)
+        self._slots = threading.BoundedSemaphore(size)
+        self._created = {}
+
+    def _open(self):
+        with span("db.connect"):
+            conn = self.factory()
+        self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _close(self, conn):
+        self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(PING_QUERY)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        with span("db.checkout_wait"):
+            got_slot = self._slots.acquire(timeout=self.timeout)
+        if not got_slot:
+            raise PoolTimeout(f"No database connection free after {self.timeout}s (pool size {self.size})")
+        try:
+            now = time.monotonic()
+            while True:
+                try:
+                    conn, returned_at = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+                # Recycle old connections so server-side state and driver leaks don't pile up
+                if now - self._created.get(id(conn), now) > self.recycle:
+                    self._close(conn)
+                    continue
+                # Only ping connections that sat idle for a while
+                if now - returned_at > self.ping_after and not self._healthy(conn):
+                    self._close(conn)
+                    continue
+                return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        try:
+            if not discard:
+                try:
+                    # Drop any open transaction before handing the connection to someone else
+                    conn.rollback()
+                except Exception:
+                    discard = True
+            if discard:
+                self._close(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception:
+            # The connection may be broken; keep it only if it still answers
+            discard = not self._healthy(conn)
+            raise
+        except BaseException:
+            # Abandoned mid-stream (e.g. a generator closed early); a result set may still be pending
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def dispose(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+
+# One pool per process. Modules are imported once, so this survives Streamlit reruns
+# and is shared by all sessions.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # DB_Conn holds the site's connection settings and is only needed once the
+            # pool is actually used, not when a stand-in is installed in its place
+            from DB_Conn import db_conn
+
+            _pool = ConnectionPool(db_conn)
+    return _pool
+
+
+# Usage:
+#     with pooled_conn() as conn:
+#         df = pd.read_sql(query, conn, params=params)
+def pooled_conn():
+    return get_pool().connection()
@@ -0,0 +1,536 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from DB_Pool import pooled_conn
+from Downsample import minmax_buckets
+from Perf_Metrics import frame_bytes, in_current_context, span
+from Query_Cache import DiskStore, TTLCache
+
+# Historian table every page reads from
+FLOAT_TABLE = "MDR.dbo.FloatTable"
+
+# Serve reads from the local Parquet mirror (Local_Mirror.py) once it has been synced
+USE_LOCAL_MIRROR = True
+
+# Serve snapshot queries from the hourly rollup table (Rollup.py) once it exists
+USE_ROLLUPS = True
+_rollup_state_cache = TTLCache(ttl=60, max_entries=1)
+
+# Hours a snapshot can be taken at; shift changes are at 06:00, 14:00 and 22:00
+SNAPSHOT_HOURS = list(range(24))
+SHIFT_HOURS = [6, 14, 22]
+DEFAULT_SNAPSHOT_HOUR = 6
+
+# Columns returned by the daily snapshot queries
+SNAPSHOT_COLUMNS = ['Date', 'DateAndTime', 'TagIndex', 'Val']
+
+# Rows pulled per fetchmany call by the bulk loader
+FETCH_BATCH_ROWS = 50_000
+
+# Worker threads for fetch_data_concurrently (the cap on its in-flight queries)
+MAX_CONCURRENT_QUERIES = 4
+_fetch_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_QUERIES, thread_name_prefix="fetch-data")
+
+# The historian writes new samples on this cadence, so a query result can't change
+# between two writes
+HISTORIAN_WRITE_SECONDS = 60
+# How long fetch_data results are kept: the five minutes the pages have always used,
+# a whole number of historian writes
+FETCH_CACHE_SECONDS = 5 * HISTORIAN_WRITE_SECONDS
+
+# Results of fetch_data, keyed on (date range, hour, tag set), shared by every session.
+# Entries expire together at the next FETCH_CACHE_SECONDS boundary of the wall clock,
+# right after a historian write, so every session sees the same data. With
+# QUERY_CACHE_DIR set they are also shared between the Streamlit processes on this machine.
+QUERY_CACHE_DIR_ENV = "QUERY_CACHE_DIR"
+_fetch_cache = TTLCache(ttl=FETCH_CACHE_SECONDS, max_entries=128, align=True,
+                        store=DiskStore(os.environ[QUERY_CACHE_DIR_ENV]) if os.environ.get(QUERY_CACHE_DIR_ENV) else None)
+
+# Per-day snapshot store for fetch_daily_snapshots: (Hour, Date, TagIndex) ->
+# (DateAndTime, Val), or None for a day without a value. Only days whose snapshot can
+# no longer change are kept; the least recently used are dropped beyond the bound.
+DAILY_STORE_MAX_CELLS = 100_000
+_daily_store = TTLCache(ttl=24 * 3600, max_entries=DAILY_STORE_MAX_CELLS)
+_NOT_STORED = object()
+SNAPSHOT_SETTLE = timedelta(minutes=5)
+
+
+# Expand a list into a "?,?,?" placeholder string for an IN (...) clause.
+# The statement text only depends on the list length, so SQL Server can reuse
+# one cached plan per length instead of compiling a new ad-hoc plan per value.
+def in_placeholders(values):
+    return ",".join("?" * len(values))
+
+
+# Pad an IN list up to the next power of two by repeating its last value.
+# Repeats don't change the result, and 1..64 tags then share 7 statement shapes.
+def pad_in_list(values):
+    size = 1
+    while size < len(values):
+        size *= 2
+    return list(values) + [values[-1]] * (size - len(values))
+
+
+# Run a parameterized query on a pooled connection and return a DataFrame
+def read_sql(query, params=None):
+    with pooled_conn() as conn, span("sql.read_sql") as s:
+        df = pd.read_sql(query, conn, params=params)
+        s["rows"], s["bytes"] = len(df), frame_bytes(df)
+        return df
+
+
+# Turn (DateAndTime, TagIndex, Val) columns into the compact typed frame used for raw
+# data: datetime64 timestamps, int16 TagIndex and float32 Val rounded to 2 places.
+# Values that aren't numbers become NaN, all in one vectorized step.
+def typed_raw_frame(date_and_time, tag_index, val):
+    val = pd.to_numeric(pd.Series(val), errors='coerce').to_numpy(dtype='float64')
+    return pd.DataFrame({
+        'DateAndTime': pd.to_datetime(pd.Series(date_and_time)).to_numpy(dtype='datetime64[us]'),
+        'TagIndex': np.asarray(tag_index, dtype='int16'),
+        'Val': np.round(val, 2).astype('float32'),
+    })
+
+
+# Stream a (DateAndTime, TagIndex, Val) cursor result as typed frames of up to
+# batch_size rows. Rows are pulled with fetchmany and turned into NumPy columns
+# straight away, so the full result is never held as Python row objects.
+def iter_cursor_frames(cursor, batch_size=FETCH_BATCH_ROWS):
+    while True:
+        with span("sql.fetchmany") as s:
+            rows = cursor.fetchmany(batch_size)
+            s["rows"] = len(rows)
+        if not rows:
+            break
+        with span("convert.typed_frame") as s:
+            date_and_time, tag_index, val = zip(*rows)
+            frame = typed_raw_frame(date_and_time, tag_index, val)
+            s["rows"], s["bytes"] = len(frame), frame_bytes(frame)
+        yield frame
+
+
+def concat_frames(frames):
+    frames = list(frames)
+    if not frames:
+        return typed_raw_frame([], [], [])
+    return pd.concat(frames, ignore_index=True)
+
+
+# Stream a (DateAndTime, TagIndex, Val) query from a pooled connection as typed frames
+def iter_raw_frames(query, params=None, batch_size=FETCH_BATCH_ROWS):
+    with pooled_conn() as conn:
+        cursor = conn.cursor()
+        with span("sql.execute"):
+            cursor.execute(query, params or [])
+        yield from iter_cursor_frames(cursor, batch_size)
+        cursor.close()
+
+
+# Run a (DateAndTime, TagIndex, Val) query on a pooled connection into one typed frame
+def read_raw_frame(query, params=None, batch_size=FETCH_BATCH_ROWS):
+    return concat_frames(iter_raw_frames(query, params, batch_size))
+
+
+# The Local_Mirror module when a synced Parquet mirror can serve reads, else None
+def _mirror():
+    if not USE_LOCAL_MIRROR:
+        return None
+    import Local_Mirror
+    return Local_Mirror if Local_Mirror.available() else None
+
+
+def _sql_snapshots(startdate, enddate, hour, tag_index_list):
+    in_list = pad_in_list(tag_index_list)
+    query = f"""
+        WITH newtbl_mdrRep1 AS (
+            SELECT
+                Date,
+                DateAndTime,
+                Hour,
+                TagIndex,
+                Round(Val, 2) as Val,
+                ROW_NUMBER() OVER (PARTITION BY Date, TagIndex ORDER BY DateAndTime DESC) AS rn
+            FROM {FLOAT_TABLE}
+            WHERE Date BETWEEN ? AND ?
+              AND Hour = ?
+              AND TagIndex IN ({in_placeholders(in_list)})
+        )
+        SELECT Date, DateAndTime, TagIndex, Val
+        FROM newtbl_mdrRep1
+        WHERE rn = 1;
+    """
+    return read_sql(query, [startdate, enddate, int(hour)] + in_list)
+
+
+# Last day whose snapshot hour closed at or before `until`
+def _last_closed_day(until, hour):
+    day = until.date()
+    if datetime.combine(day, time(int(hour))) + timedelta(hours=1) > until:
+        day -= timedelta(days=1)
+    return day
+
+
+# Rollup coverage (Rollup.rolled_through), looked up at most once a minute
+def _rollup_coverage():
+    if not USE_ROLLUPS:
+        return None
+    covered = _rollup_state_cache.get('rolled_through', False)
+    if covered is False:
+        import Rollup
+        covered = Rollup.rolled_through()
+        _rollup_state_cache.put('rolled_through', covered)
+    return covered
+
+
+# Snapshots from raw rows: days already in the local mirror are read from it,
+# only the unsynced tail goes to SQL Server
+def _raw_snapshots(startdate, enddate, hour, tag_index_list):
+    mirror = _mirror()
+    if mirror is None:
+        return _sql_snapshots(startdate, enddate, hour, tag_index_list)
+
+    last_mirrored = _last_closed_day(mirror.high_water_mark(), hour)
+    if last_mirrored < startdate:
+        return _sql_snapshots(startdate, enddate, hour, tag_index_list)
+    parts = [mirror.snapshots(startdate, min(enddate, last_mirrored), hour, tag_index_list)]
+    if enddate > last_mirrored:
+        parts.append(_sql_snapshots(last_mirrored + timedelta(days=1), enddate, hour, tag_index_list))
+    return pd.concat(parts, ignore_index=True)
+
+
+# Latest value of each TagIndex per Date for the given Hour (one row per Date, TagIndex).
+# Days whose hour is in the hourly rollup table are read from it (one row per
+# Date/TagIndex instead of a window over raw rows); the rest from raw rows.
+# Uncached; use fetch_data or fetch_daily_snapshots from the pages.
+def query_snapshots(startdate, enddate, hour, tag_index_list):
+    covered = _rollup_coverage()
+    if covered is None:
+        return _raw_snapshots(startdate, enddate, hour, tag_index_list)
+
+    import Rollup
+    last_rolled = _last_closed_day(covered, hour)
+    if last_rolled < startdate:
+        return _raw_snapshots(startdate, enddate, hour, tag_index_list)
+    parts = [Rollup.snapshots(startdate, min(enddate, last_rolled), hour, tag_index_list)]
+    if enddate > last_rolled:
+        parts.append(_raw_snapshots(last_rolled + timedelta(days=1), enddate, hour, tag_index_list))
+    return pd.concat(parts, ignore_index=True)
+
+
+def hour_label(hour):
+    return f"{hour:02d}:00" + (" (shift change)" if hour in SHIFT_HOURS else "")
+
+
+# Value of every TagIndex as of each timestamp: the last sample at or before it
+# (last observation carried forward), for several timestamps in one round trip.
+# Each (timestamp, tag) pair is one TOP 1 seek on a (TagIndex, DateAndTime) index,
+# so the cost doesn't depend on the time of day or how much data the hour holds.
+# `max_age` bounds how far back a value may come from.
+# Returns AsOf, TagIndex, DateAndTime, Val (DateAndTime/Val empty if no sample).
+def fetch_asof(timestamps, tag_index_list, max_age=timedelta(days=1)):
+    timestamps = sorted(set(pd.Timestamp(t).to_pydatetime() for t in timestamps))
+    tag_index_list = sorted(set(int(t) for t in tag_index_list))
+    if not timestamps or not tag_index_list:
+        return pd.DataFrame(columns=['AsOf', 'TagIndex', 'DateAndTime', 'Val'])
+
+    query = f"""
+        SELECT ts.AsOf, tags.TagIndex, v.DateAndTime, Round(v.Val, 2) AS Val
+        FROM (VALUES {','.join(['(CAST(? AS datetime2))'] * len(timestamps))}) AS ts(AsOf)
+        CROSS JOIN (VALUES {','.join(['(?)'] * len(tag_index_list))}) AS tags(TagIndex)
+        OUTER APPLY (
+            SELECT TOP 1 f.DateAndTime, f.Val
+            FROM {FLOAT_TABLE} f
+            WHERE f.TagIndex = tags.TagIndex
+              AND f.DateAndTime <= ts.AsOf
+              AND f.DateAndTime > DATEADD(second, -?, ts.AsOf)
+            ORDER BY f.DateAndTime DESC
+        ) v
+        ORDER BY ts.AsOf, tags.TagIndex
+    """
+    return read_sql(query, timestamps + tag_index_list + [int(max_age.total_seconds())])
+
+
+def _sql_raw_range(start_datetime, end_datetime, tag_index_list, include_start=True,
+                   newest_first=False, batch_size=FETCH_BATCH_ROWS):
+    where = f"DateAndTime {'>=' if include_start else '>'} ? AND DateAndTime <= ?"
+    params = [start_datetime, end_datetime]
+    if tag_index_list:
+        in_list = pad_in_list(tag_index_list)
+        where += f" AND TagIndex IN ({in_placeholders(in_list)})"
+        params.extend(in_list)
+    order = "DESC" if newest_first else "ASC"
+    query = f"""
+        SELECT DateAndTime, TagIndex, Val
+        FROM {FLOAT_TABLE}
+        WHERE {where}
+        ORDER BY DateAndTime {order}, TagIndex {order}
+    """
+    return iter_raw_frames(query, params, batch_size)
+
+
+# Raw FloatTable rows in [start_datetime, end_datetime] as a stream of typed frames,
+# optionally limited to some TagIndex values. Reads the mirror (one day at a time)
+# up to its high-water mark and SQL Server only for the rows after it, so memory
+# stays bounded by one batch or one day whatever the range.
+def iter_raw_range(start_datetime, end_datetime, tag_index_list=None, newest_first=False,
+                   batch_size=FETCH_BATCH_ROWS):
+    tag_index_list = sorted(set(int(t) for t in tag_index_list or []))
+    mirror = _mirror()
+    hwm = mirror.high_water_mark() if mirror is not None else None
+    if hwm is None or hwm < start_datetime:
+        yield from _sql_raw_range(start_datetime, end_datetime, tag_index_list,
+                                  newest_first=newest_first, batch_size=batch_size)
+        return
+
+    def mirrored():
+        for day_df in mirror.iter_days(start_datetime, min(end_datetime, hwm), tag_index_list, newest_first):
+            yield typed_raw_frame(day_df['DateAndTime'].to_numpy(), day_df['TagIndex'].to_numpy(),
+                                  day_df['Val'].to_numpy())
+
+    def tail():
+        if end_datetime > hwm:
+            yield from _sql_raw_range(hwm, end_datetime, tag_index_list, include_start=False,
+                                      newest_first=newest_first, batch_size=batch_size)
+
+    parts = (tail(), mirrored()) if newest_first else (mirrored(), tail())
+    for part in parts:
+        yield from part
+
+
+# Raw FloatTable rows in [start_datetime, end_datetime] as one typed frame, oldest first
+def fetch_raw_range(start_datetime, end_datetime, tag_index_list=None):
+    return concat_frames(iter_raw_range(start_datetime, end_datetime, tag_index_list))
+
+
+# Rows written after `after` (exclusive), oldest first. Used for delta polling, so it
+# always goes to SQL Server: the newest rows are never in the local mirror yet.
+def fetch_rows_after(after, tag_index_list=None):
+    tag_index_list = sorted(set(int(t) for t in tag_index_list or []))
+    return concat_frames(_sql_raw_range(after, datetime.now() + timedelta(days=1), tag_index_list,
+                                        include_start=False))
+
+
+# Sort orders offered by the report table. Each maps to the full keyset used for
+# paging: the sort column first, then columns that make the order unique.
+REPORT_SORT_KEYS = {
+    'DateAndTime': ['DateAndTime', 'TagIndex'],
+    'TagIndex': ['TagIndex', 'DateAndTime'],
+    'Val': ['ROUND(Val, 2)', 'DateAndTime', 'TagIndex'],
+}
+
+
+# "Rows after `values` in keyset order" as a WHERE condition:
+# (a, b) > (x, y)  ==  a > x OR (a = x AND b > y)
+def _keyset_after(columns, values, descending):
+    op = '<' if descending else '>'
+    clause, params = f"{columns[-1]} {op} ?", [values[-1]]
+    for column, value in zip(reversed(columns[:-1]), reversed(values[:-1])):
+        clause = f"{column} {op} ? OR ({column} = ? AND ({clause}))"
+        params = [value, value] + params
+    return f"({clause})", params
+
+
+# Keyset value of a report row for the given sort, to pass back as `after`. `row` is as
+# the source returned it: sorted by value it carries RoundedVal, the value the source
+# itself rounded, so the next page compares against exactly what this one was ordered on
+# (rounding again here can disagree with the server on .xx5 ties and skip or repeat rows).
+def report_page_key(row, sort_by='DateAndTime'):
+    values = {'DateAndTime': pd.Timestamp(row['DateAndTime']).to_pydatetime(),
+              'TagIndex': int(row['TagIndex'])}
+    if 'RoundedVal' in row:
+        values['ROUND(Val, 2)'] = float(row['RoundedVal'])
+    return tuple(values[column] for column in REPORT_SORT_KEYS[sort_by])
+
+
+# One page of raw rows for the report table, filtered, sorted and paged by SQL Server.
+# Keyset pagination: `after` is the key this function returned for the previous page,
+# so every page is a short index seek instead of an OFFSET scan.
+# Returns (page frame, `after` for the next page or None when this is the last page).
+def fetch_report_page(start_datetime, end_datetime, tag_index_list, page_size,
+                      sort_by='DateAndTime', descending=True, after=None):
+    key_columns = REPORT_SORT_KEYS[sort_by]
+    where = "DateAndTime BETWEEN ? AND ?"
+    params = [start_datetime, end_datetime]
+    if tag_index_list:
+        in_list = pad_in_list(sorted(set(int(t) for t in tag_index_list)))
+        where += f" AND TagIndex IN ({in_placeholders(in_list)})"
+        params.extend(in_list)
+    if sort_by == 'Val':
+        # Rows without a value can't be placed in a value ordered keyset
+        where += " AND Val IS NOT NULL"
+    if after is not None:
+        clause, after_params = _keyset_after(key_columns, after, descending)
+        where += f" AND {clause}"
+        params.extend(after_params)
+
+    direction = "DESC" if descending else "ASC"
+    select = "DateAndTime, TagIndex, Val" + (", ROUND(Val, 2) AS RoundedVal" if sort_by == 'Val' else "")
+    # Ask for one extra row to know whether there is a next page
+    query = f"""
+        SELECT TOP (?) {select}
+        FROM {FLOAT_TABLE}
+        WHERE {where}
+        ORDER BY {', '.join(f'{column} {direction}' for column in key_columns)}
+    """
+    df = read_sql(query, [page_size + 1] + params)
+    if df.empty:
+        return typed_raw_frame([], [], []), None
+    page = df.iloc[:page_size]
+    next_key = report_page_key(df.iloc[page_size - 1], sort_by) if len(df) > page_size else None
+    return typed_raw_frame(page['DateAndTime'].to_numpy(), page['TagIndex'].to_numpy(), page['Val'].to_numpy()), next_key
+
+
+# Per-bucket min/max/avg of one TagIndex, computed by SQL Server so only one row
+# per bucket crosses the wire whatever the length of the range
+def _sql_bucketed(start_datetime, end_datetime, tag_index, buckets):
+    seconds = max((pd.Timestamp(end_datetime) - pd.Timestamp(start_datetime)).total_seconds(), 1)
+    width = max(int(-(-seconds // buckets)), 1)
+    query = f"""
+        SELECT MIN(DateAndTime) AS DateAndTime, MIN(Val) AS MinVal, MAX(Val) AS MaxVal,
+               AVG(Val) AS AvgVal, COUNT(*) AS Samples
+        FROM (
+            SELECT DateAndTime, Val, DATEDIFF(second, ?, DateAndTime) / ? AS Bucket
+            FROM {FLOAT_TABLE}
+            WHERE TagIndex = ? AND DateAndTime BETWEEN ? AND ?
+        ) b
+        GROUP BY Bucket
+        ORDER BY Bucket
+    """
+    return read_sql(query, [start_datetime, width, int(tag_index), start_datetime, end_datetime])
+
+
+# One TagIndex over [start_datetime, end_datetime] reduced to at most `buckets`
+# time buckets (DateAndTime, MinVal, MaxVal, AvgVal, Samples). When the range holds
+# few enough samples the raw points are returned instead, one per row.
+def fetch_downsampled(start_datetime, end_datetime, tag_index, buckets):
+    mirror = _mirror()
+    hwm = mirror.high_water_mark() if mirror is not None else None
+    if hwm is not None and hwm >= start_datetime:
+        # Raw rows are cheap to read locally, so bucket them in NumPy
+        raw = fetch_raw_range(start_datetime, end_datetime, [tag_index])
+        df = minmax_buckets(raw['DateAndTime'], raw['Val'], start_datetime, end_datetime, buckets)
+    else:
+        raw = None
+        df = _sql_bucketed(start_datetime, end_datetime, tag_index, buckets)
+
+    if df['Samples'].sum() > buckets * 2:
+        return df
+    if raw is None:
+        raw = fetch_raw_range(start_datetime, end_datetime, [tag_index])
+    return pd.DataFrame({'DateAndTime': raw['DateAndTime'], 'MinVal': raw['Val'], 'MaxVal': raw['Val'],
+                         'AvgVal': raw['Val'], 'Samples': 1})
+
+
+# Cached version of query_snapshots
+def fetch_data(startdate, enddate, hour, tag_index_list):
+    tag_index_list = sorted(set(int(t) for t in tag_index_list))
+    if not tag_index_list:
+        return pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+
+    # Tag order and duplicates don't change the result, so they don't change the key
+    key = (startdate, enddate, int(hour), tuple(tag_index_list))
+    cached = _fetch_cache.get(key)
+    if cached is not None:
+        with span("fetch_data.cache_hit") as s:
+            s["rows"] = len(cached)
+            return cached.copy()
+
+    # Sessions asking for the same key at once share one query
+    def query():
+        with span("fetch_data.query") as s:
+            df = query_snapshots(startdate, enddate, hour, tag_index_list)
+            s["rows"], s["bytes"] = len(df), frame_bytes(df)
+        return df
+
+    df = _fetch_cache.get_or_compute(key, query)
+    # Callers clean the frame in place, so never hand out the cached object itself
+    return df.copy()
+
+
+# Fetch fetch_data results per tag group on worker threads and yield
+# (tag group, frame) pairs as each one finishes, so callers can show the first
+# parameter without waiting for the slowest one. The shared executor caps how many
+# of these queries are in flight across all sessions; keep it below the DB pool size.
+def fetch_data_concurrently(startdate, enddate, hour, tag_index_list, group_size=1):
+    tag_index_list = sorted(set(int(t) for t in tag_index_list))
+    groups = [tag_index_list[i:i + group_size] for i in range(0, len(tag_index_list), group_size)]
+    futures = {_fetch_executor.submit(in_current_context(fetch_data), startdate, enddate, hour, group): group
+               for group in groups}
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # Don't leave queued queries behind if the caller stops early
+        for future in futures:
+            future.cancel()
+
+
+# A day's snapshot can't change once its hour has passed (plus a little time
+# for the historian to finish writing)
+def snapshot_is_final(day, hour, now):
+    return datetime.combine(day, time(int(hour))) + timedelta(hours=1) + SNAPSHOT_SETTLE <= now
+
+
+# Missing (day, tag) cells grouped into queries: each tag's missing days split into runs
+# of consecutive days, and the tags with the same run share one query. Returns
+# (first day, last day, tags) per query, so a new tag or an old gap only asks for itself.
+def _snapshot_runs(missing):
+    tag_days = {}
+    for day, tag in missing:
+        tag_days.setdefault(tag, []).append(day)
+    runs = {}
+    for tag, days in sorted(tag_days.items()):
+        days = sorted(days)
+        first = days[0]
+        for previous, day in zip(days, days[1:] + [None]):
+            if day is None or day - previous > timedelta(days=1):
+                runs.setdefault((first, previous), []).append(tag)
+                first = day
+    return [(first, last, tags) for (first, last), tags in sorted(runs.items())]
+
+
+# Same result as fetch_data, but built from a per-(Date, TagIndex) store that
+# only ever queries the days/tags it hasn't seen yet plus the still-open day.
+# Those queries go through fetch_data, so sessions and processes share them too.
+def fetch_daily_snapshots(startdate, enddate, hour, tag_index_list):
+    hour = int(hour)
+    tag_index_list = sorted(set(int(t) for t in tag_index_list))
+    days = list(pd.date_range(startdate, enddate).date)
+    if not tag_index_list or not days:
+        return pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+
+    snapshots, missing = {}, []
+    for day in days:
+        for tag in tag_index_list:
+            snapshot = _daily_store.get((hour, day, tag), _NOT_STORED)
+            if snapshot is _NOT_STORED:
+                missing.append((day, tag))
+            else:
+                snapshots[(day, tag)] = snapshot
+
+    for first, last, tags in _snapshot_runs(missing):
+        df = fetch_data(first, last, hour, tags)
+        for day, date_and_time, tag, val in zip(pd.to_datetime(df['Date']).dt.date, df['DateAndTime'],
+                                                df['TagIndex'], df['Val']):
+            snapshots[(day, int(tag))] = (date_and_time, val)
+    # Remember closed days even when they had no value, so they aren't asked for again
+    now = datetime.now()
+    for day, tag in missing:
+        if snapshot_is_final(day, hour, now):
+            _daily_store.put((hour, day, tag), snapshots.get((day, tag)))
+
+    rows = []
+    for day in days:
+        for tag in tag_index_list:
+            snapshot = snapshots.get((day, tag))
+            if snapshot is not None:
+                rows.append((day, snapshot[0], tag, snapshot[1]))
+    return pd.DataFrame(rows, columns=SNAPSHOT_COLUMNS)
+
+
+def clear_cache():
+    _fetch_cache.clear()
+    _daily_store.clear()
@@ -0,0 +1,344 @@
+import importlib.util
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import pandas as pd
+
+from DB_Query import DEFAULT_SNAPSHOT_HOUR, REPORT_SORT_KEYS, SNAPSHOT_SETTLE, iter_raw_range, report_page_key, snapshot_is_final
+from Query_Cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# What the KPI and REPORT pages show by default only changes once a day, when the
+# snapshot hour has closed. This job builds it then (the KPI data, anomalies and both
+# renderings per pot, and the previous day's report rows and CSV, midnight to midnight) into a new version
+# directory, data/artifacts/<day>-<time>/, and points current.json at it. The pages
+# serve ranges inside the built window from there and only query anything else.
+# The report rows are streamed to disk and read back a page at a time, never held whole.
+ARTIFACT_DIR = os.path.join("data", "artifacts")
+CURRENT_FILE = os.path.join(ARTIFACT_DIR, "current.json")
+MANIFEST_FILE = "manifest.json"
+ARTIFACT_FORMAT = 2    # Bump when the layout changes; builds of another format are ignored
+VERSIONS_KEPT = 7
+KPI_DAYS = 15          # The KPI page's default range
+KPI_HOUR = DEFAULT_SNAPSHOT_HOUR
+REPORT_CSV_FORMAT = "CSV (gzip)"
+
+# Pages look for a new build at most this often
+_manifest_cache = TTLCache(ttl=60, max_entries=1)
+
+
+# Newest day whose KPI_HOUR snapshot can no longer change
+def snapshot_day(now=None):
+    now = now or datetime.now()
+    return now.date() if snapshot_is_final(now.date(), KPI_HOUR, now) else now.date() - timedelta(days=1)
+
+
+# When the snapshot of the day after `day` settles, i.e. when the next build is due
+def next_build_time(day):
+    return datetime.combine(day + timedelta(days=1), datetime.min.time()) + timedelta(hours=KPI_HOUR + 1) + SNAPSHOT_SETTLE
+
+
+def _write_pickle(path, value):
+    with open(path, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _build_kpi(directory, day):
+    from KPI_Render import BACKEND_PLOTLY, BACKEND_PNG, kpi_data, render_kpi
+    from Tag_Registry import get_registry
+
+    registry = get_registry()
+    start = day - timedelta(days=KPI_DAYS)
+    pots = {}
+    for i, pot in enumerate(registry.pots()):
+        tags = registry.for_pot(pot)
+        trend_data, anomalies = kpi_data(start, day, KPI_HOUR, tags)
+        files = {"data": f"kpi_{i}.pkl"}
+        _write_pickle(os.path.join(directory, files["data"]), (trend_data, anomalies))
+        if not trend_data.empty:
+            files["png"] = f"kpi_{i}.png"
+            with open(os.path.join(directory, files["png"]), "wb") as f:
+                f.write(render_kpi(trend_data, tags.names.values(), BACKEND_PNG, anomalies))
+            files["plotly"] = f"kpi_{i}.plotly.json"
+            with open(os.path.join(directory, files["plotly"]), "w") as f:
+                f.write(render_kpi(trend_data, tags.names.values(), BACKEND_PLOTLY, anomalies).to_json())
+        pots[pot] = files
+    return {"start": start.isoformat(), "end": day.isoformat(), "hour": KPI_HOUR, "pots": pots}
+
+
+# Frames of a Parquet file, one row group batch at a time
+def _parquet_frames(path, batch_size):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield batch.to_pandas()
+
+
+# The previous day's rows, newest first, streamed from the database into report.parquet
+# (the table pages are read from it) and from there into the CSV download. Without
+# pyarrow only the CSV is built and the table pages are queried.
+def _build_report(directory, day):
+    from Report_Export import EXPORT_BATCH_ROWS, EXPORT_FORMATS, write_frames
+
+    start = datetime.combine(day - timedelta(days=1), datetime.min.time())
+    end = start + timedelta(days=1)
+    rows = [0]
+
+    def counted(frames):
+        for frame in frames:
+            rows[0] += len(frame)
+            yield frame
+
+    frames = counted(iter_raw_range(start, end, newest_first=True, batch_size=EXPORT_BATCH_ROWS))
+    files = {"csv": f"report.{EXPORT_FORMATS[REPORT_CSV_FORMAT][0]}"}
+    if importlib.util.find_spec("pyarrow") is not None:
+        files["table"] = "report.parquet"
+        write_frames(os.path.join(directory, files["table"]), frames, "Parquet")
+        frames = _parquet_frames(os.path.join(directory, files["table"]), EXPORT_BATCH_ROWS)
+    write_frames(os.path.join(directory, files["csv"]), frames, REPORT_CSV_FORMAT)
+    return {"start": start.isoformat(), "end": end.isoformat(), "rows": rows[0], **files}
+
+
+def _current_version():
+    try:
+        with open(CURRENT_FILE) as f:
+            return json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# Keep the `keep` most recently built versions, and always the current one (a build for
+# an older day is still the newest build)
+def _prune(keep):
+    def built(name):
+        try:
+            return os.path.getmtime(os.path.join(ARTIFACT_DIR, name, MANIFEST_FILE))
+        except OSError:
+            return 0
+
+    current = _current_version()
+    versions = sorted((name for name in os.listdir(ARTIFACT_DIR)
+                       if os.path.isdir(os.path.join(ARTIFACT_DIR, name)) and not name.endswith(".tmp")),
+                      key=built)
+    for name in versions[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(ARTIFACT_DIR, name), ignore_errors=True)
+
+
+# Build the artifacts for the snapshot of `day` (default: the newest settled one) as a
+# new version and make it current. Returns the version name.
+def build(day=None):
+    day = day or snapshot_day()
+    version = f"{day:%Y-%m-%d}-{datetime.now():%H%M%S}"
+    directory = os.path.join(ARTIFACT_DIR, version)
+    building = directory + ".tmp"
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    started = time.perf_counter()
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "version": version,
+        "day": day.isoformat(),
+        "built": datetime.now().isoformat(timespec="seconds"),
+        "kpi": _build_kpi(building, day),
+        "report": _build_report(building, day),
+    }
+    with open(os.path.join(building, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(building, directory)
+
+    # Switch the pages over in one rename
+    current = CURRENT_FILE + ".tmp"
+    with open(current, "w") as f:
+        json.dump({"version": version}, f)
+    os.replace(current, CURRENT_FILE)
+    _manifest_cache.clear()
+    _prune(VERSIONS_KEPT)
+    logger.info("Built artifacts %s in %.1fs", version, time.perf_counter() - started)
+    return version
+
+
+def _read_manifest():
+    version = _current_version()
+    if version is None:
+        return None
+    try:
+        with open(os.path.join(ARTIFACT_DIR, version, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format") == ARTIFACT_FORMAT else None
+
+
+# Manifest of the current build (None when nothing has been built yet)
+def current_manifest():
+    return _manifest_cache.get_or_compute("current", _read_manifest)
+
+
+# KPI artifact files never change once written (a rebuild is a new version directory),
+# so each one is read once per process
+@lru_cache(maxsize=32)
+def _load(version, name):
+    path = os.path.join(ARTIFACT_DIR, version, name)
+    if name.endswith(".pkl"):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    if name.endswith(".json"):
+        import plotly.io as pio
+
+        with open(path) as f:
+            return pio.from_json(f.read())
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# The KPI page's (trend_data, anomalies, figures) for a pot and range, when it lies inside
+# the built window; figures (backend -> PNG bytes / Plotly figure, anomalies drawn) only
+# when the range is the whole window. None when the range has to be fetched instead.
+def kpi_artifact(pot, start_date, end_date, hour):
+    from KPI_Render import BACKEND_PLOTLY, BACKEND_PNG
+
+    manifest = current_manifest()
+    if manifest is None:
+        return None
+    kpi = manifest["kpi"]
+    files = kpi["pots"].get(pot)
+    start, end = date.fromisoformat(kpi["start"]), date.fromisoformat(kpi["end"])
+    if files is None or int(hour) != kpi["hour"] or start_date < start or end_date > end or start_date > end_date:
+        return None
+
+    version = manifest["version"]
+    trend_data, anomalies = _load(version, files["data"])
+    if (start_date, end_date) == (start, end):
+        figures = {backend: _load(version, files[name])
+                   for backend, name in [(BACKEND_PNG, "png"), (BACKEND_PLOTLY, "plotly")] if name in files}
+        return trend_data.copy(), anomalies.copy(), figures
+    days = pd.to_datetime(trend_data['Date']).dt.date
+    flagged_days = pd.to_datetime(anomalies['DateAndTime']).dt.date
+    return (trend_data[(days >= start_date) & (days <= end_date)].copy(),
+            anomalies[(flagged_days >= start_date) & (flagged_days <= end_date)].copy(), {})
+
+
+# The built report window as (start, end), or None
+def report_window():
+    manifest = current_manifest()
+    if manifest is None:
+        return None
+    report = manifest["report"]
+    return datetime.fromisoformat(report["start"]), datetime.fromisoformat(report["end"])
+
+
+# Value of each report keyset column (DB_Query.REPORT_SORT_KEYS) in the report file
+def _key_field(column):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if column == 'ROUND(Val, 2)':
+        return pc.round(pc.field('Val').cast(pa.float64()), 2)
+    return pc.field(column)
+
+
+# Same (page, next key) as DB_Query.fetch_report_page, read from the built report file
+# when [start_datetime, end_datetime] lies inside its window (None otherwise). Filters and
+# the keyset condition are pushed down to the Parquet reader; the default order
+# (newest first) is the file's own, so that page stops reading once it is full.
+def report_page(start_datetime, end_datetime, tag_index_list, page_size, sort_by='DateAndTime',
+                descending=True, after=None):
+    window = report_window()
+    if window is None or start_datetime < window[0] or end_datetime > window[1]:
+        return None
+    manifest = current_manifest()
+    if "table" not in manifest["report"]:
+        return None
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    key_columns = REPORT_SORT_KEYS[sort_by]
+    expr = (pc.field('DateAndTime') >= start_datetime) & (pc.field('DateAndTime') <= end_datetime)
+    if tag_index_list:
+        expr &= pc.field('TagIndex').isin(sorted(set(int(t) for t in tag_index_list)))
+    if sort_by == 'Val':
+        expr &= pc.field('Val').is_valid()
+    if after is not None:
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), built from the last column out
+        beyond = None
+        for column, value in reversed(list(zip(key_columns, after))):
+            key = _key_field(column)
+            past = key < value if descending else key > value
+            beyond = past if beyond is None else past | ((key == value) & beyond)
+        expr &= beyond
+
+    dataset = ds.dataset(os.path.join(ARTIFACT_DIR, manifest["version"], manifest["report"]["table"]),
+                         format="parquet")
+    if sort_by == 'DateAndTime' and descending:
+        table = dataset.head(page_size + 1, filter=expr)
+    else:
+        table = dataset.to_table(filter=expr)
+        if sort_by == 'Val':
+            # Rounded the same way as the keyset condition above, and kept for the next key
+            table = table.append_column('RoundedVal', pc.round(table['Val'].cast('float64'), 2))
+        keys = ['RoundedVal' if column == 'ROUND(Val, 2)' else column for column in key_columns]
+        order = 'descending' if descending else 'ascending'
+        indices = pc.sort_indices(table, sort_keys=[(key, order) for key in keys])[:page_size + 1]
+        table = table.take(indices)
+    rows = table.to_pandas()
+    next_key = report_page_key(rows.iloc[page_size - 1], sort_by) if len(rows) > page_size else None
+    return rows[['DateAndTime', 'TagIndex', 'Val']].iloc[:page_size].reset_index(drop=True), next_key
+
+
+# The built report window's export file as (file name, path), or None. Nothing is
+# read here; pass the path to read_artifact when the file is actually downloaded.
+def report_csv():
+    manifest = current_manifest()
+    if manifest is None:
+        return None
+    report = manifest["report"]
+    day = datetime.fromisoformat(report["start"]).date()
+    extension = report["csv"].split(".", 1)[1]
+    return (f"technical_parameters_{day:%Y-%m-%d}.{extension}",
+            os.path.join(ARTIFACT_DIR, manifest["version"], report["csv"]))
+
+
+def read_artifact(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# Rebuild after every snapshot hour:  python Daily_Artifacts.py
+# Build once and exit:                python Daily_Artifacts.py --once [--day YYYY-MM-DD]
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute the KPI and report pages' daily artifacts")
+    parser.add_argument("--once", action="store_true", help="Build once and exit")
+    parser.add_argument("--day", type=date.fromisoformat, help="Snapshot day to build for (with --once)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.once:
+        build(args.day)
+        raise SystemExit
+
+    built = None
+    while True:
+        day = snapshot_day()
+        manifest = current_manifest()
+        if manifest is not None and manifest["day"] == day.isoformat():
+            built = day
+        else:
+            try:
+                build(day)
+                built = day
+            except Exception:
+                logger.exception("Artifact build failed")
+        # Sleep until the next snapshot has settled (retry a failed build sooner)
+        wake = next_build_time(day) if built == day else datetime.now() + timedelta(minutes=10)
+        time.sleep(max((wake - datetime.now()).total_seconds(), 1))
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+# Points per chart: about two per horizontal pixel is all a browser can show
+DEFAULT_CHART_WIDTH_PX = 1200
+
+
+def buckets_for_width(width_px):
+    return max(int(width_px) // 2, 10)
+
+
+# Largest-Triangle-Three-Buckets: pick `threshold` points that keep the visual
+# shape of the (x, y) series. x must be sorted; datetime64 x is supported.
+# Returns the indices of the kept points.
+def lttb(x, y, threshold):
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[us]').astype('int64')
+    x = x.astype('float64')
+    y = np.asarray(y, dtype='float64')
+
+    # First and last point are always kept; the rest is split into threshold - 2 buckets
+    every = (n - 2) / (threshold - 2)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # Average point of the next bucket (just the last point for the final bucket)
+        next_end = max(min(int((i + 2) * every) + 1, n), end + 1)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # Keep the point of this bucket forming the largest triangle with a and the average
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + (int(np.nanargmax(areas)) if np.isfinite(areas).any() else 0)
+        kept[i + 1] = a
+    return kept
+
+
+# Time-bucketed min/max/avg of a sorted series, the NumPy twin of
+# the SQL bucketing in DB_Query.fetch_downsampled. Empty buckets are dropped.
+def minmax_buckets(date_and_time, val, start_datetime, end_datetime, buckets):
+    t = pd.to_datetime(np.asarray(date_and_time)).to_numpy(dtype='datetime64[us]').astype('int64')
+    val = np.asarray(val, dtype='float64')
+    columns = ['DateAndTime', 'MinVal', 'MaxVal', 'AvgVal', 'Samples']
+    if len(t) == 0:
+        return pd.DataFrame(columns=columns)
+
+    start_us = pd.Timestamp(start_datetime).value // 1000
+    span_us = max(pd.Timestamp(end_datetime).value // 1000 - start_us, 1)
+    width_us = -(-span_us // buckets)  # ceil
+    bucket = (t - start_us) // width_us
+
+    # Rows are sorted by time, so each bucket is one contiguous run
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.r_[starts, len(t)])
+    return pd.DataFrame({
+        'DateAndTime': t[starts].astype('datetime64[us]'),
+        'MinVal': np.fmin.reduceat(val, starts),
+        'MaxVal': np.fmax.reduceat(val, starts),
+        'AvgVal': np.add.reduceat(np.nan_to_num(val), starts) / np.maximum(
+            np.add.reduceat(~np.isnan(val), starts), 1),
+        'Samples': counts,
+    })
@@ -0,0 +1,166 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from Perf_Metrics import span
+from Query_Cache import TTLCache
+from Trend_Chart import label_indices
+
+# Renderers for the KPI page
+BACKEND_PNG = "Image (Agg PNG)"
+BACKEND_PLOTLY = "Interactive (Plotly)"
+BACKENDS = [BACKEND_PNG, BACKEND_PLOTLY]
+
+PANEL_HEIGHT_IN = 2    # Height of one parameter panel in the PNG figure (inches)
+PANEL_HEIGHT_PX = 180  # Height of one parameter panel in the Plotly figure
+
+# Rendered figures keyed on (data hash, parameters, backend); reruns with the same
+# data get the same PNG bytes / figure back without drawing anything
+_figure_cache = TTLCache(ttl=900, max_entries=32)
+
+
+def _data_key(trend_data):
+    if trend_data is None:
+        return None
+    hashed = pd.util.hash_pandas_object(trend_data[['DateAndTime', 'Parameter', 'Val']], index=False)
+    return (len(trend_data), int(hashed.sum()))
+
+
+# y-axis range padded by the data spread on both sides (None when there is no data)
+def _y_range(val):
+    if len(val) == 0:
+        return None
+    y_min, y_max = val.min(), val.max()
+    y_padding = (y_max - y_min)
+    if y_padding == 0:
+        y_padding = abs(y_max) * 0.05 or 1
+    return [y_min - y_padding, y_max + y_padding]
+
+
+def _series(trend_data, parameters):
+    # One groupby pass instead of a boolean mask per parameter
+    groups = dict(tuple(trend_data.groupby('Parameter', sort=False)))
+    for parameter in parameters:
+        param_data = groups.get(parameter)
+        if param_data is None:
+            yield parameter, np.array([], dtype='datetime64[ns]'), np.array([])
+        else:
+            yield parameter, param_data['DateAndTime'].to_numpy(), param_data['Val'].to_numpy()
+
+
+# Flagged points per parameter (empty series when there are none)
+def _flagged(anomalies, parameters):
+    if anomalies is None:
+        anomalies = pd.DataFrame(columns=['DateAndTime', 'Parameter', 'Val'])
+    return _series(anomalies, parameters)
+
+
+# All parameters as one multi-panel Agg figure with a shared date axis, returned as PNG bytes.
+# The Figure is created without pyplot, so nothing is kept in pyplot's figure registry.
+def _render_png(trend_data, parameters, anomalies):
+    from matplotlib.figure import Figure
+    import matplotlib.dates as mdates
+
+    n = len(parameters)
+    fig = Figure(figsize=(10, PANEL_HEIGHT_IN * n))
+    axes = np.atleast_1d(fig.subplots(n, 1, sharex=True))
+    flagged = _flagged(anomalies, parameters)
+    for ax, (parameter, x, y), (_, fx, fy) in zip(axes, _series(trend_data, parameters), flagged):
+        ax.plot(x, y, marker='o', linestyle='-', color='b', label=parameter)
+        ax.scatter(fx, fy, s=120, facecolors='none', edgecolors='r', linewidths=2, zorder=3)
+        # Value labels where they can be read (every point of a sparse series, otherwise
+        # the lowest and highest point, as on the trend pages): one text artist per label
+        kept = label_indices(y)
+        for label, xi, yi in zip(np.char.mod('%g', y[kept].astype('float64')), x[kept], y[kept]):
+            ax.annotate(label, (xi, yi), textcoords="offset points", xytext=(0, 5),
+                        ha='center', fontsize=9, color='black')
+        ax.set_title(parameter)
+        ax.set_ylabel("Value")
+        y_range = _y_range(y)
+        if y_range is not None:
+            ax.set_ylim(y_range)
+        ax.grid(True)
+
+    # Formatting the shared x-axis (only the bottom panel shows tick labels)
+    axes[-1].set_xlabel("Date")
+    axes[-1].xaxis.set_major_locator(mdates.DayLocator())
+    axes[-1].xaxis.set_major_formatter(mdates.DateFormatter('%d'))
+    for label in axes[-1].get_xticklabels():
+        label.set_rotation(45)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100)
+    return buffer.getvalue()
+
+
+# All parameters as one Plotly figure with shared-x subplots, drawn in the browser
+def _render_plotly(trend_data, parameters, anomalies):
+    from plotly.subplots import make_subplots
+    import plotly.graph_objects as go
+
+    n = len(parameters)
+    fig = make_subplots(rows=n, cols=1, shared_xaxes=True, subplot_titles=parameters,
+                        vertical_spacing=min(0.3 / n, 0.05))
+    flagged = _flagged(anomalies, parameters)
+    for row, ((parameter, x, y), (_, fx, fy)) in enumerate(zip(_series(trend_data, parameters), flagged), start=1):
+        kept = label_indices(y)
+        labels = np.full(len(y), '', dtype=object)
+        labels[kept] = y[kept]
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines+markers+text', name=parameter, text=labels,
+                                 textposition='top center', textfont=dict(size=9, color='black'),
+                                 line=dict(color='blue')), row=row, col=1)
+        fig.add_trace(go.Scatter(x=fx, y=fy, mode='markers', name='Anomaly', hoverinfo='x+y',
+                                 marker=dict(color='red', size=12, symbol='circle-open', line=dict(width=2))),
+                      row=row, col=1)
+        y_range = _y_range(y)
+        if y_range is not None:
+            fig.update_yaxes(range=y_range, row=row, col=1)
+    fig.update_xaxes(showgrid=True, dtick=86400000, tickformat='%d')
+    fig.update_yaxes(showgrid=True)
+    fig.update_layout(height=PANEL_HEIGHT_PX * n, showlegend=False, margin=dict(l=0, r=0, t=30, b=30))
+    return fig
+
+
+# The KPI page's data for one pot: daily snapshots of all its tags, cleaned and named
+# (DateAndTime, TagIndex, Val, Parameter), and the points flagged as anomalies (same
+# columns plus Reason). Used by the page and by the daily artifact build.
+def kpi_data(start_date, end_date, hour, tags):
+    from Anomaly import AnomalyDetector
+    from DB_Query import fetch_daily_snapshots
+
+    # Only days/tags not seen before, plus today, are queried from the database
+    trend_data = fetch_daily_snapshots(start_date, end_date, hour, list(tags.indexes.values()))
+    with span("pandas.cleanup"):
+        trend_data['DateAndTime'] = pd.to_datetime(trend_data['DateAndTime'], errors='coerce')
+        trend_data['Val'] = pd.to_numeric(trend_data['Val'], errors='coerce')
+        trend_data.dropna(subset=['DateAndTime', 'Val'], inplace=True)
+        trend_data.sort_values(by='DateAndTime', inplace=True)
+    trend_data['Parameter'] = trend_data['TagIndex'].map(tags.names)
+
+    # Score every parameter at once against its limits and recent history
+    detector = AnomalyDetector(tags.limits())
+    detector.update(trend_data)
+    anomalies = detector.events.assign(Parameter=detector.events['TagIndex'].map(tags.names))
+    return trend_data, anomalies
+
+
+# Render every parameter of the KPI page at once. trend_data needs DateAndTime,
+# Parameter and Val columns; anomalies (same columns, optional) are circled in red.
+# Returns PNG bytes for BACKEND_PNG, a Plotly figure for BACKEND_PLOTLY.
+def render_kpi(trend_data, parameters, backend=BACKEND_PNG, anomalies=None):
+    parameters = list(parameters)
+    key = (_data_key(trend_data), tuple(parameters), backend, _data_key(anomalies))
+    cached = _figure_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with span("render.kpi", backend=backend) as s:
+        if backend == BACKEND_PLOTLY:
+            result = _render_plotly(trend_data, parameters, anomalies)
+        else:
+            result = _render_png(trend_data, parameters, anomalies)
+        s["rows"] = len(trend_data)
+    _figure_cache.put(key, result)
+    return result
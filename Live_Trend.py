@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from Anomaly import AnomalyDetector, anomaly_markers
+from DB_Query import fetch_raw_range, fetch_rows_after
+from Trend_Chart import line_trace
+
+# Live mode settings
+LIVE_REFRESH_SECONDS = [2, 5, 10, 30]
+LIVE_WINDOW_MINUTES = [15, 60, 240]
+LIVE_BUFFER_POINTS = 20_000  # Points kept per TagIndex
+
+
+# Fixed-size buffer of (timestamp, value) pairs; once full, new points overwrite the oldest
+class RingBuffer:
+    def __init__(self, capacity=LIVE_BUFFER_POINTS):
+        self.capacity = capacity
+        self.times = np.empty(capacity, dtype='datetime64[us]')
+        self.values = np.empty(capacity, dtype='float32')
+        self.start = 0
+        self.size = 0
+
+    def extend(self, times, values):
+        times = np.asarray(times, dtype='datetime64[us]')[-self.capacity:]
+        values = np.asarray(values, dtype='float32')[-self.capacity:]
+        n = len(times)
+        if n == 0:
+            return
+        positions = (self.start + self.size + np.arange(n)) % self.capacity
+        self.times[positions] = times
+        self.values[positions] = values
+        overflow = max(self.size + n - self.capacity, 0)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    # Contents oldest first
+    def view(self):
+        positions = (self.start + np.arange(self.size)) % self.capacity
+        return self.times[positions], self.values[positions]
+
+
+# Recent samples of a set of TagIndex values, kept up to date by polling only for
+# rows newer than the last timestamp already seen. New rows are also scored for
+# anomalies as they arrive, so history is never scored twice.
+class LiveTrend:
+    def __init__(self, tag_index_list, capacity=LIVE_BUFFER_POINTS, limits=None):
+        self.tag_index_list = sorted(set(int(t) for t in tag_index_list))
+        self.buffers = {tag: RingBuffer(capacity) for tag in self.tag_index_list}
+        self.last_seen = None
+        self.window = None
+        self.detector = AnomalyDetector(limits)
+
+    def append(self, df):
+        if df.empty:
+            return
+        self.detector.update(df)
+        for tag, tag_df in df.groupby('TagIndex', sort=False):
+            buffer = self.buffers.get(int(tag))
+            if buffer is not None:
+                buffer.extend(tag_df['DateAndTime'].to_numpy(), tag_df['Val'].to_numpy())
+        newest = pd.Timestamp(df['DateAndTime'].max()).to_pydatetime()
+        self.last_seen = newest if self.last_seen is None else max(self.last_seen, newest)
+
+    # Load the initial window (once)
+    def seed(self, window):
+        self.window = window
+        end = datetime.now()
+        self.append(fetch_raw_range(end - window, end, self.tag_index_list))
+        if self.last_seen is None:
+            self.last_seen = end - window
+
+    # Fetch and append only the rows after last_seen; returns how many arrived
+    def poll(self):
+        df = fetch_rows_after(self.last_seen, self.tag_index_list)
+        self.append(df)
+        return len(df)
+
+
+def _live_figure(live, tags, tag_names, window, title):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for tag in tags:
+        times, values = live.buffers[tag].view()
+        # Only draw the selected window even if the buffer holds more
+        keep = times >= np.datetime64(datetime.now() - window)
+        fig.add_trace(line_trace(times[keep], values[keep], tag_names.get(tag, str(tag))))
+        events = live.detector.events
+        fig.add_trace(anomaly_markers(events[events['DateAndTime'] >= datetime.now() - window], tag))
+    fig.update_layout(
+        title=title,
+        autosize=True,
+        margin=dict(l=0, r=0, t=50, b=50),
+        xaxis=dict(showgrid=True),
+        yaxis=dict(showgrid=True),
+        # Keep the user's zoom/pan while new points stream in
+        uirevision="live",
+    )
+    return fig
+
+
+def _live_body(state_key, tag_index_list, tag_names, window, separate, limits):
+    live = st.session_state.get(state_key)
+    if live is None or live.tag_index_list != sorted(set(tag_index_list)) or live.window != window:
+        live = LiveTrend(tag_index_list, limits=limits)
+        live.seed(window)
+        st.session_state[state_key] = live
+    else:
+        live.poll()
+
+    if live.last_seen is not None:
+        st.caption(f"Live — last sample {live.last_seen:%Y-%m-%d %H:%M:%S}")
+    if separate:
+        for tag in live.tag_index_list:
+            title = f"Trend of {tag_names.get(tag, str(tag))}"
+            st.plotly_chart(_live_figure(live, [tag], tag_names, window, title),
+                            use_container_width=True, key=f"{state_key}_{tag}")
+    else:
+        title = f"Trend of {', '.join(tag_names.get(t, str(t)) for t in live.tag_index_list)}"
+        st.plotly_chart(_live_figure(live, live.tag_index_list, tag_names, window, title),
+                        use_container_width=True, key=f"{state_key}_chart")
+
+
+# Live auto-refresh view. Only this fragment reruns every `refresh_seconds`: it polls
+# for the rows after the last one seen, appends them to the per-tag ring buffers and
+# redraws the charts in place (same keys, so Streamlit updates the existing elements).
+def render_live_trend(state_key, tag_index_list, tag_names, refresh_seconds, window_minutes, separate=False, limits=None):
+    if not tag_index_list:
+        st.write("Select at least one parameter.")
+        return
+    window = timedelta(minutes=window_minutes)
+    st.fragment(run_every=refresh_seconds)(_live_body)(state_key, tag_index_list, tag_names, window, separate, limits)
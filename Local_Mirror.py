@@ -0,0 +1,383 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from DB_Pool import pooled_conn
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # The mirror is optional; without pyarrow every read goes to SQL Server
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Local copy of FloatTable, one Parquet directory per Date (data/mirror/Date=2025-02-01/...).
+# The manifest lists the files that make up each day and the high-water mark they were
+# synced up to. It is replaced in one rename, so new rows and the mark that covers them
+# become visible together, and readers only open the files it lists: a sync or a
+# compaction that dies half way leaves unlisted files behind (removed later), never
+# rows that are read twice.
+MIRROR_DIR = os.path.join("data", "mirror")
+MANIFEST_FILE = "_manifest.json"
+MANIFEST_FORMAT = 1
+MIRROR_COLUMNS = ['DateAndTime', 'Date', 'Hour', 'TagIndex', 'Val']
+
+SYNC_BATCH_ROWS = 200_000
+SYNC_INTERVAL_SECONDS = 60
+# Don't mirror the last couple of minutes; the historian may still be writing them
+SYNC_LAG = timedelta(minutes=2)
+# Times a read starts over with a new manifest when a file it listed was compacted away
+READ_ATTEMPTS = 3
+# Only one process syncs and compacts at a time (the app's background thread in each
+# Streamlit process, the CLI job). The holder refreshes the lock file after every batch;
+# one not refreshed for this long was left by a process that died.
+LOCK_FILE = "_sync.lock"
+LOCK_STALE_SECONDS = 600
+
+_sync_lock = threading.Lock()
+_thread_lock = threading.Lock()
+_sync_thread = None
+
+# Last manifest read, with the (path, inode, mtime, size) it was read at
+_manifest_cache = (None, None)
+_manifest_lock = threading.Lock()
+
+
+def _schema():
+    return pa.schema([
+        ('DateAndTime', pa.timestamp('us')),
+        ('Hour', pa.int8()),
+        ('TagIndex', pa.int32()),
+        ('Val', pa.float64()),
+    ])
+
+
+def _day_dir(day):
+    return os.path.join(MIRROR_DIR, f"Date={day}")
+
+
+# The current manifest, {"format", "high_water_mark", "days": {"YYYY-MM-DD": [file, ...]}},
+# or None before the first sync. Only read again once it has been replaced. Shared
+# between callers, so never changed in place.
+def _read_manifest():
+    global _manifest_cache
+    path = os.path.join(MIRROR_DIR, MANIFEST_FILE)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _manifest_lock:
+        if _manifest_cache[0] == key:
+            return _manifest_cache[1]
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return None
+    with _manifest_lock:
+        _manifest_cache = (key, manifest)
+    return manifest
+
+
+def _write_manifest(manifest):
+    # Write then rename so readers never see a half written manifest
+    path = os.path.join(MIRROR_DIR, MANIFEST_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+# Newest DateAndTime that is fully copied into the mirror (None before the first sync)
+def high_water_mark():
+    manifest = _read_manifest()
+    return datetime.fromisoformat(manifest["high_water_mark"]) if manifest is not None else None
+
+
+def available():
+    return pa is not None and high_water_mark() is not None
+
+
+# Write rows into a new file per day; returns {day: file name}. The files stay
+# invisible to readers until _commit lists them.
+def _write_rows(rows):
+    df = pd.DataFrame.from_records([tuple(row) for row in rows], columns=MIRROR_COLUMNS)
+    df['DateAndTime'] = pd.to_datetime(df['DateAndTime'])
+    df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+    df['Val'] = pd.to_numeric(df['Val'], errors='coerce')
+    written = {}
+    for day, day_df in df.groupby('Date'):
+        table = pa.Table.from_pandas(day_df.drop(columns='Date'), schema=_schema(), preserve_index=False)
+        os.makedirs(_day_dir(day), exist_ok=True)
+        written[day] = f"part-{uuid.uuid4().hex}.parquet"
+        pq.write_table(table, os.path.join(_day_dir(day), written[day]))
+    return written
+
+
+# List newly written files and move the high-water mark over them, in one rename
+def _commit(manifest, written, hwm):
+    for day, name in written.items():
+        manifest["days"].setdefault(day, []).append(name)
+    manifest["high_water_mark"] = pd.Timestamp(hwm).to_pydatetime().isoformat()
+    _write_manifest(manifest)
+
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            # Still open somewhere or already gone; an unlisted file is removed next time
+            pass
+
+
+# Each sync adds a small file per day; merge the files of days that are complete.
+# The merged file replaces them in the manifest first and they are removed after,
+# so a reader sees either the old files or the merged one, never both.
+def _compact_closed_days(manifest, hwm):
+    retired = []
+    for day, files in manifest["days"].items():
+        if day >= hwm.strftime('%Y-%m-%d') or not os.path.isdir(_day_dir(day)):
+            continue
+        part_dir = _day_dir(day)
+        # Files no manifest lists were left by a sync or compaction that died; no sync
+        # writes to a closed day any more, so they can go
+        retired += [os.path.join(part_dir, f) for f in os.listdir(part_dir)
+                    if f.endswith(".parquet") and f not in files]
+        if len(files) < 2:
+            continue
+        table = pq.read_table([os.path.join(part_dir, f) for f in files], schema=_schema())
+        table = table.sort_by([('TagIndex', 'ascending'), ('DateAndTime', 'ascending')])
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        tmp = os.path.join(part_dir, "_compacted.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, os.path.join(part_dir, name))
+        manifest["days"][day] = [name]
+        retired += [os.path.join(part_dir, f) for f in files]
+    _write_manifest(manifest)
+    _remove(retired)
+
+
+# Take the cross-process sync lock; False when another live process holds it
+def _acquire_lock_file():
+    path = os.path.join(MIRROR_DIR, LOCK_FILE)
+    for attempt in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = os.path.getmtime(path) < time.time() - LOCK_STALE_SECONDS
+            except OSError:
+                # Released in the meantime
+                continue
+            if not stale:
+                return False
+            logger.warning("Removing mirror sync lock left by a process that died")
+            _remove([path])
+            continue
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        return True
+    return False
+
+
+def _refresh_lock_file():
+    try:
+        os.utime(os.path.join(MIRROR_DIR, LOCK_FILE))
+    except OSError:
+        pass
+
+
+# Copy every FloatTable row newer than the high-water mark into the mirror.
+# Returns the number of rows copied (0 when another process is syncing right now).
+def sync_once(batch_rows=SYNC_BATCH_ROWS):
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the local FloatTable mirror")
+
+    with _sync_lock:
+        os.makedirs(MIRROR_DIR, exist_ok=True)
+        if not _acquire_lock_file():
+            logger.info("Another process is syncing the mirror; skipping this sync")
+            return 0
+        try:
+            return _sync_locked(batch_rows)
+        finally:
+            _remove([os.path.join(MIRROR_DIR, LOCK_FILE)])
+
+
+# sync_once's work, run while holding the sync lock
+def _sync_locked(batch_rows):
+    from DB_Query import FLOAT_TABLE
+
+    current = _read_manifest()
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "high_water_mark": current["high_water_mark"] if current else datetime(1900, 1, 1).isoformat(),
+        "days": {day: list(files) for day, files in current["days"].items()} if current else {},
+    }
+    hwm = datetime.fromisoformat(manifest["high_water_mark"])
+    cutoff = datetime.now() - SYNC_LAG
+    query = f"""
+        SELECT DateAndTime, Date, Hour, TagIndex, Val
+        FROM {FLOAT_TABLE}
+        WHERE DateAndTime > ? AND DateAndTime <= ?
+        ORDER BY DateAndTime
+    """
+    synced = 0
+    carry = []
+    with pooled_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, [hwm, cutoff])
+        while True:
+            fetched = cursor.fetchmany(batch_rows)
+            rows = carry + fetched
+            if not rows:
+                break
+            if fetched:
+                # Hold back rows sharing the last timestamp, so the mark never
+                # splits one timestamp across two batches
+                last = rows[-1][0]
+                split = len(rows)
+                while split > 0 and rows[split - 1][0] == last:
+                    split -= 1
+                if split == 0:
+                    carry = rows
+                    continue
+                rows, carry = rows[:split], rows[split:]
+            else:
+                carry = []
+            _commit(manifest, _write_rows(rows), rows[-1][0])
+            _refresh_lock_file()
+            synced += len(rows)
+            if not fetched:
+                break
+        cursor.close()
+
+    # Everything up to the cutoff is now mirrored
+    _commit(manifest, {}, cutoff)
+    _compact_closed_days(manifest, cutoff)
+    return synced
+
+
+def _sync_forever(interval):
+    while True:
+        try:
+            synced = sync_once()
+            logger.info("Mirrored %d FloatTable rows", synced)
+        except Exception:
+            logger.exception("FloatTable mirror sync failed")
+        time.sleep(interval)
+
+
+# Start the sync loop on a daemon thread (once per process)
+def start_background_sync(interval=SYNC_INTERVAL_SECONDS):
+    global _sync_thread
+    with _thread_lock:
+        if _sync_thread is None or not _sync_thread.is_alive():
+            _sync_thread = threading.Thread(target=_sync_forever, args=(interval,),
+                                            name="floattable-mirror-sync", daemon=True)
+            _sync_thread.start()
+
+
+# One day's rows matching `expr`, from the files the manifest lists (None when the day
+# isn't mirrored). Compaction may remove a listed file after the manifest was read; the
+# read then starts over with the manifest that replaced it.
+def _read_day(day, expr, columns=None):
+    for attempt in range(READ_ATTEMPTS):
+        manifest = _read_manifest()
+        files = manifest["days"].get(day) if manifest is not None else None
+        if not files:
+            return None
+        try:
+            dataset = ds.dataset([os.path.join(_day_dir(day), f) for f in files], format="parquet", schema=_schema())
+            return dataset.to_table(columns=columns, filter=expr)
+        except FileNotFoundError:
+            if attempt == READ_ATTEMPTS - 1:
+                raise
+
+
+def _days(start_datetime, end_datetime):
+    return pd.date_range(start_datetime.normalize(), end_datetime.normalize(), freq='D').strftime('%Y-%m-%d')
+
+
+def _time_filter(start_datetime, end_datetime, tag_index_list):
+    expr = ((ds.field('DateAndTime') >= pa.scalar(start_datetime.to_pydatetime(), pa.timestamp('us')))
+            & (ds.field('DateAndTime') <= pa.scalar(end_datetime.to_pydatetime(), pa.timestamp('us'))))
+    if tag_index_list:
+        expr = expr & ds.field('TagIndex').isin([int(t) for t in tag_index_list])
+    return expr
+
+
+# Read mirrored rows. Only the day files of the range are opened, and the TagIndex
+# and Hour filters are pushed down to the Parquet reader.
+def read_range(start_datetime, end_datetime, tag_index_list=None, hour=None):
+    start_datetime = pd.Timestamp(start_datetime)
+    end_datetime = pd.Timestamp(end_datetime)
+    expr = _time_filter(start_datetime, end_datetime, tag_index_list)
+    if hour is not None:
+        expr = expr & (ds.field('Hour') == int(hour))
+
+    tables = [_schema().empty_table().append_column('Date', pa.array([], pa.string()))]
+    for day in _days(start_datetime, end_datetime):
+        table = _read_day(day, expr)
+        if table is not None and table.num_rows:
+            tables.append(table.append_column('Date', pa.array([day] * table.num_rows, pa.string())))
+    df = pa.concat_tables(tables).select(MIRROR_COLUMNS).to_pandas()
+    df['Date'] = pd.to_datetime(df['Date']).dt.date
+    return df
+
+
+# Mirrored rows one day at a time (each day sorted by DateAndTime, TagIndex), so
+# long ranges can be streamed without loading them whole
+def iter_days(start_datetime, end_datetime, tag_index_list=None, newest_first=False):
+    start_datetime = pd.Timestamp(start_datetime)
+    end_datetime = pd.Timestamp(end_datetime)
+    days = _days(start_datetime, end_datetime)
+    if newest_first:
+        days = days[::-1]
+    expr = _time_filter(start_datetime, end_datetime, tag_index_list)
+
+    for day in days:
+        table = _read_day(day, expr)
+        if table is None or table.num_rows == 0:
+            continue
+        order = 'descending' if newest_first else 'ascending'
+        table = table.sort_by([('DateAndTime', order), ('TagIndex', order)])
+        yield table.to_pandas()
+
+
+# Same result as DB_Query.query_snapshots, read from the mirror
+def snapshots(startdate, enddate, hour, tag_index_list):
+    df = read_range(datetime.combine(startdate, datetime.min.time()),
+                    datetime.combine(enddate, datetime.max.time()),
+                    tag_index_list, hour=hour)
+    df = df.sort_values('DateAndTime').drop_duplicates(['Date', 'TagIndex'], keep='last')
+    df['Val'] = df['Val'].round(2)
+    return df[['Date', 'DateAndTime', 'TagIndex', 'Val']].reset_index(drop=True)
+
+
+# Run the sync job on its own:  python Local_Mirror.py [--once] [--interval SECONDS]
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mirror MDR.dbo.FloatTable into local Parquet files")
+    parser.add_argument("--once", action="store_true", help="Sync once and exit")
+    parser.add_argument("--interval", type=int, default=SYNC_INTERVAL_SECONDS, help="Seconds between syncs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.once:
+        print(f"Mirrored {sync_once()} rows")
+    else:
+        _sync_forever(args.interval)
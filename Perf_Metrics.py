@@ -0,0 +1,221 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# Timing of every stage of a page rerun (connection, query, fetch, cleanup, render).
+# Each finished span is added to the current rerun's breakdown and to process-wide
+# totals, which are exposed as Prometheus text. Every rerun is also logged as one JSON
+# line on the "perf" logger (each span too, at DEBUG).
+logger = logging.getLogger("perf")
+
+# Serve the Prometheus text on http://<host>:<port>/metrics when this is set
+METRICS_PORT_ENV = "PERF_METRICS_PORT"
+RERUNS_KEPT = 20  # Past reruns kept per session for the panel
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_current = contextvars.ContextVar("perf_rerun", default=None)
+
+# Process-wide totals: stage -> [count, seconds, rows, bytes, bucket counts]
+_stage_totals = {}
+# page -> [reruns, seconds, bucket counts]
+_rerun_totals = {}
+_totals_lock = threading.Lock()
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=False).sum())
+
+
+def _bucket_counts(seconds):
+    return [1 if seconds <= bound else 0 for bound in LATENCY_BUCKETS]
+
+
+# Spans recorded during one rerun of one page
+class RerunTimings:
+    def __init__(self, page):
+        self.page = page
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.seconds = None
+        self.spans = []  # (stage, seconds, rows, bytes)
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, rows, nbytes):
+        with self._lock:
+            self.spans.append((stage, seconds, rows, nbytes))
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._started
+
+    # One row per stage: calls, total ms, rows and bytes, slowest first
+    def breakdown(self):
+        with self._lock:
+            df = pd.DataFrame(self.spans, columns=['Stage', 'Seconds', 'Rows', 'Bytes'])
+        if df.empty:
+            return pd.DataFrame(columns=['Stage', 'Calls', 'ms', 'Rows', 'Bytes'])
+        summary = df.groupby('Stage').agg(Calls=('Seconds', 'size'), ms=('Seconds', 'sum'),
+                                          Rows=('Rows', 'sum'), Bytes=('Bytes', 'sum'))
+        summary['ms'] = (summary['ms'] * 1000).round(1)
+        return summary.sort_values('ms', ascending=False).reset_index()
+
+    def summary(self):
+        return {
+            "event": "rerun",
+            "page": self.page,
+            "started": self.started_at.isoformat(timespec="milliseconds"),
+            "ms": round((self.seconds or 0) * 1000, 1),
+            "stages": self.breakdown().to_dict(orient="records"),
+        }
+
+
+def _observe(stage, seconds, rows, nbytes):
+    buckets = _bucket_counts(seconds)
+    with _totals_lock:
+        totals = _stage_totals.setdefault(stage, [0, 0.0, 0, 0, [0] * len(LATENCY_BUCKETS)])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] += rows or 0
+        totals[3] += nbytes or 0
+        totals[4] = [a + b for a, b in zip(totals[4], buckets)]
+    rerun = _current.get()
+    if rerun is not None:
+        rerun.add(stage, seconds, rows or 0, nbytes or 0)
+
+
+# Time a block as one stage. The yielded dict takes optional "rows" and "bytes":
+#     with span("sql.read_sql") as s:
+#         df = ...
+#         s["rows"] = len(df)
+@contextmanager
+def span(stage, **fields):
+    record = {"rows": None, "bytes": None}
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - started
+        _observe(stage, seconds, record["rows"], record["bytes"])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({"event": "span", "stage": stage, "ms": round(seconds * 1000, 2),
+                                     "rows": record["rows"], "bytes": record["bytes"], **fields}, default=str))
+
+
+# Wrap fn so it runs in (a copy of) the caller's context, so spans recorded on a
+# worker thread still land in the rerun that submitted the work
+def in_current_context(fn):
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _histogram(lines, name, labels, buckets, count, seconds):
+    for bound, n in zip(LATENCY_BUCKETS, buckets):
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {n}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f'{name}_sum{{{labels}}} {seconds:.6f}')
+    lines.append(f'{name}_count{{{labels}}} {count}')
+
+
+# Process-wide totals in the Prometheus text exposition format
+def prometheus_text():
+    with _totals_lock:
+        stages = {k: list(v) for k, v in _stage_totals.items()}
+        reruns = {k: list(v) for k, v in _rerun_totals.items()}
+    lines = ["# HELP dashboard_stage_seconds Time spent per pipeline stage",
+             "# TYPE dashboard_stage_seconds histogram"]
+    for stage, (count, seconds, _, _, buckets) in sorted(stages.items()):
+        _histogram(lines, "dashboard_stage_seconds", f'stage="{_label(stage)}"', buckets, count, seconds)
+    lines += ["# HELP dashboard_stage_rows_total Rows handled per pipeline stage",
+              "# TYPE dashboard_stage_rows_total counter"]
+    lines += [f'dashboard_stage_rows_total{{stage="{_label(s)}"}} {v[2]}' for s, v in sorted(stages.items())]
+    lines += ["# HELP dashboard_stage_bytes_total Bytes of data handled per pipeline stage",
+              "# TYPE dashboard_stage_bytes_total counter"]
+    lines += [f'dashboard_stage_bytes_total{{stage="{_label(s)}"}} {v[3]}' for s, v in sorted(stages.items())]
+    lines += ["# HELP dashboard_rerun_seconds Time per page rerun",
+              "# TYPE dashboard_rerun_seconds histogram"]
+    for page, (count, seconds, buckets) in sorted(reruns.items()):
+        _histogram(lines, "dashboard_rerun_seconds", f'page="{_label(page)}"', buckets, count, seconds)
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port):
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("", int(port)), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="perf-metrics", daemon=True).start()
+            logger.info("Serving metrics on port %s", port)
+
+
+# Call at the top of a page (after st.set_page_config): starts timing this rerun and
+# adds the sidebar switch for the timings panel
+def begin_rerun(page):
+    import streamlit as st
+
+    if os.environ.get(METRICS_PORT_ENV) and _server is None:
+        start_metrics_server(os.environ[METRICS_PORT_ENV])
+    _current.set(RerunTimings(page))
+    st.sidebar.toggle('Show Timings', key='perf_panel')
+
+
+# Call at the end of a page: logs the rerun, adds it to the session history and,
+# when switched on, shows the breakdown in the sidebar
+def finish_rerun():
+    import streamlit as st
+
+    rerun = _current.get()
+    if rerun is None:
+        return
+    _current.set(None)
+    rerun.finish()
+    with _totals_lock:
+        totals = _rerun_totals.setdefault(rerun.page, [0, 0.0, [0] * len(LATENCY_BUCKETS)])
+        totals[0] += 1
+        totals[1] += rerun.seconds
+        totals[2] = [a + b for a, b in zip(totals[2], _bucket_counts(rerun.seconds))]
+    logger.info(json.dumps(rerun.summary(), default=str))
+
+    history = st.session_state.setdefault('perf_reruns', deque(maxlen=RERUNS_KEPT))
+    history.append(rerun)
+    if not st.session_state.get('perf_panel'):
+        return
+    with st.sidebar.expander("Timings", expanded=True):
+        st.caption(f"This rerun: {rerun.seconds * 1000:,.0f} ms")
+        st.dataframe(rerun.breakdown(), hide_index=True, use_container_width=True)
+        session = pd.concat([r.breakdown() for r in history], ignore_index=True)
+        if not session.empty:
+            session = session.groupby('Stage')[['Calls', 'ms', 'Rows', 'Bytes']].sum()
+            st.caption(f"This session: last {len(history)} reruns")
+            st.dataframe(session.sort_values('ms', ascending=False).reset_index(), hide_index=True,
+                         use_container_width=True)
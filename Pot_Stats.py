@@ -0,0 +1,62 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# A pot is an outlier on a day when its robust z-score against the line exceeds this
+OUTLIER_Z = 3.5
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+
+# Pot x Date matrix of one parameter from daily snapshot rows (Date, TagIndex, Val),
+# given the pot -> TagIndex mapping of that parameter. Pots without data stay as NaN rows.
+def pot_matrix(snapshots, pot_tags):
+    pots = list(pot_tags)
+    tag_pot = pd.Series(pots, index=list(pot_tags.values()))
+    df = snapshots.assign(Pot=snapshots['TagIndex'].map(tag_pot),
+                          Date=pd.to_datetime(snapshots['Date']))
+    matrix = df.pivot_table(index='Pot', columns='Date', values='Val', aggfunc='last')
+    return matrix.reindex(pots)
+
+
+# Line-level statistics of a pot x date matrix, computed column-wise over all pots at once.
+# Returns (daily, z): per-date Mean/Std/Median/P10/P90/Pots, and each pot's robust
+# z-score against the line on each date (same shape as the matrix).
+def line_statistics(matrix):
+    values = matrix.to_numpy(dtype='float64')
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        # Dates with no data at all give NaN (nanmedian/nanmean warn about them)
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        median = np.nanmedian(values, axis=0)
+        mad = np.nanmedian(np.abs(values - median), axis=0) * MAD_SCALE
+        p10, p90 = np.nanpercentile(values, [10, 90], axis=0)
+        daily = pd.DataFrame({
+            'Mean': np.nanmean(values, axis=0),
+            'Std': np.nanstd(values, axis=0),
+            'Median': median,
+            'P10': p10,
+            'P90': p90,
+            'Pots': np.count_nonzero(~np.isnan(values), axis=0),
+        }, index=matrix.columns)
+        # A day where (nearly) every pot reads the same has no spread to compare against
+        z = (values - median) / np.where(mad > 0, mad, np.nan)
+    return daily, pd.DataFrame(z, index=matrix.index, columns=matrix.columns)
+
+
+# Pot/date pairs whose |z| exceeds the threshold, worst first
+def outliers(matrix, z, threshold=OUTLIER_Z):
+    pot_idx, date_idx = np.nonzero(np.abs(np.nan_to_num(z.to_numpy())) > threshold)
+    result = pd.DataFrame({
+        'Pot': matrix.index[pot_idx],
+        'Date': matrix.columns[date_idx],
+        'Val': matrix.to_numpy()[pot_idx, date_idx],
+        'Z': z.to_numpy()[pot_idx, date_idx],
+    })
+    return result.reindex(result['Z'].abs().sort_values(ascending=False).index).reset_index(drop=True)
+
+
+# Pots ranked by how far they sit from the line on average (mean |z| over the range)
+def pot_ranking(z):
+    return z.abs().mean(axis=1, skipna=True).sort_values(ascending=False)
+
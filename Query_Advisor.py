@@ -0,0 +1,431 @@
+import logging
+import re
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import DB_Query
+from DB_Pool import pooled_conn
+from Synthetic_FloatTable import translate
+
+logger = logging.getLogger(__name__)
+
+# Checks the FloatTable access paths the pages use. Every query shape is built by the
+# DB_Query function that issues it (nothing runs while they are captured), then on the
+# configured database:
+#   - its plan is captured (SHOWPLAN_XML on SQL Server, EXPLAIN QUERY PLAN on SQLite,
+#     with the SQL Server-only syntax translated as the stand-in does),
+#   - it is run once for I/O statistics (logical reads, or SQLite VM steps) and time,
+#   - its predicates are matched against FloatTable's indexes.
+# Shapes no existing index can seek and cover get a recommended covering index.
+#     python Query_Advisor.py                  the configured database (DB_Conn)
+#     python Query_Advisor.py --sqlite --apply the local synthetic stand-in, creating
+#                                              the recommended indexes and checking again
+COLUMNS = ['TagIndex', 'Hour', 'Date', 'DateAndTime', 'Val']  # Equality key columns go in this order
+SHAPE_TAGS = 15
+SQLITE_STEPS_PER_TICK = 1000
+SHOWPLAN_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+# A statement one of the pages issues, with the parameters it was built with
+Shape = namedtuple("Shape", ["name", "pages", "sql", "params"])
+# FloatTable columns a statement compares with = / IN, with ranges, orders (or partitions) by, and reads
+Usage = namedtuple("Usage", ["equality", "ranges", "order", "columns"])
+Index = namedtuple("Index", ["name", "keys", "include", "clustered"])
+# Plan operators seen (scan / seek / lookup / sort), statistics and the verdict for one shape
+Finding = namedtuple("Finding", ["shape", "usage", "operators", "plan", "stats", "supported_by", "recommended",
+                                 "server_suggestions", "error"])
+
+
+# Swap DB_Query's two execution points for recorders, so calling a fetch function only
+# records the (statement, parameters) it would have run
+@contextmanager
+def _recording():
+    statements = []
+
+    def record_sql(query, params=None):
+        statements.append((query, list(params or [])))
+        return pd.DataFrame()
+
+    def record_frames(query, params=None, batch_size=None):
+        statements.append((query, list(params or [])))
+        return iter(())
+
+    saved = DB_Query.read_sql, DB_Query.iter_raw_frames
+    DB_Query.read_sql, DB_Query.iter_raw_frames = record_sql, record_frames
+    try:
+        yield statements
+    finally:
+        DB_Query.read_sql, DB_Query.iter_raw_frames = saved
+
+
+# Newest DateAndTime in FloatTable (now when the table is empty)
+def _newest_sample():
+    newest = DB_Query.read_sql(f"SELECT MAX(DateAndTime) AS Newest FROM {DB_Query.FLOAT_TABLE}")['Newest']
+    newest = pd.Timestamp(newest.iloc[0]) if len(newest) and newest.iloc[0] is not None else pd.NaT
+    return datetime.now() if pd.isna(newest) else newest.to_pydatetime()
+
+
+# Every FloatTable query shape the pages issue, with parameters for the newest day of data
+def capture_shapes(tag_index_list=None):
+    from Tag_Registry import get_registry
+
+    tag_index_list = sorted(tag_index_list or list(get_registry().names)[:SHAPE_TAGS])
+    newest = _newest_sample()
+    start = newest - timedelta(days=1)
+    day = newest.date()
+    calls = [
+        ("Daily snapshots", "TREND, TREND Dummy, KPI, Demo_Trend, POT_HEATMAP",
+         lambda: DB_Query._sql_snapshots(day - timedelta(days=15), day, DB_Query.DEFAULT_SNAPSHOT_HOUR, tag_index_list)),
+        ("As-of values", "SHIFT_SNAPSHOT",
+         lambda: DB_Query.fetch_asof([newest - timedelta(hours=h) for h in (2, 10, 18)], tag_index_list)),
+        ("Raw range, every tag", "REPORT export, Daily_Artifacts",
+         lambda: DB_Query._sql_raw_range(start, newest, [], newest_first=True)),
+        ("Raw range, some tags", "Live mode seed, Benchmark",
+         lambda: DB_Query._sql_raw_range(start, newest, tag_index_list[:3])),
+        ("Rows after", "Live mode polling",
+         lambda: DB_Query.fetch_rows_after(newest - timedelta(minutes=1), tag_index_list[:3])),
+        ("Bucketed min/max/avg", "LINE_CHART",
+         lambda: DB_Query._sql_bucketed(start, newest, tag_index_list[0], 2400)),
+    ]
+    # The report table's next pages (a keyset condition on top of the range), continuing
+    # from the key of a real first page so each page holds rows
+    fallback = {'DateAndTime': newest - timedelta(hours=1), 'TagIndex': tag_index_list[0], 'RoundedVal': 0.0}
+    for sort_by in DB_Query.REPORT_SORT_KEYS:
+        after = DB_Query.fetch_report_page(start, newest, [], 1, sort_by=sort_by)[1]
+        if after is None:
+            after = DB_Query.report_page_key(fallback, sort_by)
+        calls.append((f"Report page by {sort_by}", "REPORT",
+                      lambda sort_by=sort_by, after=after: DB_Query.fetch_report_page(
+                          start, newest, [], 500, sort_by=sort_by, after=after)))
+
+    shapes = []
+    for name, pages, call in calls:
+        with _recording() as statements:
+            call()
+        for sql, params in statements:
+            shapes.append(Shape(name, pages, sql, params))
+    return shapes
+
+
+def _first_position(pattern, text):
+    match = re.search(pattern, text, re.I)
+    return match.start() if match else None
+
+
+# Which FloatTable columns a statement filters, orders and reads, from its text
+def usage(sql):
+    # Compare columns, not aliases: f.TagIndex -> TagIndex
+    text = re.sub(r"\b\w+\.(?=(?:%s)\b)" % "|".join(COLUMNS), "", sql)
+    columns = [c for c in COLUMNS if re.search(rf"\b{c}\b", text)]
+    # A function of a column (ROUND(Val, 2), DATEDIFF(second, ?, DateAndTime)) can't be
+    # sought or read in order on an index of the column, so it counts as neither
+    text = re.sub(r"\b(?!(?:IN|VALUES|OVER|TOP)\b)\w+\([^()]*\b(?:%s)\b[^()]*\)" % "|".join(COLUMNS),
+                  "expression", text, flags=re.I)
+
+    range_at = {c: _first_position(rf"\b{c}\s*(?:BETWEEN\b|[<>]=?)", text) for c in columns}
+    ranges = sorted((c for c in columns if range_at[c] is not None), key=range_at.get)
+    equality = [c for c in columns if c not in ranges and _first_position(rf"\b{c}\s*(?:=|IN\s*\()", text) is not None]
+    order = []
+    for clause in re.findall(r"\b(?:ORDER|PARTITION)\s+BY\s+(.*?)(?=\)|;|\bORDER\s+BY\b|$)", text, re.I | re.S):
+        for item in clause.split(","):
+            column = re.sub(r"\s+(?:ASC|DESC)\s*$", "", item.strip(), flags=re.I)
+            if column not in COLUMNS:
+                # An index can't supply the order past an expression or alias
+                break
+            if column not in order:
+                order.append(column)
+    return Usage(equality, ranges, order, columns)
+
+
+# The range column an index should seek on: the one that is also the leading sort
+# column when there is one, so the order comes for free
+def _lead_range(use):
+    return next((c for c in use.order if c in use.ranges), use.ranges[0])
+
+
+# Index keys and included columns that let the statement seek straight to its rows,
+# read them in the order it wants and never go back to the table
+def recommend(use):
+    keys = sorted(use.equality, key=COLUMNS.index)
+    if use.ranges:
+        keys.append(_lead_range(use))
+    keys += [c for c in use.order if c not in keys]
+    if not keys:
+        return None
+    include = [c for c in use.columns if c not in keys]
+    return keys, include
+
+
+def _seekable(index, use):
+    n = len(use.equality)
+    if not use.equality and not use.ranges:
+        return False
+    if set(index.keys[:n]) != set(use.equality):
+        return False
+    return not use.ranges or (len(index.keys) > n and index.keys[n] == _lead_range(use))
+
+
+def _covering(index, use):
+    return index.clustered or set(use.columns) <= set(index.keys) | set(index.include)
+
+
+# FloatTable's indexes
+def existing_indexes(conn):
+    table = DB_Query.FLOAT_TABLE
+    if isinstance(conn, sqlite3.Connection):
+        indexes = []
+        for row in conn.execute(f"PRAGMA index_list('{table}')").fetchall():
+            keys = [info[2] for info in conn.execute(f"PRAGMA index_info('{row[1]}')").fetchall()]
+            indexes.append(Index(row[1], keys, [], False))
+        return indexes
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT i.name, i.type_desc, c.name, ic.is_included_column
+        FROM sys.indexes i
+        JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+        JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+        WHERE i.object_id = OBJECT_ID(?)
+        ORDER BY i.name, ic.is_included_column, ic.key_ordinal
+    """, [table])
+    columns = {}
+    for name, type_desc, column, included in cursor.fetchall():
+        keys, include, clustered = columns.setdefault(name, ([], [], type_desc == 'CLUSTERED'))
+        (include if included else keys).append(column)
+    cursor.close()
+    return [Index(name, keys, include, clustered) for name, (keys, include, clustered) in columns.items()]
+
+
+# Plan of a statement on SQLite: the EXPLAIN QUERY PLAN lines and the operators they show
+def _sqlite_plan(conn, sql, params):
+    plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+    table = DB_Query.FLOAT_TABLE.split(".")[-1]
+    # The plan names FloatTable by its alias when it has one
+    names = {table} | set(re.findall(rf"\b(?:FROM|JOIN)\s+{table}\s+(?:AS\s+)?(?!WHERE\b|ON\b)(\w+)", sql, re.I))
+    operators = set()
+    for line in plan:
+        if "TEMP B-TREE" in line:
+            operators.add("sort")
+        match = re.match(r"(?:SCAN|SEARCH) (\w+)", line)
+        if match is None or match.group(1) not in names:
+            continue
+        if line.startswith("SCAN"):
+            operators.add("index scan" if "INDEX" in line else "scan")
+        else:
+            operators.add("seek" if "COVERING INDEX" in line else "seek + lookup")
+    return plan, sorted(operators)
+
+
+def _sqlite_stats(conn, sql, params):
+    steps = [0]
+
+    def tick():
+        steps[0] += SQLITE_STEPS_PER_TICK
+        return 0
+
+    conn.set_progress_handler(tick, SQLITE_STEPS_PER_TICK)
+    try:
+        started = time.perf_counter()
+        rows = len(conn.execute(sql, params).fetchall())
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.set_progress_handler(None, SQLITE_STEPS_PER_TICK)
+    return {"rows": rows, "ms": round(elapsed * 1000, 1), "vm_steps": steps[0]}
+
+
+# Plan of a statement on SQL Server (estimated, the statement isn't run): the
+# operators on FloatTable and the server's own missing index suggestions
+def _sqlserver_plan(conn, sql, params):
+    cursor = conn.cursor()
+    cursor.execute("SET SHOWPLAN_XML ON")
+    try:
+        cursor.execute(sql, params)
+        xml = cursor.fetchone()[0]
+    finally:
+        cursor.execute("SET SHOWPLAN_XML OFF")
+        cursor.close()
+
+    root = ET.fromstring(xml)
+    table = DB_Query.FLOAT_TABLE.split(".")[-1]
+    plan, operators = [], set()
+    for op in root.iter(SHOWPLAN_NS + "RelOp"):
+        physical = op.get("PhysicalOp")
+        target = op.find(f"./*/{SHOWPLAN_NS}Object")
+        on_table = target is not None and target.get("Table", "").strip("[]") == table
+        if physical == "Sort":
+            operators.add("sort")
+        elif on_table and physical in ("Table Scan", "Clustered Index Scan", "Index Scan"):
+            operators.add("scan" if physical != "Index Scan" else "index scan")
+        elif on_table and physical in ("Index Seek", "Clustered Index Seek"):
+            operators.add("seek")
+        elif on_table and physical in ("Key Lookup", "RID Lookup"):
+            operators.add("lookup")
+        if on_table or physical == "Sort":
+            index = target.get("Index", "") if target is not None else ""
+            plan.append(f"{physical} {index}".strip() + f" (est. rows {float(op.get('EstimateRows', 0)):,.0f})")
+
+    suggestions = []
+    for group in root.iter(SHOWPLAN_NS + "MissingIndexGroup"):
+        columns = {"EQUALITY": [], "INEQUALITY": [], "INCLUDE": []}
+        for column_group in group.iter(SHOWPLAN_NS + "ColumnGroup"):
+            columns[column_group.get("Usage")] += [c.get("Name").strip("[]") for c in column_group]
+        suggestions.append((columns["EQUALITY"] + columns["INEQUALITY"], columns["INCLUDE"],
+                            float(group.get("Impact", 0))))
+    return plan, sorted(operators), suggestions
+
+
+def _sqlserver_stats(conn, sql, params):
+    cursor = conn.cursor()
+    cursor.execute("SET STATISTICS IO ON")
+    try:
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        rows = len(cursor.fetchall())
+        messages = list(cursor.messages)
+        while cursor.nextset():
+            messages += cursor.messages
+        elapsed = time.perf_counter() - started
+    finally:
+        cursor.execute("SET STATISTICS IO OFF")
+        cursor.close()
+    reads = sum(int(n) for _, text in messages for n in re.findall(r"logical reads (\d+)", str(text)))
+    return {"rows": rows, "ms": round(elapsed * 1000, 1), "logical_reads": reads}
+
+
+def analyze(conn, shape, indexes):
+    use = usage(shape.sql)
+    supported_by = [index.name for index in indexes if _seekable(index, use) and _covering(index, use)]
+    recommended = None if supported_by else recommend(use)
+    plan, operators, suggestions, stats, error = [], [], [], None, None
+    try:
+        if isinstance(conn, sqlite3.Connection):
+            sql, params = translate(shape.sql, shape.params)
+            plan, operators = _sqlite_plan(conn, sql, params)
+            stats = _sqlite_stats(conn, sql, params)
+        else:
+            plan, operators, suggestions = _sqlserver_plan(conn, shape.sql, shape.params)
+            stats = _sqlserver_stats(conn, shape.sql, shape.params)
+    except Exception as e:
+        # The verdict then rests on the statement text alone; the report lists these
+        error = f"{type(e).__name__}: {e}"
+    return Finding(shape, use, operators, plan, stats, supported_by, recommended, suggestions, error)
+
+
+# Analyze every shape on a pooled connection to the configured database
+def advise(shapes=None):
+    shapes = shapes or capture_shapes()
+    with pooled_conn() as conn:
+        indexes = existing_indexes(conn)
+        return indexes, [analyze(conn, shape, indexes) for shape in shapes]
+
+
+# Recommended indexes across all shapes, one per key; a key that is a prefix of another
+# is served by the longer one
+def merged_recommendations(findings):
+    merged = {}
+    for finding in findings:
+        if finding.recommended is not None:
+            keys, include = finding.recommended
+            merged.setdefault(tuple(keys), set()).update(include)
+    for keys in sorted(merged, key=len):
+        longer = next((other for other in merged if len(other) > len(keys) and other[:len(keys)] == keys), None)
+        if longer is not None:
+            merged[longer].update(merged.pop(keys))
+    return [(list(keys), [c for c in COLUMNS if c in include and c not in keys]) for keys, include in merged.items()]
+
+
+# CREATE INDEX statement for a recommendation. On SQL Server an existing index with the
+# same keys is rebuilt with the extra included columns instead of adding a second one.
+def index_ddl(keys, include, indexes=(), sqlite=False):
+    table = DB_Query.FLOAT_TABLE
+    if sqlite:
+        # No INCLUDE in SQLite: the included columns become trailing key columns
+        columns = keys + include
+        return f"CREATE INDEX IF NOT EXISTS IX_{table.split('.')[-1]}_{'_'.join(columns)} ON {table} ({', '.join(columns)});"
+    same_keys = next((index for index in indexes if index.keys == keys and not index.clustered), None)
+    name = same_keys.name if same_keys else f"IX_{table.split('.')[-1]}_{'_'.join(keys)}"
+    ddl = f"CREATE NONCLUSTERED INDEX {name} ON {table} ({', '.join(keys)})"
+    if include:
+        ddl += f" INCLUDE ({', '.join(include)})"
+    return ddl + (" WITH (DROP_EXISTING = ON);" if same_keys else ";")
+
+
+def print_report(indexes, findings, sqlite=False):
+    print("Existing indexes on", DB_Query.FLOAT_TABLE)
+    for index in indexes:
+        include = f" INCLUDE ({', '.join(index.include)})" if index.include else ""
+        print(f"  {index.name}: ({', '.join(index.keys)}){include}{' CLUSTERED' if index.clustered else ''}")
+    for finding in findings:
+        use = finding.usage
+        print(f"\n{finding.shape.name}  [{finding.shape.pages}]")
+        print(f"  filters: = {use.equality or '-'}  range {use.ranges or '-'}  order {use.order or '-'}")
+        if finding.error:
+            print(f"  not run here: {finding.error}")
+        else:
+            print(f"  plan: {', '.join(finding.operators) or '-'}")
+            for line in finding.plan:
+                print(f"    {line}")
+            print(f"  stats: {finding.stats}")
+        if finding.supported_by:
+            print(f"  served by: {', '.join(finding.supported_by)}")
+        elif finding.recommended:
+            print(f"  recommend: {index_ddl(*finding.recommended, indexes, sqlite)}")
+        for keys, include, impact in finding.server_suggestions:
+            print(f"  server suggests ({impact:.0f}% impact): {index_ddl(keys, include, indexes)}")
+
+    recommendations = merged_recommendations(findings)
+    print("\nRecommended indexes" if recommendations else "\nEvery shape is served by an existing index")
+    for keys, include in recommendations:
+        print(" ", index_ddl(keys, include, indexes, sqlite))
+    unverified = [finding for finding in findings if finding.error]
+    if unverified:
+        print("\nNot verified (no plan on this database; judged from the statement text only)")
+        for finding in unverified:
+            print(f"  {finding.shape.name}: {finding.error}")
+    return recommendations
+
+
+# Create recommended indexes on the SQLite stand-in (never on the historian)
+def apply_sqlite(recommendations):
+    with pooled_conn() as conn:
+        if not isinstance(conn, sqlite3.Connection):
+            raise RuntimeError("Indexes are only created on the SQLite stand-in")
+        for keys, include in recommendations:
+            conn.execute(index_ddl(keys, include, sqlite=True))
+        conn.execute("ANALYZE")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import Synthetic_FloatTable
+
+    parser = argparse.ArgumentParser(description="Check FloatTable query plans and recommend indexes")
+    parser.add_argument("--sqlite", nargs="?", const=Synthetic_FloatTable.DEFAULT_PATH,
+                        help="Use the synthetic SQLite stand-in (built with defaults if missing)")
+    parser.add_argument("--apply", action="store_true", help="Create the recommendations on the stand-in and check again")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    shapes = None
+    if args.sqlite:
+        if Synthetic_FloatTable.config(args.sqlite) is None:
+            Synthetic_FloatTable.create(args.sqlite)
+        Synthetic_FloatTable.install(args.sqlite)
+        # The stand-in's tags are 0..n-1, whatever the registry holds
+        shapes = capture_shapes(list(range(Synthetic_FloatTable.config(args.sqlite)["tags"]))[:SHAPE_TAGS])
+    elif args.apply:
+        parser.error("--apply only works with --sqlite")
+
+    indexes, findings = advise(shapes)
+    recommendations = print_report(indexes, findings, sqlite=bool(args.sqlite))
+    if args.apply and recommendations:
+        apply_sqlite(recommendations)
+        print("\nAfter creating them:")
+        print_report(*advise(shapes), sqlite=True)
@@ -0,0 +1,216 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Defaults for query result caches
+CACHE_TTL_SECONDS = 300
+CACHE_MAX_ENTRIES = 128
+
+# How long a disk store waits for another process's in-flight computation before
+# computing the value itself
+DISK_WAIT_SECONDS = 120
+DISK_POLL_SECONDS = 0.1
+
+_MISSING = object()
+
+
+# One in-flight computation that other callers can wait on
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+# Single-flight coalescing: while a computation for a key is running, other callers
+# with the same key wait for its result instead of starting their own.
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            return flight.wait()
+        try:
+            flight.value = compute()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+# Pickled values in a directory, shared by every process on the machine (e.g. several
+# Streamlit workers). Files are written then renamed, so readers never see half a value;
+# a lock file marks a computation in progress so other processes wait for it.
+class DiskStore:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, digest + suffix)
+
+    # (expires_at wall clock, value), or None when missing, expired or unreadable
+    def get(self, key):
+        try:
+            with open(self._path(key, ".pkl"), "rb") as f:
+                stored_key, expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if stored_key != key or expires_at < time.time():
+            return None
+        return expires_at, value
+
+    def put(self, key, expires_at, value):
+        path = self._path(key, ".pkl")
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((key, expires_at, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    # (expires_at, value) from compute(), unless another process is already computing
+    # it; then wait for that result instead
+    def coalesce(self, key, compute):
+        lock = self._path(key, ".lock")
+        deadline = time.time() + DISK_WAIT_SECONDS
+        while True:
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                # A lock older than the wait limit was left by a process that died
+                try:
+                    if os.path.getmtime(lock) < time.time() - DISK_WAIT_SECONDS:
+                        os.remove(lock)
+                        continue
+                except OSError:
+                    continue
+                stored = self.get(key)
+                if stored is not None:
+                    return stored
+                if time.time() > deadline:
+                    return compute()
+                time.sleep(DISK_POLL_SECONDS)
+                continue
+            os.close(fd)
+            try:
+                # Someone may have finished between our miss and taking the lock
+                stored = self.get(key)
+                if stored is not None:
+                    return stored
+                return compute()
+            finally:
+                os.remove(lock)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+# Size-bounded LRU cache whose entries also expire after `ttl` seconds.
+# Thread safe, so one instance can be shared by every Streamlit session.
+# With `align=True` entries instead expire at the next multiple of `ttl` on the wall
+# clock (e.g. the historian's write cadence), so everything cached between two writes
+# expires together. With a DiskStore, values are also shared between processes.
+class TTLCache:
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, align=False, store=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.align = align
+        self.store = store
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    # Wall clock expiry time for an entry stored now
+    def _expiry(self):
+        now = time.time()
+        if self.align:
+            return (now // self.ttl + 1) * self.ttl
+        return now + self.ttl
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, expires_at=None):
+        if expires_at is None:
+            expires_at = self._expiry()
+        with self._lock:
+            # Entries are kept on the monotonic clock so wall clock jumps don't matter
+            self._entries[key] = (time.monotonic() + expires_at - time.time(), value)
+            self._entries.move_to_end(key)
+            # Evict least recently used entries beyond the size bound
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # The cached value, or compute() it once however many callers ask at the same time
+    # (in this process, and across processes when there is a disk store)
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return self._flights.do(key, lambda: self._load(key, compute))
+
+    def _load(self, key, compute):
+        # A caller that waited behind another flight may find the value already stored
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.store is None:
+            value = compute()
+            self.put(key, value)
+            return value
+
+        stored = self.store.get(key)
+        if stored is None:
+            def compute_and_store():
+                expires_at = self._expiry()
+                result = compute()
+                self.store.put(key, expires_at, result)
+                return expires_at, result
+            stored = self.store.coalesce(key, compute_and_store)
+        expires_at, value = stored
+        self.put(key, value, expires_at)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,84 @@
+import gzip
+import importlib.util
+import os
+import tempfile
+
+from DB_Query import iter_raw_range
+
+# Export formats: label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/octet-stream"),
+}
+
+# Rows per chunk read from the database and written to the export file
+EXPORT_BATCH_ROWS = 100_000
+
+
+def available_formats():
+    # Parquet export is optional; pyarrow is only imported when a Parquet file is written
+    has_pyarrow = importlib.util.find_spec("pyarrow") is not None
+    return [name for name in EXPORT_FORMATS if name != "Parquet" or has_pyarrow]
+
+
+def _write_csv_gz(path, frames):
+    with gzip.open(path, "wt", newline="", compresslevel=6) as f:
+        header = True
+        for frame in frames:
+            frame.to_csv(f, header=header, index=False)
+            header = False
+        if header:
+            f.write("DateAndTime,TagIndex,Val\n")
+
+
+# Columns of the typed raw frames (DB_Query.typed_raw_frame), so the file has the same
+# schema whether or not the range holds any rows
+def _export_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('DateAndTime', pa.timestamp('us')),
+        ('TagIndex', pa.int16()),
+        ('Val', pa.float32()),
+    ])
+
+
+def _write_parquet(path, frames):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _export_schema()
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+
+# Write (DateAndTime, TagIndex, Val) frames, in order, into one export file
+def write_frames(path, frames, fmt):
+    if fmt == "Parquet":
+        _write_parquet(path, frames)
+    else:
+        _write_csv_gz(path, frames)
+
+
+# Stream the report rows for the range into a compressed file, newest first.
+# Rows go from the cursor (or the local mirror) to disk one chunk at a time, so
+# memory stays flat however long the range is.
+def write_report_export(path, start_datetime, end_datetime, tag_index_list, fmt):
+    frames = iter_raw_range(start_datetime, end_datetime, tag_index_list, newest_first=True,
+                            batch_size=EXPORT_BATCH_ROWS)
+    write_frames(path, frames, fmt)
+
+
+# Build the export in a temporary file and return its bytes (compressed, so much
+# smaller than the rows themselves). Meant to be passed, bound with functools.partial,
+# as the `data` callable of st.download_button so it only runs when clicked.
+def build_report_export(start_datetime, end_datetime, tag_index_list, fmt):
+    fd, path = tempfile.mkstemp(suffix="." + EXPORT_FORMATS[fmt][0])
+    os.close(fd)
+    try:
+        write_report_export(path, start_datetime, end_datetime, tag_index_list, fmt)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
@@ -0,0 +1,165 @@
+import logging
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from DB_Pool import pooled_conn
+import DB_Query
+from DB_Query import in_placeholders, pad_in_list, read_sql
+
+logger = logging.getLogger(__name__)
+
+# Per-(Date, Hour, TagIndex) aggregates of FloatTable, and how far they are complete
+ROLLUP_TABLE = "MDR.dbo.FloatTableHourly"
+ROLLUP_STATE_TABLE = "MDR.dbo.FloatTableHourlyState"
+
+REFRESH_INTERVAL_SECONDS = 300
+# Hours are re-aggregated from a little before the last refresh, to pick up late writes
+REFRESH_OVERLAP = timedelta(hours=1)
+
+CREATE_SQL = f"""
+IF OBJECT_ID('{ROLLUP_TABLE}') IS NULL
+    CREATE TABLE {ROLLUP_TABLE} (
+        Date date NOT NULL,
+        Hour tinyint NOT NULL,
+        TagIndex smallint NOT NULL,
+        LastDateAndTime datetime NOT NULL,
+        LastVal float NULL,
+        MinVal float NULL,
+        MaxVal float NULL,
+        MeanVal float NULL,
+        Samples int NOT NULL,
+        CONSTRAINT PK_FloatTableHourly PRIMARY KEY (Hour, TagIndex, Date)
+    );
+IF OBJECT_ID('{ROLLUP_STATE_TABLE}') IS NULL
+    CREATE TABLE {ROLLUP_STATE_TABLE} (
+        Id tinyint NOT NULL PRIMARY KEY,
+        RolledThrough datetime NOT NULL
+    );
+"""
+
+
+# Re-aggregate every hour with rows in [?, ?) and upsert it into the rollup table.
+# Built when it runs, so it follows DB_Query.FLOAT_TABLE and the table names here when
+# they are pointed elsewhere (e.g. Synthetic_FloatTable.install).
+def _refresh_sql():
+    return f"""
+WITH src AS (
+    SELECT Date, Hour, TagIndex, DateAndTime, Val,
+           ROW_NUMBER() OVER (PARTITION BY Date, Hour, TagIndex ORDER BY DateAndTime DESC) AS rn
+    FROM {DB_Query.FLOAT_TABLE}
+    WHERE DateAndTime >= ? AND DateAndTime < ?
+), agg AS (
+    SELECT Date, Hour, TagIndex,
+           MAX(CASE WHEN rn = 1 THEN DateAndTime END) AS LastDateAndTime,
+           MAX(CASE WHEN rn = 1 THEN Val END) AS LastVal,
+           MIN(Val) AS MinVal, MAX(Val) AS MaxVal, AVG(Val) AS MeanVal, COUNT(*) AS Samples
+    FROM src
+    GROUP BY Date, Hour, TagIndex
+)
+MERGE {ROLLUP_TABLE} AS t
+USING agg AS s
+    ON t.Hour = s.Hour AND t.TagIndex = s.TagIndex AND t.Date = s.Date
+WHEN MATCHED THEN UPDATE SET
+    LastDateAndTime = s.LastDateAndTime, LastVal = s.LastVal, MinVal = s.MinVal,
+    MaxVal = s.MaxVal, MeanVal = s.MeanVal, Samples = s.Samples
+WHEN NOT MATCHED THEN INSERT (Date, Hour, TagIndex, LastDateAndTime, LastVal, MinVal, MaxVal, MeanVal, Samples)
+    VALUES (s.Date, s.Hour, s.TagIndex, s.LastDateAndTime, s.LastVal, s.MinVal, s.MaxVal, s.MeanVal, s.Samples);
+"""
+
+
+def create_tables():
+    with pooled_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CREATE_SQL)
+        conn.commit()
+        cursor.close()
+
+
+# Every hour that closed before this time is complete in the rollup table
+# (None if the tables don't exist or were never refreshed)
+def rolled_through():
+    try:
+        df = read_sql(f"SELECT RolledThrough FROM {ROLLUP_STATE_TABLE} WHERE Id = 1")
+    except Exception:
+        return None
+    if df.empty:
+        return None
+    return pd.Timestamp(df['RolledThrough'].iloc[0]).to_pydatetime()
+
+
+def _set_rolled_through(cursor, value):
+    cursor.execute(f"""
+        MERGE {ROLLUP_STATE_TABLE} AS t
+        USING (SELECT 1 AS Id) AS s ON t.Id = s.Id
+        WHEN MATCHED THEN UPDATE SET RolledThrough = ?
+        WHEN NOT MATCHED THEN INSERT (Id, RolledThrough) VALUES (1, ?);
+    """, [value, value])
+
+
+# Aggregate FloatTable into the rollup table from `start` up to the current hour,
+# one day per transaction. Without `start` it carries on from the last refresh
+# (or from the oldest FloatTable row the first time).
+def refresh(start=None):
+    if start is None:
+        last = rolled_through()
+        if last is not None:
+            start = last - REFRESH_OVERLAP
+        else:
+            oldest = read_sql(f"SELECT MIN(DateAndTime) AS Oldest FROM {DB_Query.FLOAT_TABLE}")['Oldest'].iloc[0]
+            if pd.isna(oldest):
+                return
+            start = pd.Timestamp(oldest).to_pydatetime()
+    start = start.replace(minute=0, second=0, microsecond=0)
+    # Only whole hours are rolled up; the current one stays on raw FloatTable
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    with pooled_conn() as conn:
+        cursor = conn.cursor()
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + timedelta(days=1), end)
+            cursor.execute(_refresh_sql(), [chunk_start, chunk_end])
+            _set_rolled_through(cursor, chunk_end)
+            conn.commit()
+            logger.info("Rolled up FloatTable %s .. %s", chunk_start, chunk_end)
+            chunk_start = chunk_end
+        cursor.close()
+
+
+# Snapshot rows (Date, DateAndTime, TagIndex, Val) from the rollup table: the last
+# value of each TagIndex in the given Hour of each Date. Same result as
+# DB_Query.query_snapshots for hours that are rolled up.
+def snapshots(startdate, enddate, hour, tag_index_list):
+    in_list = pad_in_list(tag_index_list)
+    query = f"""
+        SELECT Date, LastDateAndTime AS DateAndTime, TagIndex, Round(LastVal, 2) AS Val
+        FROM {ROLLUP_TABLE}
+        WHERE Hour = ? AND TagIndex IN ({in_placeholders(in_list)}) AND Date BETWEEN ? AND ?
+    """
+    return read_sql(query, [int(hour)] + in_list + [startdate, enddate])
+
+
+# Run the rollup job on its own:  python Rollup.py [--create] [--once] [--from YYYY-MM-DD]
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain hourly FloatTable rollups")
+    parser.add_argument("--create", action="store_true", help="Create the rollup tables if missing")
+    parser.add_argument("--once", action="store_true", help="Refresh once and exit")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat,
+                        help="Re-aggregate from this date (backfill)")
+    parser.add_argument("--interval", type=int, default=REFRESH_INTERVAL_SECONDS, help="Seconds between refreshes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.create:
+        create_tables()
+    refresh(args.start)
+    while not args.once:
+        time.sleep(args.interval)
+        try:
+            refresh()
+        except Exception:
+            logger.exception("FloatTable rollup refresh failed")
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from Downsample import lttb
+
+# float32 keeps about 7 significant digits; values are rounded back to that when
+# widened, so 960.12 is shown as 960.12 and not 960.1199951171875
+SIGNIFICANT_DIGITS = 7
+
+
+def _widen(values):
+    values = values.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    scale = 10.0 ** (SIGNIFICANT_DIGITS - 1 - np.where(np.isfinite(magnitude), magnitude, 0))
+    return np.round(values * scale) / scale
+
+
+# Loaded samples kept per TagIndex as contiguous arrays: int64 epoch nanoseconds and
+# float32 values, each tag's samples sorted by time. Built once from a fetched
+# (DateAndTime, TagIndex, Val) frame; picking a tag is a dict lookup returning views,
+# and picking a time range within it is a binary search, so charts no longer scan
+# (and mask) the whole frame once per tag.
+class SeriesStore:
+    def __init__(self, times, values, offsets):
+        self.times = times       # int64 epoch ns, grouped by tag then sorted by time
+        self.values = values     # float32, same order
+        self.offsets = offsets   # TagIndex -> (start, stop) into times / values
+
+    @classmethod
+    def from_frame(cls, df):
+        times = pd.to_datetime(df['DateAndTime'], errors='coerce').to_numpy('datetime64[ns]').view(np.int64)
+        values = pd.to_numeric(df['Val'], errors='coerce').to_numpy(np.float32)
+        tags = df['TagIndex'].to_numpy(np.int64)
+
+        # Drop rows without a time or a value (NaT is the smallest int64)
+        keep = (times != np.iinfo(np.int64).min) & ~np.isnan(values)
+        times, values, tags = times[keep], values[keep], tags[keep]
+
+        order = np.lexsort((times, tags))
+        times, values, tags = times[order], values[order], tags[order]
+        starts = np.flatnonzero(np.r_[True, tags[1:] != tags[:-1]]) if len(tags) else np.array([], dtype=np.int64)
+        stops = np.r_[starts[1:], len(tags)].astype(np.int64)
+        offsets = {int(tags[start]): (int(start), int(stop)) for start, stop in zip(starts, stops)}
+        return cls(times, values, offsets)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, tag):
+        return int(tag) in self.offsets
+
+    @property
+    def tags(self):
+        return list(self.offsets)
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
+
+    # (times, values) views of one tag, optionally only start <= time <= end
+    def series(self, tag, start=None, end=None):
+        first, last = self.offsets.get(int(tag), (0, 0))
+        times = self.times[first:last]
+        if start is not None:
+            first += int(np.searchsorted(times, pd.Timestamp(start).value, side='left'))
+        if end is not None:
+            last = first + int(np.searchsorted(self.times[first:last], pd.Timestamp(end).value, side='right'))
+        return self.times[first:last], self.values[first:last]
+
+    # One tag as a (DateAndTime, Val) frame for plotting, thinned with LTTB to at most
+    # max_points points when given
+    def frame(self, tag, start=None, end=None, max_points=None):
+        times, values = self.series(tag, start, end)
+        if max_points is not None and len(values) > max_points:
+            kept = lttb(times, values, max_points)
+            times, values = times[kept], values[kept]
+        return pd.DataFrame({'DateAndTime': times.view('datetime64[ns]'), 'Val': _widen(values)})
+
+    # Lowest and highest value of one tag (NaN, NaN without samples)
+    def value_range(self, tag, start=None, end=None):
+        _, values = self.series(tag, start, end)
+        if not len(values):
+            return np.nan, np.nan
+        return float(_widen(values.min(keepdims=True))[0]), float(_widen(values.max(keepdims=True))[0])
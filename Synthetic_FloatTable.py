@@ -0,0 +1,226 @@
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Local SQLite stand-in for the historian's FloatTable, filled with synthetic samples.
+# Same columns the queries use (DateAndTime, Date, Hour, TagIndex, Val) and the same
+# indexes, so DB_Query's statements run against it unchanged apart from the table name
+# (the few SQL Server-only constructs they use are translated by the connection).
+TABLE = "FloatTable"
+# Rollup.py's tables, same columns and keys
+ROLLUP_TABLE = "FloatTableHourly"
+ROLLUP_STATE_TABLE = "FloatTableHourlyState"
+DEFAULT_PATH = os.path.join("data", "synthetic_floattable.sqlite")
+DEFAULT_DAYS = 30
+DEFAULT_TAGS = 15
+DEFAULT_SAMPLE_SECONDS = 60
+INSERT_BATCH_ROWS = 100_000
+
+CREATE_SQL = f"""
+CREATE TABLE {TABLE} (
+    DateAndTime timestamp NOT NULL,
+    Date date NOT NULL,
+    Hour integer NOT NULL,
+    TagIndex integer NOT NULL,
+    Val real
+);
+CREATE INDEX IX_{TABLE}_Date_Hour_TagIndex ON {TABLE} (Date, Hour, TagIndex, DateAndTime);
+CREATE INDEX IX_{TABLE}_DateAndTime ON {TABLE} (DateAndTime, TagIndex);
+CREATE INDEX IX_{TABLE}_TagIndex_DateAndTime ON {TABLE} (TagIndex, DateAndTime);
+CREATE TABLE {ROLLUP_TABLE} (
+    Date date NOT NULL,
+    Hour integer NOT NULL,
+    TagIndex integer NOT NULL,
+    LastDateAndTime timestamp NOT NULL,
+    LastVal real,
+    MinVal real,
+    MaxVal real,
+    MeanVal real,
+    Samples integer NOT NULL,
+    PRIMARY KEY (Hour, TagIndex, Date)
+);
+CREATE TABLE {ROLLUP_STATE_TABLE} (Id integer NOT NULL PRIMARY KEY, RolledThrough timestamp NOT NULL);
+CREATE TABLE _Config (Days integer, Tags integer, SampleSeconds integer);
+"""
+
+
+# Timestamps are stored as fixed-width ISO text, so comparisons in SQL order correctly
+def _adapt_datetime(value):
+    return value.isoformat(" ", timespec="microseconds")
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(pd.Timestamp, lambda value: _adapt_datetime(value.to_pydatetime()))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter("timestamp", lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("date", lambda raw: date.fromisoformat(raw.decode()))
+
+
+# The SQL Server-only parts of DB_Query's statements rewritten for SQLite,
+# keeping the access path: TOP (?) -> LIMIT ?, DATEDIFF / DATEADD in seconds -> julianday
+# arithmetic, VALUES with column names -> a SELECT over VALUES, and OUTER APPLY
+# (SELECT TOP 1 ...) -> a LEFT JOIN on the rowid the same seek finds (the join is the
+# lookup SQL Server would do for columns the index doesn't hold), and Rollup's MERGE
+# upserts -> INSERT ... SELECT ... ON CONFLICT DO UPDATE on the table's primary key.
+# Returns (sql, params).
+def translate(sql, params=None):
+    params = list(params or [])
+    merge = re.search(r"\bMERGE\s+(\S+)\s+AS\s+\w+\s+USING\s+(.+?)\s+AS\s+(\w+)\s+ON\s+.+?"
+                      r"\s+WHEN\s+MATCHED\s+THEN\s+UPDATE\s+SET\s+(.+?)"
+                      r"\s+WHEN\s+NOT\s+MATCHED\s+THEN\s+INSERT\s*\(([^)]*)\)\s*VALUES\s*\((.*)\)\s*;?\s*$",
+                      sql, re.I | re.S)
+    if merge:
+        target, source, alias, update, columns, values = merge.groups()
+        # The INSERT's parameters now come before the UPDATE's
+        before = sql[:merge.start()].count("?")
+        n_update = update.count("?")
+        params = (params[:before] + params[before + n_update:before + n_update + values.count("?")]
+                  + params[before:before + n_update])
+        update = re.sub(rf"\b{alias}\.", "excluded.", update)
+        sql = (sql[:merge.start()] + f"INSERT INTO {target} ({columns})\nSELECT {values} FROM {source} AS {alias} WHERE true\n"
+               f"ON CONFLICT DO UPDATE SET {update}")
+    top = re.search(r"\bSELECT\s+TOP\s*\(\?\)", sql, re.I)
+    if top:
+        params.append(params.pop(sql[:top.start()].count("?")))
+        sql = sql[:top.start()] + "SELECT" + sql[top.end():].rstrip().rstrip(";") + "\n        LIMIT ?"
+    sql = re.sub(r"CAST\(\?\s+AS\s+datetime2\)", "?", sql, flags=re.I)
+    sql = re.sub(r"DATEDIFF\(second,\s*([^,()]+?),\s*([^,()]+?)\)",
+                 r"CAST((-julianday(\1) + julianday(\2)) * 86400 AS INTEGER)", sql, flags=re.I)
+    sql = re.sub(r"DATEADD\(second,\s*(-?\?),\s*([^,()]+?)\)",
+                 r"strftime('%Y-%m-%d %H:%M:%f', \2, (\1) || ' seconds')", sql, flags=re.I)
+    sql = re.sub(r"\(VALUES\s+((?:\(\?\),?\s*)+)\)\s+AS\s+(\w+)\((\w+)\)",
+                 r"(SELECT column1 AS \3 FROM (VALUES \1)) AS \2", sql, flags=re.I)
+    sql = re.sub(r"OUTER\s+APPLY\s*\(\s*SELECT\s+TOP\s+1\s+.*?\s+FROM\s+(\S+)\s+(\w+)\s+(WHERE\s.*?)\s*\)\s*(?!(?:ORDER|AND|OR)\b)(\w+)",
+                 r"LEFT JOIN \1 \4 ON \4.rowid = (SELECT \2.rowid FROM \1 \2 \3 LIMIT 1)", sql, flags=re.I | re.S)
+    return sql, params
+
+
+# Connection that translates every statement on the way in, so DB_Query's reads (and
+# pd.read_sql through them) run on the stand-in as written for SQL Server
+class _Cursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        return super().execute(*translate(sql, params))
+
+
+class _Connection(sqlite3.Connection):
+    def cursor(self, factory=_Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+
+# Connection returning datetime/date objects for the typed columns, like the ODBC driver.
+# Usable from the pool's worker threads.
+def connect(path=DEFAULT_PATH):
+    return sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, factory=_Connection)
+
+
+# Synthetic samples: every tag every `sample_seconds` over `days` days ending at `end`,
+# each tag a random walk around its own level
+def _batches(days, tags, sample_seconds, end, seed):
+    rng = np.random.default_rng(seed)
+    start = end - timedelta(days=days)
+    times = pd.date_range(start, end, freq=f"{sample_seconds}s", inclusive="left")
+    levels = rng.uniform(1, 1000, tags)
+    steps_per_batch = max(INSERT_BATCH_ROWS // tags, 1)
+    walk = np.zeros(tags)
+    for i in range(0, len(times), steps_per_batch):
+        chunk = times[i:i + steps_per_batch]
+        steps = rng.normal(0, 0.002, (len(chunk), tags)) * levels
+        values = walk + np.cumsum(steps, axis=0)
+        walk = values[-1]
+        stamp = np.repeat(chunk.to_pydatetime(), tags)
+        yield zip(
+            stamp,
+            np.repeat(chunk.date, tags),
+            np.repeat(chunk.hour, tags).tolist(),
+            np.tile(np.arange(tags), len(chunk)).tolist(),
+            np.round(levels + values, 4).ravel().tolist(),
+        )
+
+
+# Build a new stand-in database at `path` (replacing any existing one); returns its row count
+def create(path=DEFAULT_PATH, days=DEFAULT_DAYS, tags=DEFAULT_TAGS, sample_seconds=DEFAULT_SAMPLE_SECONDS,
+           end=None, seed=0):
+    if end is None:
+        end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = connect(path)
+    try:
+        conn.executescript(CREATE_SQL)
+        conn.execute("INSERT INTO _Config VALUES (?, ?, ?)", [days, tags, sample_seconds])
+        for batch in _batches(days, tags, sample_seconds, end, seed):
+            conn.executemany(f"INSERT INTO {TABLE} VALUES (?, ?, ?, ?, ?)", batch)
+        conn.commit()
+        conn.execute("ANALYZE")
+        return conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+# {"days", "tags", "sample_seconds"} the stand-in at `path` was built with (None if there isn't one)
+def config(path=DEFAULT_PATH):
+    if not os.path.exists(path):
+        return None
+    conn = connect(path)
+    try:
+        row = conn.execute("SELECT Days, Tags, SampleSeconds FROM _Config").fetchone()
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+    return dict(zip(["days", "tags", "sample_seconds"], row)) if row else None
+
+
+# Oldest and newest DateAndTime in the stand-in
+def time_range(path=DEFAULT_PATH):
+    conn = connect(path)
+    try:
+        row = conn.execute(f"SELECT MIN(DateAndTime), MAX(DateAndTime) FROM {TABLE}").fetchone()
+    finally:
+        conn.close()
+    return tuple(datetime.fromisoformat(value) if value else None for value in row)
+
+
+# Point DB_Query and Rollup at the stand-in: its table names, a pool of SQLite
+# connections, and no mirror / rollup shortcuts, so every read runs the SQL statements
+# themselves
+def install(path=DEFAULT_PATH):
+    import DB_Pool
+    import DB_Query
+    import Rollup
+
+    DB_Query.FLOAT_TABLE = TABLE
+    Rollup.ROLLUP_TABLE = ROLLUP_TABLE
+    Rollup.ROLLUP_STATE_TABLE = ROLLUP_STATE_TABLE
+    DB_Query.USE_LOCAL_MIRROR = False
+    DB_Query.USE_ROLLUPS = False
+    DB_Query.clear_cache()
+    with DB_Pool._pool_lock:
+        if DB_Pool._pool is not None:
+            DB_Pool._pool.dispose()
+        DB_Pool._pool = DB_Pool.ConnectionPool(lambda: connect(path))
+
+
+# Build a stand-in from the command line:
+#     python Synthetic_FloatTable.py --days 90 --tags 60 --sample-seconds 10
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create a synthetic SQLite FloatTable")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--tags", type=int, default=DEFAULT_TAGS)
+    parser.add_argument("--sample-seconds", type=int, default=DEFAULT_SAMPLE_SECONDS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = create(args.path, args.days, args.tags, args.sample_seconds, seed=args.seed)
+    print(f"{rows:,} rows written to {args.path}")
@@ -0,0 +1,141 @@
+import csv
+import logging
+import os
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Tag metadata: one row per TagIndex with its name, unit, engineering range and the
+# pot/line it belongs to. Adding tags (or a pot's worth of them) is an edit to this file.
+TAGS_FILE = "tags.csv"
+# Used when TAGS_FILE is missing: names only, straight from the historian
+TAG_TABLE = "MDR.dbo.TagTable"
+
+Tag = namedtuple("Tag", ["index", "name", "unit", "low", "high", "pot", "line"])
+
+
+def _number(text):
+    text = (text or "").strip()
+    return float(text) if text else None
+
+
+def _text(text):
+    text = (text or "").strip()
+    return text or None
+
+
+# Sort pots/lines numerically when they are numbers ("2" before "10"), missing ones last
+def _group_key(value):
+    if value is None:
+        return (2, 0, "")
+    if value.isdigit():
+        return (0, int(value), value)
+    return (1, 0, value)
+
+
+class TagRegistry:
+    def __init__(self, tags):
+        self.tags = sorted(tags, key=lambda t: t.index)
+        # TagIndex -> Tag / name, and name -> TagIndex (the pages' tag_index_mapping and
+        # reverse_tag_index_mapping)
+        self.by_index = {t.index: t for t in self.tags}
+        self.names = {t.index: t.name for t in self.tags}
+        self.indexes = {}
+        for t in self.tags:
+            # Names only have to be unique within a pot; use for_pot() to tell pots apart
+            self.indexes.setdefault(t.name, t.index)
+        self._by_pot = {}
+        # (name, pot) -> TagIndex: the same parameter across pots
+        self._by_name_pot = {}
+        for t in self.tags:
+            self._by_pot.setdefault(t.pot, []).append(t)
+            self._by_name_pot[(t.name, t.pot)] = t.index
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __contains__(self, index):
+        return index in self.by_index
+
+    def name(self, index):
+        tag = self.by_index.get(index)
+        return tag.name if tag is not None else f"TagIndex {index}"
+
+    def index(self, name):
+        return self.indexes[name]
+
+    # Name with the unit, for axis titles and labels
+    def label(self, index):
+        tag = self.by_index.get(index)
+        if tag is None or not tag.unit:
+            return self.name(index)
+        return f"{tag.name} ({tag.unit})"
+
+    # TagIndex -> (low, high) engineering range, for the tags that have one
+    def limits(self):
+        return {t.index: (t.low, t.high) for t in self.tags if t.low is not None or t.high is not None}
+
+    # Parameter names, each once, in TagIndex order
+    def parameters(self):
+        return list(dict.fromkeys(t.name for t in self.tags))
+
+    def lines(self):
+        return sorted({t.line for t in self.tags}, key=_group_key)
+
+    def pots(self, line=None):
+        pots = {t.pot for t in self.tags if line is None or t.line == line}
+        return sorted(pots, key=_group_key)
+
+    # pot -> TagIndex of one parameter, for the given pots (default: all that have it)
+    def pot_tags(self, parameter, pots=None):
+        if pots is None:
+            pots = self.pots()
+        return {pot: self._by_name_pot[(parameter, pot)] for pot in pots
+                if (parameter, pot) in self._by_name_pot}
+
+    # The tags of one pot as a registry of their own
+    def for_pot(self, pot):
+        return TagRegistry(self._by_pot.get(pot, []))
+
+
+def load_file(path=TAGS_FILE):
+    tags = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            tags.append(Tag(int(row["TagIndex"]), row["Name"].strip(), _text(row.get("Unit")),
+                            _number(row.get("Low")), _number(row.get("High")),
+                            _text(row.get("Pot")), _text(row.get("Line"))))
+    return TagRegistry(tags)
+
+
+def load_tag_table():
+    from DB_Query import read_sql
+
+    df = read_sql(f"SELECT TTagIndex AS TagIndex, TagName FROM {TAG_TABLE}")
+    return TagRegistry(Tag(int(i), str(name), None, None, None, None, None)
+                       for i, name in zip(df["TagIndex"], df["TagName"]))
+
+
+# Loaded once per process and shared by every page and session
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            if os.path.exists(TAGS_FILE):
+                _registry = load_file(TAGS_FILE)
+            else:
+                logger.info("%s not found, loading tag names from %s", TAGS_FILE, TAG_TABLE)
+                _registry = load_tag_table()
+    return _registry
+
+
+# Drop the loaded registry so the next get_registry() reads the tags again
+def reload():
+    global _registry
+    with _registry_lock:
+        _registry = None
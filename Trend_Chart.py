@@ -0,0 +1,97 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Dense-trend rendering for the trend pages. Series longer than DENSE_POINTS are drawn
+# as WebGL traces (Scattergl) instead of SVG, and value labels are only drawn where they
+# can be read: on every point of a sparse series, otherwise on the lowest and highest
+# point and on the points the user clicked. Several parameters share one figure.
+DENSE_POINTS = 1000   # Longer series are drawn with WebGL
+SPARSE_POINTS = 40    # Series up to this long get a label on every point
+PANEL_HEIGHT_PX = 150  # Height of one parameter panel in the shared figure
+LABEL_FONT = dict(size=16, color="black")
+
+# One parameter of a trend figure: key identifies it (TagIndex), name is its title,
+# y_range its y-axis range (None to fit the data) and extras more traces for its panel
+# (e.g. anomaly markers)
+Panel = namedtuple("Panel", ["key", "name", "times", "values", "y_range", "extras"])
+
+
+# Indices of the points of a series that get a value label
+def label_indices(values, selected=()):
+    n = len(values)
+    if n <= SPARSE_POINTS:
+        return np.arange(n)
+    kept = {int(np.nanargmin(values)), int(np.nanargmax(values))}
+    kept.update(int(i) for i in selected if 0 <= i < n)
+    return np.array(sorted(kept))
+
+
+# Line trace of one series; WebGL once the series is dense
+def line_trace(times, values, name, **kwargs):
+    import plotly.graph_objects as go
+
+    trace = go.Scattergl if len(values) > DENSE_POINTS else go.Scatter
+    return trace(x=times, y=values, mode='lines', name=name, **kwargs)
+
+
+# Text-only trace with the value labels of one series (a handful of points, so SVG)
+def label_trace(times, values, selected=()):
+    import plotly.graph_objects as go
+
+    times, values = np.asarray(times), np.asarray(values, dtype='float64')
+    kept = label_indices(values, selected)
+    return go.Scatter(x=times[kept], y=values[kept], mode='text', text=np.char.mod('%.10g', values[kept]),
+                      textposition='top center', textfont=LABEL_FONT, hoverinfo='skip', showlegend=False)
+
+
+# Points the user clicked (or box-selected) on the chart with this key, as
+# curve number -> point indices; read before the chart is drawn again
+def selected_points(chart_key):
+    import streamlit as st
+
+    state = st.session_state.get(chart_key)
+    points = state["selection"]["points"] if state else []
+    selected = {}
+    for point in points:
+        selected.setdefault(point["curve_number"], []).append(point["point_index"])
+    return selected
+
+
+# All panels in one figure: one row per panel on a shared date axis, or with
+# overlay=True every panel on the same axes. The line traces come first, in panel
+# order, so curve number i of a selection is always panels[i].
+def trend_figure(panels, title=None, overlay=False, selected=None):
+    from plotly.subplots import make_subplots
+
+    selected = selected or {}
+    n = len(panels)
+    rows = 1 if overlay else n
+    if title is None and rows == 1 and not overlay:
+        title = panels[0].name
+    fig = make_subplots(rows=rows, cols=1, shared_xaxes=True,
+                        subplot_titles=[panel.name for panel in panels] if rows > 1 else None,
+                        vertical_spacing=min(0.3 / rows, 0.05))
+    for i, panel in enumerate(panels):
+        fig.add_trace(line_trace(panel.times, panel.values, panel.name), row=1 if overlay else i + 1, col=1)
+    for i, panel in enumerate(panels):
+        row = 1 if overlay else i + 1
+        if len(panel.values):
+            fig.add_trace(label_trace(panel.times, panel.values, selected.get(i, ())), row=row, col=1)
+        for trace in panel.extras:
+            fig.add_trace(trace, row=row, col=1)
+        if panel.y_range is not None and not overlay:
+            fig.update_yaxes(range=panel.y_range, row=row, col=1)
+
+    fig.update_xaxes(showgrid=True)
+    fig.update_yaxes(showgrid=True)
+    fig.update_layout(
+        title=title,
+        autosize=True,
+        height=None if overlay else PANEL_HEIGHT_PX * n + 80,
+        showlegend=overlay,
+        margin=dict(l=0, r=0, t=50 if title else 30, b=30),
+        # Keep the user's zoom when a click reruns the page
+        uirevision=title,
+    )
+    return fig
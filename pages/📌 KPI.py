@@ -1,10 +1,12 @@
 import streamlit as st
-import pandas as pd
-import pyodbc
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from datetime import datetime, timedelta
-from DB_Conn import db_conn
+from DB_Query import SNAPSHOT_HOURS, DEFAULT_SNAPSHOT_HOUR, hour_label
+from Perf_Metrics import begin_rerun, finish_rerun, span
+from App_Startup import page_style, start_warmup
+from Tag_Registry import get_registry
+from KPI_Render import BACKENDS, BACKEND_PLOTLY, kpi_data, render_kpi
+from Anomaly import LIMITS_OFF_NOTE, summarize
+from Daily_Artifacts import kpi_artifact
 import warnings
 
 # Suppress the warning
@@ -13,48 +15,26 @@ warnings.simplefilter("ignore", category=UserWarning)
 # Set up the page configuration
 st.set_page_config(page_title="Historical Trend", page_icon=":trend", layout="wide")
 
+# Time this rerun (sidebar "Show Timings" shows the breakdown)
+begin_rerun("KPI")
+
+# Load tag metadata, DB connections and the plotting libraries in the background
+start_warmup()
+
 # Custom CSS for the app (if needed)
-with open('style.css') as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-    
-# Connect to the database
-conn = db_conn()
-
-# Define a function to fetch data from the database based on Date and Hour
-def fetch_data(startdate, enddate, hour, tag_index_list):
-    query = f"""
-        WITH newtbl_mdrRep1 AS (
-            SELECT 
-                Date, 
-                DateAndTime, 
-                Hour,       
-                TagIndex, 
-                Round(Val, 2) as Val,
-                ROW_NUMBER() OVER (PARTITION BY Date, TagIndex ORDER BY DateAndTime DESC) AS rn
-            FROM MDR.dbo.FloatTable 
-            WHERE Date BETWEEN '{startdate}' AND '{enddate}'  
-              AND Hour={hour}
-              AND TagIndex IN ({','.join(map(str, tag_index_list))})
-        )
-        SELECT Date, DateAndTime, TagIndex, Val
-        FROM newtbl_mdrRep1
-        WHERE rn = 1;
-    """
-    # Read the query result into a DataFrame
-    df = pd.read_sql(query, conn)
-    
-    # Close the database connection
-    conn.close()
+st.markdown(page_style(), unsafe_allow_html=True)
     
-    return df
+
+# Pot whose parameters are shown (only asked when the registry has more than one pot)
+pots = get_registry().pots()
+pot = st.sidebar.selectbox('Pot', pots) if len(pots) > 1 else pots[0]
+tags = get_registry().for_pot(pot)
 
 # TagIndex to Name mapping (for visualization purpose)
-tag_index_mapping = {
-    0:'Set V', 1:'Work V', 2:'Avg. V', 3:'Noise', 4:'ALF. Q', 5:'AE. Frq', 6:'ALO. Q', 7:'Act. Tap', 8:'Ex. ALF3', 9:'Bath. T', 10:'Bath. L', 11:'AL. L', 12:'Fe', 13:'Si', 14:'AE. Max V'
-}
+tag_index_mapping = tags.names
 
 # Reverse mapping for the backend (for the query)
-reverse_tag_index_mapping = {v:k for k, v in tag_index_mapping.items()}
+reverse_tag_index_mapping = tags.indexes
 
 # Get the current date
 current_date = datetime.today()
@@ -69,73 +49,47 @@ with col1:
 with col2:
     end_date = st.date_input('End Date', current_date)
 
-# TagIndex list (all parameters) to fetch all parameters by default
-tag_index_list = list(reverse_tag_index_mapping.values())
-hour = 6  # Hour can be a fixed value or you can allow the user to select it.
+# Chart renderer: server-side PNG or client-side Plotly
+backend = st.sidebar.radio('Chart Renderer', BACKENDS)
+
+# Flag limit breaches and unusual values on the charts
+highlight_anomalies = st.sidebar.toggle('Highlight Anomalies', value=True)
+if highlight_anomalies and not tags.limits():
+    st.sidebar.caption(LIMITS_OFF_NOTE)
 
-# Fetch the data based on the input parameters
-trend_data = fetch_data(start_date, end_date, hour, tag_index_list)
+# Snapshot hour (the value at the end of this hour of each day is shown)
+hour = st.sidebar.selectbox('Snapshot Hour', SNAPSHOT_HOURS, index=SNAPSHOT_HOURS.index(DEFAULT_SNAPSHOT_HOUR), format_func=hour_label)
+
+# The KPI data and figures are built once a day after the snapshot hour (Daily_Artifacts.py);
+# ranges outside that window are fetched and scored here
+artifact = kpi_artifact(pot, start_date, end_date, hour)
+if artifact is not None:
+    trend_data, anomalies, figures = artifact
+else:
+    trend_data, anomalies = kpi_data(start_date, end_date, hour, tags)
+    figures = {}
 
 # Check if the data is empty
 if not trend_data.empty:
-    # Convert DateAndTime to datetime
-    trend_data['DateAndTime'] = pd.to_datetime(trend_data['DateAndTime'], errors='coerce')
-    
-    # Convert Val to numeric
-    trend_data['Val'] = pd.to_numeric(trend_data['Val'], errors='coerce')
-    
-    # Check for missing values after conversion
-    trend_data.dropna(subset=['DateAndTime', 'Val'], inplace=True)
-    
-    # Ensure that data is sorted by DateAndTime
-    trend_data.sort_values(by='DateAndTime', inplace=True)
-    
-    # Map TagIndex back to names for visualization purposes
-    trend_data['Parameter'] = trend_data['TagIndex'].map(tag_index_mapping)
-
-    # Plotting each parameter separately
-    for parameter in tag_index_mapping.values():
-        # Filter the data for the specific parameter
-        param_data = trend_data[trend_data['Parameter'] == parameter]
-        
-        # Calculate min and max for the y-axis based on the data
-        y_min = param_data['Val'].min()
-        y_max = param_data['Val'].max()
-        
-        # Add some padding for the y-axis range to make the plot more readable
-        y_padding = (y_max - y_min)
-        y_range = [y_min - y_padding, y_max + y_padding]
-
-        # Create the matplotlib plot
-        fig, ax = plt.subplots(figsize=(10, 2))
-        
-        ax.plot(param_data['DateAndTime'], param_data['Val'], marker='o', linestyle='-', color='b', label=parameter)
-         # Annotate each data point with its value
-        for i, row in param_data.iterrows():
-            ax.annotate(f'{row["Val"]}', 
-                        (row['DateAndTime'], row['Val']),
-                        textcoords="offset points", 
-                        xytext=(0, 5), 
-                        ha='center', fontsize=9, color='black')
-        
-        # Add labels
-        ax.set_title(f"{parameter}")
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Value")
-        
-        # Formatting the x-axis
-        ax.xaxis.set_major_locator(mdates.DayLocator())
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d'))
-        ax.xaxis.set_minor_locator(mdates.DayLocator())
-        plt.xticks(rotation=45)
-
-        # Set y-axis range with padding
-        ax.set_ylim(y_range)
-
-        # Add gridlines
-        ax.grid(True)
-
-        # Display the plot in Streamlit
-        st.pyplot(fig)
+    if highlight_anomalies:
+        with st.expander(f"Anomalies ({len(anomalies)} flagged points)"):
+            st.dataframe(summarize(anomalies, tag_index_mapping), use_container_width=True, hide_index=True)
+    else:
+        anomalies = None
+
+    # Draw every parameter as one figure with a shared date axis (precomputed for the
+    # default view; otherwise cached, so reruns with the same data don't draw again)
+    kpi_figure = figures.get(backend) if highlight_anomalies else None
+    if kpi_figure is None:
+        kpi_figure = render_kpi(trend_data, tag_index_mapping.values(), backend, anomalies)
+    if backend == BACKEND_PLOTLY:
+        with span("render.plotly"):
+            st.plotly_chart(kpi_figure, use_container_width=True)
+    else:
+        with span("render.image"):
+            st.image(kpi_figure, width="stretch")
 else:
     st.write("No data found for the selected filters.")
+
+# Log this rerun's timings and show them when switched on
+finish_rerun()
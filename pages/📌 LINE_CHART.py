@@ -1,109 +1,109 @@
 import streamlit as st
-import numpy as np
-import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime, timedelta
-from DB_Conn import db_conn  # Assuming your db_conn function is correct
+from DB_Query import fetch_downsampled
+from Perf_Metrics import begin_rerun, finish_rerun, span
+from App_Startup import start_warmup
+from Downsample import DEFAULT_CHART_WIDTH_PX, buckets_for_width
+from Tag_Registry import get_registry
+from Trend_Chart import line_trace
+
+# Time this rerun (sidebar "Show Timings" shows the breakdown)
+begin_rerun("LINE_CHART")
+
+# Load tag metadata, DB connections and the plotting libraries in the background
+start_warmup()
 
 # Set up the title and header
 st.header('Energy over Time')
 
-# Fetch data from SQL
-conn = db_conn()
-cursor = conn.cursor()
-
-# SQL query to fetch data from your table
-query = """
-    SELECT [DateAndTime], [TagIndex], [Val]
-    FROM [MDR].[dbo].[FloatTable]
-    WHERE [DateAndTime] BETWEEN ? AND ?
-"""
 # Set the default start and end date as yesterday and today
 start_date = datetime.now() - timedelta(days=1)
 end_date = datetime.now()
 
+# Tags that can be charted (the tags of the selected pot)
+pots = get_registry().pots()
+pot = st.sidebar.selectbox('Pot', pots) if len(pots) > 1 else pots[0]
+tags = get_registry().for_pot(pot)
+tag_index_options = list(tags.names)
+
 # Allow the user to select a start and end date
-col1, col2 = st.columns(2)
+col1, col2, col3 = st.columns(3)
 
 with col1:
     start_date = st.date_input('Start Date', start_date)
 with col2:
     end_date = st.date_input('End Date', end_date)
+with col3:
+    # Select box for the parameter (by name; the TagIndex is what gets queried)
+    selected_tag = st.selectbox('Select Parameter', tag_index_options, format_func=tags.name)
+
+# Width the chart is drawn at; the data is reduced to about two points per pixel
+chart_width = st.sidebar.number_input('Chart width (px)', min_value=400, max_value=4000,
+                                      value=DEFAULT_CHART_WIDTH_PX, step=100)
 
 # Convert the start and end dates to datetime objects
 start_date = pd.to_datetime(start_date)
 end_date = pd.to_datetime(end_date)
 
-# Execute SQL query with date parameters using '?' as placeholders
-cursor.execute(query, (start_date, end_date))
-data = cursor.fetchall()
-
-# Debugging: Print the raw fetched data
-st.write("Raw Fetched Data:", data)  # Add this line to inspect the fetched data
-
-# Convert fetched rows to a DataFrame
-data = []
-for row in data:
-    datetime_val, tag_index, val = row
-    st.write(f"Processing row: {row}")  # Debugging: Show each row before processing
-    
-    # Check the data types of the fields
-    st.write(f"DateTime: {datetime_val}, TagIndex: {tag_index}, Val: {val}")  # Debugging: Show data types
-
-    try:
-        val = round(float(val), 2)
-    except ValueError as e:
-        st.write(f"ValueError for row: {row}, Error: {e}")  # Debugging: If conversion fails, print error
-        val = np.nan  # If conversion fails, set to NaN (could also handle differently)
-    
-    # Append the processed data to the list
-    data.append([datetime_val, tag_index, val])
-
+# Box-selecting part of the chart zooms into it; the zoomed window is fetched again
+# at full resolution. Reset the zoom whenever the range or tag changes.
+view_key = (start_date, end_date, selected_tag)
+if st.session_state.get("line_chart_view_key") != view_key:
+    st.session_state["line_chart_view_key"] = view_key
+    st.session_state["line_chart_zoom"] = None
+zoom = st.session_state["line_chart_zoom"]
+view_start, view_end = zoom if zoom else (start_date, end_date)
 
+if zoom and st.button("Reset Zoom"):
+    st.session_state["line_chart_zoom"] = None
+    st.rerun()
 
-# Create DataFrame from the fetched data
-df = pd.DataFrame(data, columns=['DateAndTime', 'TagIndex', 'Val'])
+# Fetch the selected TagIndex reduced to time buckets (min/max/avg per bucket),
+# or the raw samples when the window is small enough
+df = fetch_downsampled(view_start, view_end, selected_tag, buckets_for_width(chart_width))
 
-# Debugging: Check the DataFrame structure
-st.write("DataFrame after processing:", df.head())  # Display DataFrame for inspection
-
-# Ensure 'DateAndTime' is in datetime format
-df['DateAndTime'] = pd.to_datetime(df['DateAndTime'])
-
-# Check if DataFrame is empty after processing
+# Check if there is any data for the selected range
 if df.empty:
-    st.warning("No data available after processing.")
+    st.warning(f"No data available for {tags.name(selected_tag)} in the selected date range ({start_date.strftime('%d-%m-%Y')} to {end_date.strftime('%d-%m-%Y')}).")
 else:
-    # Select box for TagIndex selection
-    selected_tag = st.selectbox('Select TagIndex', df['TagIndex'].unique())
-
-    # Debugging: Print unique TagIndexes
-    st.write("Available TagIndexes:", df['TagIndex'].unique())  # Add this line to inspect TagIndexes
-
-    # Filter the data based on selected TagIndex
-    filtered_df = df[df['TagIndex'] == selected_tag]
-
-    # Further filter by selected date range
-    filtered_df = filtered_df[(filtered_df['DateAndTime'] >= start_date) & (filtered_df['DateAndTime'] <= end_date)]
-
-    # Debugging: Check the filtered data
-    st.write("Filtered Data:", filtered_df)  # Add this line to inspect filtered data
-
-    # Check if there is any data after filtering
-    if filtered_df.empty:
-        st.warning(f"No data available for TagIndex {selected_tag} in the selected date range ({start_date.strftime('%d-%m-%Y')} to {end_date.strftime('%d-%m-%Y')}).")
+    title = f'{tags.name(selected_tag)} - Energy Over Time ({view_start.strftime("%d-%m-%Y %H:%M")} to {view_end.strftime("%d-%m-%Y %H:%M")})'
+    if (df['Samples'] == 1).all():
+        # Raw samples: a plain line (WebGL once there are thousands of points)
+        fig = go.Figure([line_trace(df['DateAndTime'], df['AvgVal'], tags.name(selected_tag))])
+        fig.update_layout(title=title, yaxis_title=tags.label(selected_tag))
     else:
-        # Create an interactive line chart using Plotly
-        fig = px.line(filtered_df, x='DateAndTime', y='Val', title=f'TagIndex {selected_tag} - Energy Over Time ({start_date.strftime("%d-%m-%Y")} to {end_date.strftime("%d-%m-%Y")})')
-
-        # Ensure the x-axis treats the DateAndTime as a date-time type and display the correct range
-        fig.update_layout(
-            xaxis=dict(
-                tickformat="%d-%m-%Y %H:%M:%S",  # Format to show date and time
-                type="date",  # Ensure the x-axis treats the DateAndTime as a date type
-                range=[start_date, end_date]  # Ensure the range matches the selected date range
-            )
+        # Bucketed samples: average line inside a shaded min/max envelope, so spikes stay visible
+        fig = go.Figure([
+            line_trace(df['DateAndTime'], df['MaxVal'], 'Max', line=dict(width=0), showlegend=False,
+                       hoverinfo='skip'),
+            line_trace(df['DateAndTime'], df['MinVal'], 'Min / Max', line=dict(width=0), fill='tonexty',
+                       fillcolor='rgba(99, 110, 250, 0.25)'),
+            line_trace(df['DateAndTime'], df['AvgVal'], 'Average'),
+        ])
+        fig.update_layout(title=title, yaxis_title=tags.label(selected_tag))
+        st.caption(f"{int(df['Samples'].sum()):,} samples shown as {len(df):,} time buckets. "
+                   "Box-select a part of the chart to zoom in.")
+
+    # Ensure the x-axis treats the DateAndTime as a date-time type and display the correct range
+    fig.update_layout(
+        width=chart_width,
+        xaxis=dict(
+            tickformat="%d-%m-%Y %H:%M:%S",  # Format to show date and time
+            type="date",  # Ensure the x-axis treats the DateAndTime as a date type
+            range=[view_start, view_end]  # Ensure the range matches the selected date range
         )
-
-        # Display the Plotly chart
-        st.plotly_chart(fig)
+    )
+
+    # Display the Plotly chart; a box selection reruns the page with the new window
+    with span("render.plotly"):
+        event = st.plotly_chart(fig, key="line_chart", on_select="rerun", selection_mode="box")
+    boxes = event.selection.get("box", []) if event else []
+    if boxes:
+        x0, x1 = sorted(pd.to_datetime(boxes[0]["x"]))
+        st.session_state["line_chart_zoom"] = (max(x0, view_start), min(x1, view_end))
+        st.rerun()
+
+# Log this rerun's timings and show them when switched on
+finish_rerun()
@@ -0,0 +1,114 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from datetime import datetime, timedelta
+from DB_Query import fetch_daily_snapshots, SNAPSHOT_HOURS, DEFAULT_SNAPSHOT_HOUR, hour_label
+from Perf_Metrics import begin_rerun, finish_rerun, span
+from App_Startup import page_style, start_warmup
+from Tag_Registry import get_registry
+from Pot_Stats import OUTLIER_Z, line_statistics, outliers, pot_matrix, pot_ranking
+import warnings
+
+# Suppress the warning
+warnings.simplefilter("ignore", category=UserWarning)
+
+# Set up the page configuration
+st.set_page_config(page_title="Pot Overview", page_icon=":trend", layout="wide")
+
+# Time this rerun (sidebar "Show Timings" shows the breakdown)
+begin_rerun("POT_HEATMAP")
+
+# Load tag metadata, DB connections and the plotting libraries in the background
+start_warmup()
+
+# Custom CSS for the app (if needed)
+st.markdown(page_style(), unsafe_allow_html=True)
+
+registry = get_registry()
+
+# Get the current date
+current_date = datetime.today()
+
+# Streamlit UI elements to pick the line, parameter and date range
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    line = st.selectbox('Line', registry.lines())
+with col2:
+    parameter = st.selectbox('Parameter', registry.parameters())
+with col3:
+    start_date = st.date_input('Start Date', current_date - timedelta(days=15))
+with col4:
+    end_date = st.date_input('End Date', current_date)
+
+hour = st.sidebar.selectbox('Snapshot Hour', SNAPSHOT_HOURS, index=SNAPSHOT_HOURS.index(DEFAULT_SNAPSHOT_HOUR), format_func=hour_label)
+view = st.sidebar.radio('View', ['Heatmap', 'Small Multiples'])
+color_by = st.sidebar.radio('Color By', ['Value', 'Deviation from line (z)'])
+small_multiples = st.sidebar.number_input('Pots in Small Multiples', min_value=4, max_value=48, value=12, step=4)
+
+# The parameter's TagIndex in every pot of the line: all of them are fetched in one query
+pot_tags = registry.pot_tags(parameter, registry.pots(line))
+snapshots = fetch_daily_snapshots(start_date, end_date, hour, list(pot_tags.values()))
+
+if snapshots.empty:
+    st.write("No data found for the selected filters.")
+    finish_rerun()
+    st.stop()
+
+# Pot x Date matrix and line statistics (vectorized over all pots)
+matrix = pot_matrix(snapshots, pot_tags)
+daily, z = line_statistics(matrix)
+flagged = outliers(matrix, z)
+unit = registry.by_index[next(iter(pot_tags.values()))].unit or ''
+
+st.caption(f"{parameter} at {hour:02d}:00 for {len(pot_tags)} pots on line {line}; "
+           f"{len(flagged)} pot-days more than {OUTLIER_Z} robust standard deviations from the line.")
+
+# Line level: mean with the 10th-90th percentile band
+band = go.Figure([
+    go.Scatter(x=daily.index, y=daily['P90'], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'),
+    go.Scatter(x=daily.index, y=daily['P10'], mode='lines', line=dict(width=0), fill='tonexty',
+               fillcolor='rgba(99, 110, 250, 0.25)', name='P10 - P90'),
+    go.Scatter(x=daily.index, y=daily['Mean'], mode='lines+markers', name='Mean'),
+    go.Scatter(x=daily.index, y=daily['Median'], mode='lines', line=dict(dash='dot'), name='Median'),
+])
+band.update_layout(title=f"Line {line} - {parameter}", yaxis_title=f"{parameter} ({unit})" if unit else parameter,
+                   height=300, margin=dict(l=0, r=0, t=50, b=30))
+with span("render.plotly"):
+    st.plotly_chart(band, use_container_width=True)
+
+if view == 'Heatmap':
+    # One figure for every pot: rows are pots, columns are days
+    shown = z if color_by != 'Value' else matrix
+    fig = go.Figure(go.Heatmap(
+        z=shown.to_numpy(), x=shown.columns, y=[str(p) for p in shown.index],
+        colorscale='RdBu_r' if color_by != 'Value' else 'Viridis',
+        zmid=0 if color_by != 'Value' else None,
+        customdata=matrix.to_numpy(),
+        hovertemplate="Pot %{y}<br>%{x|%d-%m-%Y}<br>Val %{customdata}<extra></extra>",
+    ))
+    fig.update_layout(height=max(300, 12 * len(shown.index)), margin=dict(l=0, r=0, t=30, b=30),
+                      yaxis=dict(title='Pot', type='category', autorange='reversed'))
+    with span("render.plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+else:
+    # The pots furthest from the line, as small multiples of one figure
+    worst = pot_ranking(z).index[:small_multiples]
+    long = matrix.loc[worst].reset_index().melt(id_vars='Pot', var_name='Date', value_name='Val')
+    # Each panel also shows the line median for reference
+    median = pd.DataFrame({'Date': daily.index, 'Val': daily['Median'].to_numpy()})
+    long = pd.concat([long.assign(Series='Pot'),
+                      median.merge(pd.DataFrame({'Pot': worst}), how='cross').assign(Series='Line median')])
+    fig = px.line(long, x='Date', y='Val', color='Series', facet_col='Pot', facet_col_wrap=4,
+                  category_orders={'Pot': list(worst)})
+    fig.for_each_annotation(lambda a: a.update(text=a.text.replace('Pot=', 'Pot ')))
+    fig.update_layout(height=200 * ((len(worst) + 3) // 4), margin=dict(l=0, r=0, t=30, b=30))
+    with span("render.plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+
+# Outlier pot-days, worst first
+with st.expander(f"Outlier pots ({len(flagged)})"):
+    st.dataframe(flagged, use_container_width=True, hide_index=True)
+
+# Log this rerun's timings and show them when switched on
+finish_rerun()
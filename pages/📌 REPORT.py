@@ -1,70 +1,114 @@
-import pandas as pd
-import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
-from DB_Conn import db_conn
+from DB_Query import REPORT_SORT_KEYS, fetch_report_page
+from Perf_Metrics import begin_rerun, finish_rerun, span
+from App_Startup import logo, start_warmup
+from Tag_Registry import get_registry
+from Report_Export import EXPORT_FORMATS, available_formats, build_report_export
+from Daily_Artifacts import REPORT_CSV_FORMAT, read_artifact, report_csv, report_page, report_window
 from datetime import datetime, timedelta
+from functools import partial
 
 # Set up the page configuration
 st.set_page_config(page_title="Report", page_icon=":table", layout="wide")
 
-st.subheader("Technical Parameters Report")
+# Time this rerun (sidebar "Show Timings" shows the breakdown)
+begin_rerun("REPORT")
 
-# Logo
-st.sidebar.image("data/C_logo.jpeg")
+# Load tag metadata, DB connections and the plotting libraries in the background
+start_warmup()
 
-# Read data from MS SQL Server
-conn = db_conn()
-cursor = conn.cursor()
+st.subheader("Technical Parameters Report")
 
-# Example to fetch data from MS SQL server
-cursor.execute("Select DateAndTime, TagIndex, Val from [MDR].[dbo].[FloatTable] order by DateAndtime Desc")
+# Logo
+with span("render.image"):
+    st.sidebar.image(logo())
 
-# Fetch all rows
-rows = cursor.fetchall()
+# Choices for the number of rows shown per page of the report table
+PAGE_SIZES = [50, 100, 250, 500]
 
-# Convert fetched rows to a DataFrame
-data = []
-for row in rows:
-    datetime_val, tag_index, val = row
-    try:
-        val = round(float(val),2)
-    except ValueError:
-        val = np.nan  # If conversion fails, set to NaN (could also handle differently)
-    
-    data.append([datetime_val, tag_index, val])
+# Pot whose parameters are shown (only asked when the registry has more than one pot)
+pots = get_registry().pots()
+pot = st.sidebar.selectbox('Pot', pots) if len(pots) > 1 else pots[0]
+tags = get_registry().for_pot(pot)
 
-# Convert the data to a pandas DataFrame
-df = pd.DataFrame(data, columns=["DateAndTime", "TagIndex", "Val"])
+# TagIndex to Name mapping (for the parameter filter)
+tag_index_mapping = tags.names
 
-# Optional: Format DateAndTime for display (if needed)
-df["DateAndTime"] = pd.to_datetime(df["DateAndTime"])
+# Reverse mapping for the backend (for the query)
+reverse_tag_index_mapping = tags.indexes
 
 # Date and Time filters (default to current datetime - 1 day for start, current datetime for end)
 current_time = datetime.now()
 start_datetime_default = current_time - timedelta(days=1)
 end_datetime_default = current_time
 
+st.session_state.setdefault("report_start_date", start_datetime_default.date())
+st.session_state.setdefault("report_start_time", start_datetime_default.time())
+st.session_state.setdefault("report_end_date", end_datetime_default.date())
+st.session_state.setdefault("report_end_time", end_datetime_default.time())
+
+
+# Set the filters to the precomputed previous day (midnight to midnight)
+def show_previous_day(window):
+    st.session_state["report_start_date"], st.session_state["report_start_time"] = window[0].date(), window[0].time()
+    st.session_state["report_end_date"], st.session_state["report_end_time"] = window[1].date(), window[1].time()
+
+
+# The previous day is built ahead of time (Daily_Artifacts.py) and served without querying
+previous_day = report_window()
+if previous_day is not None:
+    st.sidebar.button("Previous Day", on_click=show_previous_day, args=(previous_day,))
+
 # Create columns for displaying widgets side  by side
-col1, col2,col3,col4 = st.columns([1, 1,1,1]) # You can adjust the width ratio
+col1, col2,col3,col4,col5 = st.columns([1, 1,1,1,2]) # You can adjust the width ratio
 
 #Create date and time input widgets inside the column
 with col1:
-    start_date = st.date_input("Satrt Date", value=start_datetime_default.date())
+    start_date = st.date_input("Satrt Date", key="report_start_date")
 with col2:
-    start_time = st.time_input("Start Time", value=start_datetime_default.time())    
+    start_time = st.time_input("Start Time", key="report_start_time")
 with col3:
-    end_date = st.date_input("End Date", value=end_datetime_default.date())
+    end_date = st.date_input("End Date", key="report_end_date")
 with col4:
-    end_time = st.time_input("End Time", value=end_datetime_default.time())   
+    end_time = st.time_input("End Time", key="report_end_time")
+with col5:
+    # Leave empty to report every TagIndex
+    selected_tag_names = st.multiselect('Select Parameter', options=list(tag_index_mapping.values()))
 
 
 # Combine the selected date and time to form datetime objects
 start_datetime = datetime.combine(start_date, start_time)
 end_datetime = datetime.combine(end_date, end_time)
 
-# Filter the DataFrame based on the selected date range
-filtered_df = df[(df["DateAndTime"] >= start_datetime) & (df["DateAndTime"] <= end_datetime)]
+# Convert selected Parameter to corresponding TagIndex for database query
+tag_index_list = [reverse_tag_index_mapping[name] for name in selected_tag_names]
+
+# Sorting and page size (sorting is done by the database, not in the browser)
+col6, col7, col8 = st.columns([1, 1, 1])
+with col6:
+    sort_by = st.selectbox("Sort By", list(REPORT_SORT_KEYS))
+with col7:
+    descending = st.radio("Order", ["Descending", "Ascending"], horizontal=True) == "Descending"
+with col8:
+    page_size = st.selectbox("Rows per Page", PAGE_SIZES, index=len(PAGE_SIZES) - 1)
+
+# Keep a stack of page start keys; reset it whenever the filters or sort change
+filter_key = (start_datetime, end_datetime, tuple(tag_index_list), sort_by, descending, page_size)
+if st.session_state.get("report_filter_key") != filter_key:
+    st.session_state["report_filter_key"] = filter_key
+    st.session_state["report_page_keys"] = [None]
+page_keys = st.session_state["report_page_keys"]
+
+# Fetch (and format, below) only the page currently shown; ranges inside the
+# precomputed day are read from its file instead of queried
+precomputed_page = report_page(start_datetime, end_datetime, tag_index_list, page_size,
+                               sort_by=sort_by, descending=descending, after=page_keys[-1])
+if precomputed_page is not None:
+    filtered_df, next_key = precomputed_page
+else:
+    filtered_df, next_key = fetch_report_page(start_datetime, end_datetime, tag_index_list, page_size,
+                                              sort_by=sort_by, descending=descending, after=page_keys[-1])
 
 # Use Plotly to create a table with customizable column width and properties
 table = go.Figure(data=[go.Table(
@@ -85,7 +129,7 @@ table.update_layout(
     margin=dict(t=25, b=10),  # Margins around the table
     width=1000,  # Set width for the entire table
     height=550,  # Set height for the table (you can adjust this value as needed)
-    
+
 )
 
 # Customizing individual column widths
@@ -94,16 +138,42 @@ table.update_traces(
 )
 
 # Display the Plotly table
-st.plotly_chart(table)
-# Add a CSV download button
-# Convert the filtered dataframe to CSV format
-csv = filtered_df.to_csv(index=False)
-
-# Create a download button for the CSV file
+with span("render.plotly"):
+    st.plotly_chart(table)
+
+# Page navigation
+nav1, nav2, nav3 = st.columns([1, 1, 4])
+with nav1:
+    if st.button("Previous Page", disabled=len(page_keys) == 1):
+        page_keys.pop()
+        st.rerun()
+with nav2:
+    if st.button("Next Page", disabled=next_key is None):
+        page_keys.append(next_key)
+        st.rerun()
+with nav3:
+    st.write(f"Page {len(page_keys)}")
+
+# Add a download button for the filtered rows
+# The export file is only built when the button is clicked (on a separate thread),
+# streaming the rows from the database into a compressed file chunk by chunk
+export_format = st.selectbox("Export Format", available_formats())
 st.download_button(
-    label="Download Filtered CSV",
-    data=csv,
-    file_name="filtered_technical_parameters.csv",
-    mime="text/csv"
+    label="Download Filtered Data",
+    data=partial(build_report_export, start_datetime, end_datetime, tag_index_list, export_format),
+    file_name=f"filtered_technical_parameters.{EXPORT_FORMATS[export_format][0]}",
+    mime=EXPORT_FORMATS[export_format][1]
 )
 
+# The whole precomputed day, every parameter, as built (read only when clicked)
+precomputed_csv = report_csv()
+if precomputed_csv is not None:
+    st.download_button(
+        label=f"Download {previous_day[0]:%d-%m-%Y} (all parameters, CSV)",
+        data=partial(read_artifact, precomputed_csv[1]),
+        file_name=precomputed_csv[0],
+        mime=EXPORT_FORMATS[REPORT_CSV_FORMAT][1]
+    )
+
+# Log this rerun's timings and show them when switched on
+finish_rerun()
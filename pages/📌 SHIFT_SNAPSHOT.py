@@ -0,0 +1,94 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime, time, timedelta
+from DB_Query import fetch_asof, SHIFT_HOURS
+from Perf_Metrics import begin_rerun, finish_rerun, span
+from App_Startup import page_style, start_warmup
+from Tag_Registry import get_registry
+import warnings
+
+# Suppress the warning
+warnings.simplefilter("ignore", category=UserWarning)
+
+# Set up the page configuration
+st.set_page_config(page_title="Shift Snapshot", page_icon=":trend", layout="wide")
+
+# Time this rerun (sidebar "Show Timings" shows the breakdown)
+begin_rerun("SHIFT_SNAPSHOT")
+
+# Load tag metadata, DB connections and the plotting libraries in the background
+start_warmup()
+
+# Custom CSS for the app (if needed)
+st.markdown(page_style(), unsafe_allow_html=True)
+
+
+# Pot whose parameters are shown (only asked when the registry has more than one pot)
+pots = get_registry().pots()
+pot = st.sidebar.selectbox('Pot', pots) if len(pots) > 1 else pots[0]
+tags = get_registry().for_pot(pot)
+
+# TagIndex to Name mapping (for visualization purpose)
+tag_index_mapping = tags.names
+
+# Streamlit UI elements to pick the snapshot times
+col1, col2, col3 = st.columns(3)
+with col1:
+    snapshot_date = st.date_input('Date', datetime.today())
+with col2:
+    shift_hours = st.multiselect('Shift Changes', SHIFT_HOURS, default=SHIFT_HOURS,
+                                 format_func=lambda h: f"{h:02d}:00")
+with col3:
+    custom_time = st.text_input('Other Times (HH:MM, comma separated)', '')
+
+selected_params = st.multiselect('Select Parameters', list(tag_index_mapping.values()),
+                                 default=list(tag_index_mapping.values()))
+max_age_hours = st.sidebar.number_input('Ignore Values Older Than (hours)', min_value=1, max_value=168, value=24)
+
+# Snapshot timestamps: the selected shift changes plus any custom times of the day
+timestamps = [datetime.combine(snapshot_date, time(h)) for h in shift_hours]
+try:
+    for text in filter(None, (t.strip() for t in custom_time.split(','))):
+        timestamps.append(datetime.combine(snapshot_date, time.fromisoformat(text)))
+except ValueError:
+    st.error("Times must be written as HH:MM, e.g. 09:30, 18:45")
+    finish_rerun()
+    st.stop()
+
+# Each time once (a custom time may repeat a shift change), in order
+timestamps = sorted(set(timestamps))
+tag_index_list = [k for k, v in tag_index_mapping.items() if v in selected_params]
+
+
+# Column label of a snapshot time: HH:MM, with the seconds when it has them
+def time_label(timestamp):
+    if timestamp.second or timestamp.microsecond:
+        return timestamp.time().isoformat()
+    return timestamp.strftime('%H:%M')
+
+
+if timestamps and tag_index_list:
+    # Value of every selected tag as of every timestamp, in one query
+    snapshot = fetch_asof(timestamps, tag_index_list, max_age=timedelta(hours=max_age_hours))
+    # One row per parameter, one column per snapshot time (pivoted on the full timestamp
+    # and labelled afterwards, so each column is one distinct time)
+    with span("pandas.pivot"):
+        snapshot['Parameter'] = snapshot['TagIndex'].map(tag_index_mapping)
+        snapshot['AsOf'] = pd.to_datetime(snapshot['AsOf'])
+        table = snapshot.pivot(index='Parameter', columns='AsOf', values='Val')
+        table = table.reindex([tag_index_mapping[t] for t in tag_index_list])
+        table.columns = [time_label(ts) for ts in table.columns]
+        # When each value was actually sampled (it may be older than the snapshot time)
+        sampled = snapshot.pivot(index='Parameter', columns='AsOf', values='DateAndTime')
+        sampled = sampled.reindex(table.index)
+        sampled.columns = [time_label(ts) for ts in sampled.columns]
+
+    with span("render.dataframe"):
+        st.dataframe(table, use_container_width=True)
+        with st.expander("Sample times"):
+            st.dataframe(sampled, use_container_width=True)
+else:
+    st.write("Select at least one time and one parameter.")
+
+# Log this rerun's timings and show them when switched on
+finish_rerun()
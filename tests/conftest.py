@@ -0,0 +1,40 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import DB_Pool
+import Synthetic_FloatTable
+
+# A small stand-in: 2 days of 4 tags every 10 minutes, ending at a fixed midnight
+STANDIN_END = datetime(2026, 1, 3)
+STANDIN_DAYS = 2
+STANDIN_TAGS = 4
+STANDIN_SAMPLE_SECONDS = 600
+
+
+# Stand-in FloatTable in a fresh directory (also the working directory, so data/... paths
+# land there), installed as DB_Query's database. Returns the database path.
+@pytest.fixture
+def standin(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "floattable.sqlite")
+    Synthetic_FloatTable.create(path, days=STANDIN_DAYS, tags=STANDIN_TAGS,
+                                sample_seconds=STANDIN_SAMPLE_SECONDS, end=STANDIN_END)
+    Synthetic_FloatTable.install(path)
+    yield path
+    with DB_Pool._pool_lock:
+        if DB_Pool._pool is not None:
+            DB_Pool._pool.dispose()
+        DB_Pool._pool = None
+
+
+# A direct connection to the stand-in, for checking what the code under test wrote or read
+@pytest.fixture
+def standin_conn(standin):
+    conn = Synthetic_FloatTable.connect(standin)
+    yield conn
+    conn.close()
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Anomaly import REASON_EWMA, REASON_HIGH, REASON_LOW, REASON_Z, AnomalyDetector
+
+LIMITS = {0: (None, 105.0), 2: (-3.0, None)}
+KEYS = ['TagIndex', 'DateAndTime']
+
+
+def _trend():
+    rng = np.random.default_rng(7)
+    times = pd.date_range("2026-01-01", periods=400, freq="min")
+    frames = []
+    for tag, level in [(0, 100.0), (1, 50.0), (2, 0.0)]:
+        val = level + rng.normal(size=len(times))
+        val[[60, 200, 333]] += [12.0, -15.0, 9.0]
+        keep = np.ones(len(times), dtype=bool)
+        if tag == 1:
+            # Starts later and has a gap
+            keep[:50] = keep[150:170] = False
+        frames.append(pd.DataFrame({'DateAndTime': times[keep], 'TagIndex': tag, 'Val': val[keep]}))
+    return pd.concat(frames).sort_values(['DateAndTime', 'TagIndex'], ignore_index=True)
+
+
+def _scored(chunks):
+    detector = AnomalyDetector(LIMITS)
+    scored = pd.concat([detector.update(chunk) for chunk in chunks], ignore_index=True)
+    return scored.sort_values(KEYS, ignore_index=True), detector
+
+
+@pytest.mark.parametrize("chunk_rows", [5, 64, 500])
+def test_chunks_score_the_same_as_one_pass(chunk_rows):
+    trend = _trend()
+    whole, whole_detector = _scored([trend])
+
+    chunks = [trend.iloc[i:i + chunk_rows] for i in range(0, len(trend), chunk_rows)]
+    chunked, chunked_detector = _scored(chunks)
+
+    columns = ['DateAndTime', 'TagIndex', 'Val', 'RollingZ', 'EwmaZ', 'Reason']
+    pd.testing.assert_frame_equal(chunked[columns], whole[columns], check_dtype=False)
+    pd.testing.assert_frame_equal(chunked_detector.events.sort_values(KEYS, ignore_index=True),
+                                  whole_detector.events.sort_values(KEYS, ignore_index=True), check_dtype=False)
+
+
+def test_every_rule_fires_on_the_planted_excursions():
+    scored, detector = _scored([_trend()])
+
+    assert set(detector.events['Reason']) == {REASON_HIGH, REASON_LOW, REASON_Z, REASON_EWMA}
+    # Tag 1 has no limits, so its dip is caught by the statistics alone
+    dip = scored.set_index(KEYS).loc[(1, pd.Timestamp("2026-01-01 03:20"))]
+    assert dip['Reason'] in (REASON_Z, REASON_EWMA)
+
+
+def test_rows_already_scored_are_skipped():
+    trend = _trend()
+    detector = AnomalyDetector(LIMITS)
+    detector.update(trend.iloc[:300])
+
+    again = detector.update(trend.iloc[:600])
+
+    assert len(again) == 300
+    assert detector.update(trend.iloc[:600]).empty
@@ -0,0 +1,72 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import DB_Query
+
+HOUR = 7
+KEYS = ['Date', 'TagIndex']
+
+
+@pytest.fixture
+def queries(standin, monkeypatch):
+    fetch_data = DB_Query.fetch_data
+    calls = []
+
+    def recorded(startdate, enddate, hour, tag_index_list):
+        calls.append((startdate, enddate, list(tag_index_list)))
+        return fetch_data(startdate, enddate, hour, tag_index_list)
+
+    monkeypatch.setattr(DB_Query, "fetch_data", recorded)
+    yield calls
+    DB_Query.clear_cache()
+
+
+def _snapshots(startdate, enddate, tags):
+    df = DB_Query.fetch_daily_snapshots(startdate, enddate, HOUR, tags)
+    return df.assign(Date=pd.to_datetime(df['Date'])).sort_values(KEYS, ignore_index=True)
+
+
+def _direct(startdate, enddate, tags):
+    df = DB_Query.query_snapshots(startdate, enddate, HOUR, tags)
+    return df.assign(Date=pd.to_datetime(df['Date'])).sort_values(KEYS, ignore_index=True)
+
+
+def test_missing_cells_are_grouped_into_runs_of_days():
+    d = [date(2026, 1, day) for day in range(1, 8)]
+    missing = [(d[0], 1), (d[1], 1), (d[2], 1), (d[0], 2), (d[1], 2), (d[2], 2), (d[5], 2), (d[3], 3)]
+
+    assert DB_Query._snapshot_runs(missing) == [
+        (d[0], d[2], [1, 2]),
+        (d[3], d[3], [3]),
+        (d[5], d[5], [2]),
+    ]
+
+
+def test_only_the_gaps_are_queried(queries):
+    first = _snapshots(date(2026, 1, 1), date(2026, 1, 1), [0, 1])
+    assert queries == [(date(2026, 1, 1), date(2026, 1, 1), [0, 1])]
+
+    # One more day and one more tag: only the cells not stored yet are asked for, the
+    # new tag for both days and the stored tags for the new day
+    queries.clear()
+    wider = _snapshots(date(2026, 1, 1), date(2026, 1, 2), [0, 1, 2])
+
+    assert sorted(queries) == [
+        (date(2026, 1, 1), date(2026, 1, 2), [2]),
+        (date(2026, 1, 2), date(2026, 1, 2), [0, 1]),
+    ]
+    pd.testing.assert_frame_equal(wider, _direct(date(2026, 1, 1), date(2026, 1, 2), [0, 1, 2]),
+                                  check_dtype=False)
+    stored = wider[(wider['TagIndex'] < 2) & (wider['Date'] == '2026-01-01')]
+    pd.testing.assert_frame_equal(stored.reset_index(drop=True), first, check_dtype=False)
+
+
+def test_closed_days_without_a_value_are_not_asked_for_again(queries):
+    empty = _snapshots(date(2025, 12, 30), date(2025, 12, 31), [0])
+    assert empty.empty and len(queries) == 1
+
+    queries.clear()
+    assert _snapshots(date(2025, 12, 30), date(2025, 12, 31), [0]).empty
+    assert queries == []
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from DB_Pool import ConnectionPool, PoolTimeout
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+        self.pings = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        self.conn.pings += 1
+        if not self.conn.alive:
+            raise ConnectionError("server went away")
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_released_connection_is_reused(clock):
+    opened = []
+    pool = ConnectionPool(lambda: opened.append(FakeConn()) or opened[-1], size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert second is first and len(opened) == 1
+    # Returned just now, so it wasn't pinged
+    assert first.pings == 0
+
+
+def test_connections_older_than_recycle_are_reopened(clock):
+    pool = ConnectionPool(FakeConn, size=1, recycle=60)
+    with pool.connection() as old:
+        pass
+
+    clock[0] += 61
+    with pool.connection() as new:
+        pass
+
+    assert new is not old and old.closed
+
+
+def test_idle_connections_are_pinged_and_dead_ones_replaced(clock):
+    pool = ConnectionPool(FakeConn, size=1, ping_after=30)
+    with pool.connection() as conn:
+        pass
+
+    clock[0] += 31
+    with pool.connection() as same:
+        pass
+    assert same is conn and conn.pings == 1
+
+    conn.alive = False
+    clock[0] += 31
+    with pool.connection() as replacement:
+        pass
+    assert replacement is not conn and conn.closed
+
+
+def test_checkout_times_out_when_every_connection_is_in_use():
+    pool = ConnectionPool(FakeConn, size=1, timeout=0.1)
+    held = pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    pool.release(held)
+    assert pool.acquire() is held
+
+
+def test_broken_connection_is_discarded_after_an_error(clock):
+    pool = ConnectionPool(FakeConn, size=1)
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.alive = False
+            raise RuntimeError("query failed")
+
+    assert conn.closed
+    with pool.connection() as replacement:
+        assert replacement is not conn
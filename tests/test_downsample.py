@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from Downsample import lttb, minmax_buckets
+
+
+def test_lttb_keeps_both_endpoints_and_a_lone_spike():
+    x = pd.date_range("2026-01-01", periods=1000, freq="min").to_numpy()
+    y = np.sin(np.linspace(0, 6, 1000))
+    y[437] = 25.0
+
+    kept = lttb(x, y, 100)
+
+    assert len(kept) == 100
+    assert kept[0] == 0 and kept[-1] == 999
+    assert 437 in kept
+    assert (np.diff(kept) > 0).all()
+
+
+def test_lttb_returns_every_point_when_there_are_few():
+    assert list(lttb([0, 1, 2], [5.0, 6.0, 7.0], 10)) == [0, 1, 2]
+
+
+def test_minmax_buckets_keep_each_buckets_extremes():
+    t = pd.date_range("2026-01-01", periods=600, freq="min")
+    rng = np.random.default_rng(1)
+    val = rng.normal(size=600)
+    val[123], val[456] = 40.0, -40.0
+
+    buckets = minmax_buckets(t, val, t[0], t[-1] + pd.Timedelta(minutes=1), 10)
+
+    assert len(buckets) == 10
+    assert buckets['Samples'].sum() == 600
+    assert buckets['MaxVal'].max() == 40.0 and buckets['MinVal'].min() == -40.0
+    # Every bucket agrees with the rows it covers
+    for (_, row), rows in zip(buckets.iterrows(), np.split(val, 10)):
+        assert (row['MinVal'], row['MaxVal']) == (rows.min(), rows.max())
+        assert np.isclose(row['AvgVal'], rows.mean())
+
+
+def test_minmax_buckets_drop_empty_buckets():
+    t = pd.to_datetime(["2026-01-01 00:00", "2026-01-01 00:01", "2026-01-01 09:00"])
+
+    buckets = minmax_buckets(t, [1.0, 3.0, 2.0], t[0], pd.Timestamp("2026-01-01 10:00"), 10)
+
+    assert list(buckets['Samples']) == [2, 1]
+    assert list(buckets['MaxVal']) == [3.0, 2.0]
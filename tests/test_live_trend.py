@@ -0,0 +1,48 @@
+import numpy as np
+
+from Live_Trend import RingBuffer
+
+T0 = np.datetime64("2026-01-01T00:00:00", "us")
+
+
+def _points(first, count):
+    offsets = np.arange(first, first + count)
+    return T0 + offsets * np.timedelta64(1, "s"), offsets.astype("float32")
+
+
+def _contents(buffer):
+    times, values = buffer.view()
+    assert list((times - T0) // np.timedelta64(1, "s")) == list(values)
+    return list(values)
+
+
+def test_buffer_keeps_the_newest_points_oldest_first_when_it_wraps():
+    buffer = RingBuffer(capacity=5)
+    buffer.extend(*_points(0, 3))
+    assert _contents(buffer) == [0, 1, 2]
+
+    buffer.extend(*_points(3, 4))
+    assert _contents(buffer) == [2, 3, 4, 5, 6]
+
+    # Around the end of the array more than once
+    for first in range(7, 20, 2):
+        buffer.extend(*_points(first, 2))
+    assert _contents(buffer) == [16, 17, 18, 19, 20]
+
+
+def test_a_batch_larger_than_the_buffer_keeps_its_tail():
+    buffer = RingBuffer(capacity=5)
+    buffer.extend(*_points(0, 2))
+
+    buffer.extend(*_points(2, 12))
+
+    assert _contents(buffer) == [9, 10, 11, 12, 13]
+
+
+def test_empty_batch_changes_nothing():
+    buffer = RingBuffer(capacity=5)
+    buffer.extend(*_points(0, 4))
+
+    buffer.extend(*_points(4, 0))
+
+    assert _contents(buffer) == [0, 1, 2, 3]
@@ -0,0 +1,132 @@
+import os
+import time
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import Local_Mirror
+from conftest import STANDIN_END, STANDIN_SAMPLE_SECONDS
+
+
+@pytest.fixture
+def mirror(standin, tmp_path, monkeypatch):
+    monkeypatch.setattr(Local_Mirror, "MIRROR_DIR", str(tmp_path / "mirror"))
+    return Local_Mirror
+
+
+def _table_rows(conn):
+    return conn.execute("SELECT COUNT(*) FROM FloatTable").fetchone()[0]
+
+
+def _mirrored(mirror):
+    return mirror.read_range(STANDIN_END - timedelta(days=3), STANDIN_END)
+
+
+def _files_on_disk(mirror):
+    return {(name.split("=", 1)[1], f) for name in os.listdir(mirror.MIRROR_DIR) if name.startswith("Date=")
+            for f in os.listdir(os.path.join(mirror.MIRROR_DIR, name)) if f.endswith(".parquet")}
+
+
+def _files_listed(mirror):
+    return {(day, f) for day, files in mirror._read_manifest()["days"].items() for f in files}
+
+
+def test_sync_copies_every_row_once(mirror, standin_conn):
+    assert mirror.high_water_mark() is None
+
+    synced = mirror.sync_once(batch_rows=100)
+
+    rows = _mirrored(mirror)
+    assert synced == len(rows) == _table_rows(standin_conn)
+    assert not rows.duplicated(['DateAndTime', 'TagIndex']).any()
+    assert mirror.high_water_mark() > STANDIN_END
+    assert mirror.sync_once(batch_rows=100) == 0
+
+
+def test_sync_compacts_closed_days_to_one_file(mirror):
+    mirror.sync_once(batch_rows=50)
+
+    manifest = mirror._read_manifest()
+    assert sorted(manifest["days"]) == ["2026-01-01", "2026-01-02"]
+    assert all(len(files) == 1 for files in manifest["days"].values())
+    # The files merged away are gone; only the listed ones are left
+    assert _files_on_disk(mirror) == _files_listed(mirror)
+
+
+def test_sync_resumes_after_a_crash_without_duplicates(mirror, standin_conn, monkeypatch):
+    commit = mirror._commit
+    calls = []
+
+    def crash_on_third_batch(manifest, written, hwm):
+        calls.append(hwm)
+        if len(calls) == 3:
+            raise RuntimeError("killed mid-sync")
+        commit(manifest, written, hwm)
+
+    monkeypatch.setattr(mirror, "_commit", crash_on_third_batch)
+    with pytest.raises(RuntimeError):
+        mirror.sync_once(batch_rows=100)
+
+    # The rows of the first two batches are visible, up to the mark that covers them;
+    # the third batch's files were written but never listed
+    mark = mirror.high_water_mark()
+    assert mark == calls[1]
+    partial = _mirrored(mirror)
+    covered = standin_conn.execute("SELECT COUNT(*) FROM FloatTable WHERE DateAndTime <= ?", [mark]).fetchone()[0]
+    assert len(partial) == covered
+    assert partial['DateAndTime'].max() == mark
+    assert _files_on_disk(mirror) > _files_listed(mirror)
+
+    monkeypatch.setattr(mirror, "_commit", commit)
+    mirror.sync_once(batch_rows=100)
+
+    rows = _mirrored(mirror)
+    assert len(rows) == _table_rows(standin_conn)
+    assert not rows.duplicated(['DateAndTime', 'TagIndex']).any()
+    # Compaction removed the files the crashed sync left behind
+    assert _files_on_disk(mirror) == _files_listed(mirror)
+
+
+def test_read_retries_when_compaction_removed_a_listed_file(mirror, monkeypatch):
+    mirror.sync_once(batch_rows=100)
+    real_dataset = mirror.ds.dataset
+    attempts = []
+
+    def vanished_once(*args, **kwargs):
+        attempts.append(args)
+        if len(attempts) == 1:
+            raise FileNotFoundError("compacted away")
+        return real_dataset(*args, **kwargs)
+
+    monkeypatch.setattr(mirror.ds, "dataset", vanished_once)
+    day = STANDIN_END - timedelta(days=1)
+    rows = mirror.read_range(day, day + timedelta(hours=24) - timedelta(seconds=1), [0])
+
+    assert len(attempts) == 2
+    assert len(rows) == 24 * 3600 // STANDIN_SAMPLE_SECONDS
+
+
+def test_sync_skips_while_another_process_holds_the_lock(mirror):
+    os.makedirs(mirror.MIRROR_DIR)
+    lock = os.path.join(mirror.MIRROR_DIR, mirror.LOCK_FILE)
+    with open(lock, "w") as f:
+        f.write("12345")
+
+    assert mirror.sync_once(batch_rows=100) == 0
+    assert mirror.high_water_mark() is None
+    assert os.path.exists(lock)
+
+
+def test_sync_takes_over_a_lock_left_by_a_dead_process(mirror, standin_conn):
+    os.makedirs(mirror.MIRROR_DIR)
+    lock = os.path.join(mirror.MIRROR_DIR, mirror.LOCK_FILE)
+    with open(lock, "w") as f:
+        f.write("12345")
+    stale = time.time() - mirror.LOCK_STALE_SECONDS - 1
+    os.utime(lock, (stale, stale))
+
+    assert mirror.sync_once(batch_rows=100) == _table_rows(standin_conn)
+    # Released once the sync is done
+    assert not os.path.exists(lock)
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+import DB_Query
+import Query_Advisor
+from conftest import STANDIN_TAGS
+
+TAGS = list(range(STANDIN_TAGS))
+
+
+@pytest.fixture
+def shapes(standin):
+    return Query_Advisor.capture_shapes(TAGS)
+
+
+def _by_name(findings):
+    return {finding.shape.name: finding for finding in findings}
+
+
+def test_functions_of_columns_are_neither_sought_nor_ordered():
+    use = Query_Advisor.usage("""
+        SELECT TOP (?) DateAndTime, TagIndex, Val FROM FloatTable
+        WHERE DateAndTime BETWEEN ? AND ? AND (ROUND(Val, 2) < ? OR (ROUND(Val, 2) = ? AND DateAndTime < ?))
+        ORDER BY ROUND(Val, 2) DESC, DateAndTime DESC, TagIndex DESC
+    """)
+
+    assert use.equality == []
+    assert use.ranges == ['DateAndTime']
+    assert use.order == []
+    assert Query_Advisor.recommend(use) == (['DateAndTime'], ['TagIndex', 'Val'])
+
+
+def test_equality_columns_lead_then_the_ordered_range():
+    use = Query_Advisor.usage("""
+        SELECT DateAndTime, TagIndex, Val FROM FloatTable
+        WHERE TagIndex IN (?,?) AND DateAndTime > ? AND DateAndTime <= ?
+        ORDER BY DateAndTime, TagIndex
+    """)
+
+    assert Query_Advisor.recommend(use) == (['TagIndex', 'DateAndTime'], ['Val'])
+
+
+def test_every_captured_shape_runs_on_the_stand_in(shapes):
+    indexes, findings = Query_Advisor.advise(shapes)
+
+    assert len(_by_name(findings)) == 6 + len(DB_Query.REPORT_SORT_KEYS)
+    assert [finding.shape.name for finding in findings if finding.error] == []
+    assert all(finding.plan and finding.stats for finding in findings)
+
+
+def test_report_by_value_seeks_on_time_not_value(shapes):
+    indexes, findings = Query_Advisor.advise(shapes)
+
+    assert _by_name(findings)["Report page by Val"].recommended == (['DateAndTime'], ['TagIndex', 'Val'])
+    recommendations = Query_Advisor.merged_recommendations(findings)
+    assert all(keys[0] != 'Val' for keys, include in recommendations)
+    # Its recommendation is served by the (DateAndTime, TagIndex) one
+    assert (['DateAndTime', 'TagIndex'], ['Val']) in recommendations
+
+
+def test_every_shape_is_served_after_applying_the_recommendations(shapes):
+    indexes, findings = Query_Advisor.advise(shapes)
+    Query_Advisor.apply_sqlite(Query_Advisor.merged_recommendations(findings))
+
+    indexes, findings = Query_Advisor.advise(shapes)
+
+    assert [finding.shape.name for finding in findings if not finding.supported_by] == []
+    assert Query_Advisor.merged_recommendations(findings) == []
+    assert all("scan" not in finding.operators for finding in findings)
+
+
+def test_newest_sample_of_an_empty_table_is_now(standin_conn):
+    standin_conn.execute("DELETE FROM FloatTable")
+    standin_conn.commit()
+
+    before = datetime.now()
+    assert before <= Query_Advisor._newest_sample() <= datetime.now()
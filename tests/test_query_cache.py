@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from Query_Cache import DiskStore, SingleFlight, TTLCache
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    cache = TTLCache(ttl=300)
+
+    cache.put("key", "value")
+    clock[0] += 299
+    assert cache.get("key") == "value"
+    clock[0] += 2
+    assert cache.get("key", "missing") == "missing"
+    assert len(cache) == 0
+
+
+def test_aligned_entries_expire_together_at_the_next_multiple(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    cache = TTLCache(ttl=300, align=True)
+
+    cache.put("early", 1)
+    clock[0] = 1190.0
+    cache.put("late", 2)
+    clock[0] = 1199.0
+    assert (cache.get("early"), cache.get("late")) == (1, 2)
+    clock[0] = 1201.0
+    assert (cache.get("early"), cache.get("late")) == (None, None)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(ttl=300, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_concurrent_callers_share_one_computation():
+    cache = TTLCache(ttl=300)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Let every caller reach the cache before the first computation finishes
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["result"] * 8
+    assert cache.get_or_compute("key", compute) == "result"
+    assert calls == [1]
+
+
+def test_waiting_callers_get_the_leaders_error_and_nothing_is_cached():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("query failed")
+
+    errors = []
+
+    def call():
+        try:
+            flights.do("key", failing)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    # The failed flight is gone, so the next call computes again
+    assert flights.do("key", lambda: "retried") == "retried"
+
+
+def test_disk_store_shares_values_between_caches(tmp_path):
+    store = DiskStore(str(tmp_path))
+    first, second = TTLCache(ttl=300, store=store), TTLCache(ttl=300, store=store)
+
+    assert first.get_or_compute("key", lambda: "from first") == "from first"
+    assert second.get_or_compute("key", lambda: pytest.fail("computed twice")) == "from first"
+
+    first.clear()
+    assert second.store.get("key") is None
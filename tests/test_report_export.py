@@ -0,0 +1,43 @@
+import gzip
+from datetime import date, datetime
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+import Daily_Artifacts
+import Report_Export
+
+
+def test_export_of_an_empty_range_is_a_valid_file(standin, tmp_path):
+    for fmt in Report_Export.EXPORT_FORMATS:
+        data = Report_Export.build_report_export(datetime(2026, 3, 1), datetime(2026, 3, 2), [0], fmt)
+        path = tmp_path / f"empty.{Report_Export.EXPORT_FORMATS[fmt][0]}"
+        path.write_bytes(data)
+        if fmt == "Parquet":
+            table = pq.read_table(path)
+            assert table.num_rows == 0
+            assert table.schema.names == ['DateAndTime', 'TagIndex', 'Val']
+        else:
+            assert gzip.decompress(data).decode() == "DateAndTime,TagIndex,Val\n"
+
+
+@pytest.fixture
+def artifacts(standin, monkeypatch):
+    # Only the report half of the build is under test here
+    monkeypatch.setattr(Daily_Artifacts, "_build_kpi", lambda directory, day: {})
+    Daily_Artifacts._manifest_cache.clear()
+    yield Daily_Artifacts
+    Daily_Artifacts._manifest_cache.clear()
+
+
+# A day the table has no rows for still builds, with an empty report file and page
+def test_build_of_a_day_without_rows(artifacts):
+    artifacts.build(date(2026, 3, 1))
+
+    assert artifacts.current_manifest()["report"]["rows"] == 0
+    start, end = artifacts.report_window()
+    page, more = artifacts.report_page(start, end, [], 50)
+    assert len(page) == 0 and not more
+    name, path = artifacts.report_csv()
+    assert gzip.decompress(artifacts.read_artifact(path)).decode() == "DateAndTime,TagIndex,Val\n"
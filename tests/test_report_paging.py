@@ -0,0 +1,109 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+import DB_Query
+import Daily_Artifacts
+from conftest import STANDIN_END
+
+WINDOW = (STANDIN_END - timedelta(days=1), STANDIN_END)
+# Three tags pad the IN list to four (the last one repeated)
+TAGS = [0, 2, 3]
+PAGE_SIZE = 50
+
+
+# Every page from one source, following the keyset of the last row of each page
+def _all_pages(fetch, sort_by, descending):
+    pages, after = [], None
+    while True:
+        page, after = fetch(*WINDOW, TAGS, PAGE_SIZE, sort_by=sort_by, descending=descending, after=after)
+        assert len(page) <= PAGE_SIZE
+        pages.append(page)
+        if after is None:
+            return pd.concat(pages, ignore_index=True)
+        assert len(page) == PAGE_SIZE
+
+
+def _window_rows():
+    return DB_Query.fetch_raw_range(*WINDOW, TAGS)
+
+
+# What the pages should add up to: the typed rows of the window, sorted in full
+def _expected(sort_by, descending):
+    return _window_rows().sort_values(DB_Query.REPORT_SORT_KEYS[sort_by], ascending=not descending, ignore_index=True)
+
+
+@pytest.fixture
+def report_artifact(standin, monkeypatch):
+    pytest.importorskip("pyarrow")
+    # Only the report half of the build is under test here
+    monkeypatch.setattr(Daily_Artifacts, "_build_kpi", lambda directory, day: {})
+    Daily_Artifacts._manifest_cache.clear()
+    Daily_Artifacts.build(date(2026, 1, 3))
+    yield Daily_Artifacts
+    Daily_Artifacts._manifest_cache.clear()
+
+
+def test_padded_in_list_repeats_the_last_value():
+    assert DB_Query.pad_in_list([0, 2, 3]) == [0, 2, 3, 3]
+    assert DB_Query.pad_in_list([5]) == [5]
+    assert len(DB_Query.pad_in_list(list(range(17)))) == 32
+
+
+@pytest.mark.parametrize("sort_by", ["DateAndTime", "TagIndex"])
+@pytest.mark.parametrize("descending", [True, False])
+def test_database_pages_cover_the_window_in_order(standin, sort_by, descending):
+    pages = _all_pages(DB_Query.fetch_report_page, sort_by, descending)
+
+    pd.testing.assert_frame_equal(pages, _expected(sort_by, descending))
+
+
+@pytest.mark.parametrize("sort_by", ["DateAndTime", "TagIndex"])
+@pytest.mark.parametrize("descending", [True, False])
+def test_artifact_pages_match_the_database_pages(report_artifact, sort_by, descending):
+    pages = _all_pages(report_artifact.report_page, sort_by, descending)
+
+    pd.testing.assert_frame_equal(pages, _all_pages(DB_Query.fetch_report_page, sort_by, descending),
+                                  check_dtype=False)
+
+
+# Values are ordered on their 2-decimal rounding as each source rounds it (SQL and
+# Arrow may differ at exact .xx5 ties, and the shown value is rounded once more), so
+# each source is checked for every row once, in order to within a cent
+@pytest.mark.parametrize("source", ["database", "artifact"])
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_by_value_hold_every_row_once(report_artifact, source, descending):
+    fetch = DB_Query.fetch_report_page if source == "database" else report_artifact.report_page
+    pages = _all_pages(fetch, "Val", descending)
+
+    assert len(pages) == len(_window_rows())
+    assert not pages.duplicated(['DateAndTime', 'TagIndex']).any()
+    steps = pages['Val'].astype('float64').diff().dropna()
+    assert (steps <= 0.011 if descending else steps >= -0.011).all()
+
+
+def test_value_keys_are_the_rounding_the_database_returned(standin, monkeypatch):
+    # A server that rounds differently from Python: the next page has to continue from
+    # the server's value, not from one rounded again here
+    read_sql = DB_Query.read_sql
+    returned = []
+
+    def rounded_up(query, params=None):
+        df = read_sql(query, params)
+        df['RoundedVal'] += 0.005
+        returned.append(df)
+        return df
+
+    monkeypatch.setattr(DB_Query, "read_sql", rounded_up)
+    page, after = DB_Query.fetch_report_page(*WINDOW, TAGS, PAGE_SIZE, sort_by="Val")
+
+    last = returned[0].iloc[PAGE_SIZE - 1]
+    assert after == (last['RoundedVal'], last['DateAndTime'].to_pydatetime(), last['TagIndex'])
+
+
+def test_artifact_pages_only_serve_the_built_window(report_artifact):
+    start, end = report_artifact.report_window()
+    assert (start, end) == WINDOW
+    assert report_artifact.report_page(start - timedelta(hours=1), end, TAGS, PAGE_SIZE) is None
+    assert report_artifact.report_page(start, end + timedelta(hours=1), TAGS, PAGE_SIZE) is None
@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+import DB_Query
+import Rollup
+from conftest import STANDIN_END, STANDIN_TAGS
+
+TAGS = list(range(STANDIN_TAGS))
+
+
+def _rollup_rows(conn):
+    return conn.execute(f"SELECT * FROM {Rollup.ROLLUP_TABLE} ORDER BY Date, Hour, TagIndex").fetchall()
+
+
+def test_refreshing_the_same_hours_again_changes_nothing(standin, standin_conn):
+    start = STANDIN_END - timedelta(days=2)
+    Rollup.refresh(start)
+    first = _rollup_rows(standin_conn)
+    Rollup.refresh(start)
+
+    assert _rollup_rows(standin_conn) == first
+    samples = standin_conn.execute(f"SELECT SUM(Samples) FROM {Rollup.ROLLUP_TABLE}").fetchone()[0]
+    assert samples == standin_conn.execute("SELECT COUNT(*) FROM FloatTable").fetchone()[0]
+    assert Rollup.rolled_through() > STANDIN_END
+
+
+def test_rollup_snapshots_match_the_raw_table(standin):
+    Rollup.refresh()
+
+    for hour in (0, 7, 23):
+        rolled = Rollup.snapshots(date(2026, 1, 1), date(2026, 1, 2), hour, TAGS)
+        raw = DB_Query._raw_snapshots(date(2026, 1, 1), date(2026, 1, 2), hour, TAGS)
+        keys = ['Date', 'TagIndex']
+        pd.testing.assert_frame_equal(rolled.sort_values(keys, ignore_index=True),
+                                      raw.sort_values(keys, ignore_index=True), check_dtype=False)
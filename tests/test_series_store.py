@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from Series_Store import SeriesStore
+
+
+def _frame():
+    times = pd.date_range("2026-01-01", periods=6, freq="h")
+    # Tags interleaved and out of time order, as a query might return them
+    return pd.DataFrame({
+        'DateAndTime': list(times[::-1]) + list(times) + [pd.NaT],
+        'TagIndex': [3] * 6 + [1] * 6 + [1],
+        'Val': [960.12, 1.5, 2.5, np.nan, 4.5, 5.5] + [10.0, 11.0, 12.0, 13.0, 14.0, 15.0] + [99.0],
+    })
+
+
+def test_each_tag_is_one_sorted_run_without_the_unusable_rows():
+    store = SeriesStore.from_frame(_frame())
+
+    assert sorted(store.tags) == [1, 3] and 2 not in store
+    assert len(store) == 11
+    times, values = store.series(3)
+    assert (np.diff(times) > 0).all()
+    assert list(values) == np.float32([5.5, 4.5, 2.5, 1.5, 960.12]).tolist()
+    # Views into the store, not copies
+    assert np.shares_memory(values, store.values)
+
+
+def test_time_range_is_inclusive_on_both_ends():
+    store = SeriesStore.from_frame(_frame())
+
+    frame = store.frame(1, start="2026-01-01 01:00", end="2026-01-01 03:00")
+
+    assert list(frame['Val']) == [11.0, 12.0, 13.0]
+    assert list(frame['DateAndTime'].dt.hour) == [1, 2, 3]
+    assert store.frame(1, start="2026-01-02").empty
+    assert store.frame(7).empty
+
+
+def test_values_are_widened_back_to_what_was_stored():
+    store = SeriesStore.from_frame(_frame())
+
+    assert store.frame(3)['Val'].iloc[-1] == 960.12
+    assert store.value_range(3) == (1.5, 960.12)
+    assert all(np.isnan(store.value_range(7)))
+
+
+def test_frame_thins_to_max_points_keeping_the_ends():
+    times = pd.date_range("2026-01-01", periods=500, freq="min")
+    store = SeriesStore.from_frame(pd.DataFrame({'DateAndTime': times, 'TagIndex': 0,
+                                                 'Val': np.arange(500, dtype=float)}))
+
+    frame = store.frame(0, max_points=50)
+
+    assert len(frame) == 50
+    assert (frame['DateAndTime'].iloc[0], frame['DateAndTime'].iloc[-1]) == (times[0], times[-1])